@@ -0,0 +1,305 @@
+""" Local stand-in of the WikiArt API, image host and release archives for offline benchmarks.
+
+Emulated endpoints (under `/en/api/2`): `login`, `UpdatedDictionaries`, `UpdatedArtists` (with `fromDate`),
+`PaintingsByArtist`, `PaintingSearch` (paginated with `hasMore`/`paginationToken`) and `Painting`. The prefix is
+case-insensitive since WikiArt documents `login` under `/en/Api/2`.
+Images are served under `/images` and the release zips under `/releases`, with the layout of the GitHub release.
+Requests over the rate limits of a session key get a 429 response as the real API does.
+
+```
+python benchmark/mock_server.py --port 8000
+export WIKIARTCRAWLER_API_ROOT=http://127.0.0.1:8000/en/api/2
+export WIKIARTCRAWLER_RELEASE_URL=http://127.0.0.1:8000/releases
+```
+"""
+import io
+import json
+import hashlib
+import time
+import zlib
+import random
+import zipfile
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# documented limits: API calls 10 per 2.5 seconds and 400 per hour, images 20 per second
+API_RATE_LIMITS = ((10, 2.5), (400, 3600))
+IMAGE_RATE_LIMITS = ((20, 1.0),)
+GROUPS = ['abstract_expressionism', 'baroque', 'ecole_de_paris', 'expressionism', 'impressionism',
+          'naive_art_primitivism', 'neo_impressionism', 'post_impressionism', 'pre_raphaelite_brotherhood', 'realism',
+          'rococo', 'romanticism', 'surrealism', 'symbolism']
+FIRST_NAMES = ['anna', 'boris', 'clara', 'dmitri', 'elena', 'felix', 'greta', 'hugo', 'irene', 'jonas', 'kira', 'luca']
+LAST_NAMES = ['moreau', 'novak', 'olsen', 'petrov', 'quint', 'rossi', 'silva', 'tanaka', 'ulrich', 'vidal']
+GENRES = ['portrait', 'landscape', 'still life', 'genre painting', 'religious painting']
+MEDIA = [['oil', 'canvas'], ['watercolor', 'paper'], ['oil', 'panel'], ['tempera', 'wood']]
+STYLES = ['Impressionism', 'Post-Impressionism', 'Realism', 'Romanticism', 'Baroque', 'Symbolism']
+
+
+def _jpeg(seed: int, size=(96, 72)):
+    """ Small JPEG with random content (a minimal valid JPEG stream if Pillow is not available). """
+    try:
+        import numpy as np
+        from PIL import Image
+        array = (np.random.RandomState(seed).rand(size[1], size[0], 3) * 255).astype('uint8')
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, format='JPEG')
+        return buffer.getvalue()
+    except ImportError:
+        return b'\xff\xd8' + bytes([seed % 256]) * 64 + b'\xff\xd9'
+
+
+def _zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for k, v in files.items():
+            z.writestr(k, v)
+    return buffer.getvalue()
+
+
+class RateLimiter:
+    """ Sliding-window request counter per client key. """
+
+    def __init__(self, rate_limits):
+        self.rate_limits = rate_limits
+        self.history = {}
+        self.lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self.lock:
+            history = self.history.setdefault(key, [deque() for _ in self.rate_limits])
+            for (limit, period), h in zip(self.rate_limits, history):
+                while h and h[0] <= now - period:
+                    h.popleft()
+                if len(h) >= limit:
+                    return False
+            for h in history:
+                h.append(now)
+            return True
+
+
+class MockWikiart:
+    """ Deterministic corpus of artists and paintings served by `MockWikiartServer`. """
+
+    def __init__(self, n_artists: int = 20, n_paintings: int = 30, n_images: int = 16, seed: int = 0):
+        rng = random.Random(seed)
+        self.updated = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        names = [f'{a}-{b}' for a in FIRST_NAMES for b in LAST_NAMES]
+        rng.shuffle(names)
+        assert n_artists <= len(names), f'at most {len(names)} artists'
+        self.artists = [{'id': f'{n:024x}', 'url': u, 'artistName': u.replace('-', ' ').title(),
+                         'lastUpdated': self.updated} for n, u in enumerate(sorted(names[:n_artists]))]
+        self.artist_by_id = {a['id']: a for a in self.artists}
+        self.dictionaries = [{'id': f'{n + 1:024x}', 'title': s, 'url': s.lower(), 'group': 1}
+                             for n, s in enumerate(STYLES)]
+        self.paintings = {}
+        self.details = {}
+        for n, a in enumerate(self.artists):
+            self.paintings[a['url']] = []
+            for i in range(n_paintings):
+                paint_id = f'{n:012x}{i:012x}'
+                url = f"{rng.choice(['view', 'study', 'garden', 'harbor', 'portrait', 'bridge'])}-{i}"
+                record = {
+                    'id': paint_id, 'title': url.replace('-', ' '), 'url': url, 'artistUrl': a['url'],
+                    'artistName': a['artistName'], 'artistId': a['id'], 'completitionYear': rng.randint(1600, 1950),
+                    'width': rng.randint(300, 2000), 'height': rng.randint(300, 2000)
+                }
+                self.paintings[a['url']].append(record)
+                self.details[paint_id] = dict(record, genres=[rng.choice(GENRES)], media=rng.choice(MEDIA),
+                                              styles=[rng.choice(STYLES)], tags=['tag'])
+        self.images = [_jpeg(i) for i in range(n_images)]
+
+    def records(self, artist_url: str, base_url: str = ''):
+        """ Painting records of an artist with the detail attached, as stored in the meta cache. """
+        return [dict(p, image=self.image_url(p, base_url),
+                     detail=dict(self.details[p['id']], image=self.image_url(p, base_url)))
+                for p in self.paintings[artist_url]]
+
+    @staticmethod
+    def image_url(painting, base_url: str):
+        return f"{base_url}/images/{painting['artistUrl']}/{painting['url']}.jpg!Large.jpg"
+
+    def release_files(self, base_url: str = ''):
+        """ Release archives keyed by file name: meta, one image archive per group and the face images, with the
+        sha256 of every archive in `checksums.json`. """
+        files = {'meta.zip': _zip({f"meta/{a['url']}.json": json.dumps(self.records(a['url'], base_url))
+                                   for a in self.artists})}
+        for n, g in enumerate(GROUPS):
+            files[f'{g}.zip'] = _zip({
+                f"{g}/{a['url']}/{p['url']}.jpg": self.images[k % len(self.images)]
+                for a in self.artists[n::len(GROUPS)] for k, p in enumerate(self.paintings[a['url']])})
+        for k in ['image_face', 'image_face_blur']:
+            files[f'{k}.zip'] = _zip({
+                f"{k}/{a['url']}/{p['url']}.face_0.jpg": self.images[0]
+                for a in self.artists for p in self.paintings[a['url']][:2]})
+        files['checksums.json'] = json.dumps({k: f'sha256:{hashlib.sha256(v).hexdigest()}'
+                                              for k, v in files.items()}).encode()
+        return files
+
+
+class MockWikiartServer:
+    """ Threaded HTTP server on localhost serving a `MockWikiart` corpus.
+
+    @param corpus: `MockWikiart` instance
+    @param page_size: number of records per page of paginated endpoints
+    @param api_rate_limits: list of (requests, seconds) per session key (anonymous requests share a key)
+    @param image_rate_limits: list of (requests, seconds) of the image host
+    @param latency: seconds of delay added to every API response
+    @param port: port to listen on (0 to pick a free one)
+    """
+
+    def __init__(self,
+                 corpus: MockWikiart = None,
+                 page_size: int = 10,
+                 api_rate_limits=API_RATE_LIMITS,
+                 image_rate_limits=IMAGE_RATE_LIMITS,
+                 latency: float = 0.0,
+                 port: int = 0):
+        self.corpus = MockWikiart() if corpus is None else corpus
+        self.page_size = page_size
+        self.latency = latency
+        self.api_limiter = RateLimiter(api_rate_limits)
+        self.image_limiter = RateLimiter(image_rate_limits)
+        self.stats = {'api': 0, 'image': 0, 'release': 0, 'rate_limited': 0}
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.releases = self.corpus.release_files(self.url)
+        self._thread = None
+
+    @property
+    def api_root(self):
+        return f'{self.url}/en/api/2'
+
+    @property
+    def release_url(self):
+        return f'{self.url}/releases'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _page(self, records, query):
+        offset = int(query.get('paginationToken', ['0'])[0])
+        end = offset + self.page_size
+        return {'data': records[offset:end], 'paginationToken': str(end) if end < len(records) else None,
+                'hasMore': end < len(records)}
+
+    def api(self, endpoint: str, query: dict):
+        """ Status code and JSON body of an API request. """
+        corpus = self.corpus
+        if endpoint == 'login':
+            return 200, {'SessionKey': f"session-{query.get('accessCode', [''])[0]}-{random.getrandbits(32):08x}"}
+        key = query.get('authSessionKey', ['anonymous'])[0]
+        if not self.api_limiter.allow(key):
+            self.stats['rate_limited'] += 1
+            return 429, {'error': 'request limit exceeded'}
+        if endpoint == 'UpdatedDictionaries':
+            return 200, self._page(corpus.dictionaries, query)
+        if endpoint == 'UpdatedArtists':
+            from_date = query.get('fromDate', [''])[0]
+            return 200, self._page([a for a in corpus.artists if a['lastUpdated'] > from_date], query)
+        if endpoint == 'PaintingsByArtist':
+            artist = corpus.artist_by_id.get(query.get('id', [''])[0])
+            if artist is None:
+                return 404, {'error': 'artist not found'}
+            return 200, self._page([dict(p, image=corpus.image_url(p, self.url))
+                                    for p in corpus.paintings[artist['url']]], query)
+        if endpoint == 'PaintingSearch':
+            term = query.get('term', [''])[0].lower()
+            return 200, self._page([dict(p, image=corpus.image_url(p, self.url)) for a in corpus.artists
+                                    for p in corpus.paintings[a['url']] if term in p['title']], query)
+        if endpoint == 'Painting':
+            detail = corpus.details.get(query.get('id', [''])[0])
+            if detail is None:
+                return 404, {'error': 'painting not found'}
+            return 200, dict(detail, image=corpus.image_url(detail, self.url))
+        return 404, {'error': f'unknown endpoint {endpoint}'}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def send(self, status, body, content_type, headers=None, head_only=False):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if not head_only:
+                    self.wfile.write(body)
+
+            def route(self, head_only=False):
+                parsed = urlparse(self.path)
+                path, query = parsed.path, parse_qs(parsed.query)
+                if path.lower().startswith('/en/api/2/'):
+                    server.stats['api'] += 1
+                    if server.latency > 0:
+                        time.sleep(server.latency)
+                    status, body = server.api(path[len('/en/api/2/'):], query)
+                    self.send(status, json.dumps(body).encode(), 'application/json', head_only=head_only)
+                elif path.startswith('/images/'):
+                    server.stats['image'] += 1
+                    if not server.image_limiter.allow(self.client_address[0]):
+                        server.stats['rate_limited'] += 1
+                        self.send(429, b'', 'text/plain', head_only=head_only)
+                        return
+                    images = server.corpus.images
+                    self.send(200, images[zlib.crc32(path.encode()) % len(images)], 'image/jpeg', head_only=head_only)
+                elif path.startswith('/releases/') and path[len('/releases/'):] in server.releases:
+                    server.stats['release'] += 1
+                    body = server.releases[path[len('/releases/'):]]
+                    headers = {'ETag': f'"{len(body):x}"', 'Accept-Ranges': 'bytes'}
+                    start = 0
+                    if self.headers.get('Range', '').startswith('bytes='):
+                        start = int(self.headers['Range'][len('bytes='):].split('-')[0])
+                    if start > 0:
+                        headers['Content-Range'] = f'bytes {start}-{len(body) - 1}/{len(body)}'
+                    self.send(206 if start > 0 else 200, body[start:], 'application/zip', headers, head_only)
+                else:
+                    self.send(404, b'', 'text/plain', head_only=head_only)
+
+            def do_GET(self):
+                self.route()
+
+            def do_HEAD(self):
+                self.route(head_only=True)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in of the WikiArt API')
+    parser.add_argument('--port', default=8000, type=int)
+    parser.add_argument('--artists', default=20, type=int)
+    parser.add_argument('--paintings', default=30, type=int)
+    parser.add_argument('--page-size', default=10, type=int)
+    parser.add_argument('--latency', default=0.0, type=float)
+    opt = parser.parse_args()
+    mock = MockWikiartServer(MockWikiart(opt.artists, opt.paintings), page_size=opt.page_size, latency=opt.latency,
+                             port=opt.port)
+    print(f'serving on {mock.url}\n\tWIKIARTCRAWLER_API_ROOT={mock.api_root}\n\t'
+          f'WIKIARTCRAWLER_RELEASE_URL={mock.release_url}')
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
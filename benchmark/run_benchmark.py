@@ -0,0 +1,200 @@
+""" Benchmark of the crawler against the local WikiArt stand-in server, compared with stored baselines.
+
+Measured metrics
+- import_time: `import wikiartcrawler` in a fresh interpreter (median)
+- bootstrap: `WikiartAPI()` on an empty cache, downloading and extracting every release archive
+- crawl: `WikiartAPI.crawl` of every artist (paintings per second)
+- download: `get_painting` downloading the images of artists (images per second)
+- get_painting_info / query_painting: filter latency on a large artist (median)
+
+The timings depend on the machine, so the baseline only holds targets that do not: the number of requests
+received by the server and the speedup of the meta index over the JSON filter. A run also fails if the server
+answered any request with 429 or if the crawl or the download used more than the API/image rate limits
+(`*_quota_usage` above 1). The timings and the quota usage are printed for reference.
+
+```
+python benchmark/run_benchmark.py                    # fails if a target regressed from benchmark/baseline.json
+python benchmark/run_benchmark.py --update-baseline  # store the result as the new baseline (default options)
+```
+The baseline is only comparable with a run of the same options: regenerate it with `--update-baseline` after
+changing the defaults or the stand-in server.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from mock_server import MockWikiart, MockWikiartServer, API_RATE_LIMITS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# machine independent target -> True if higher is better
+METRICS = {
+    'api_requests': False,
+    'image_requests': False,
+    'release_requests': False,
+    'meta_index_speedup': True,
+}
+# share of the rate limits used, wall-clock based: reported, and only checked to stay within the limits
+QUOTA_USAGE = ('crawl_quota_usage', 'download_quota_usage')
+
+
+def median_time(function, repeat: int):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed.append(time.perf_counter() - start)
+    return statistics.median(elapsed)
+
+
+def bench_import_time(repeat: int = 5):
+    script = 'import time; start = time.perf_counter(); import wikiartcrawler; print(time.perf_counter() - start)'
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    elapsed = [float(subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, check=True,
+                                    text=True).stdout) for _ in range(repeat)]
+    return statistics.median(elapsed)
+
+
+def init_cache(cache_dir: str, corpus: MockWikiart, bootstrapped: bool):
+    """ Cache with the artist/dictionary lists (and empty painting directories to skip the bootstrap). """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(f'{cache_dir}/artists.json', 'w') as f:
+        json.dump({a['url']: a['id'] for a in corpus.artists}, f)
+    with open(f'{cache_dir}/dictionaries.json', 'w') as f:
+        json.dump({i['title']: {'id': i['id'], 'url': i['url'], 'group': i['group']} for i in corpus.dictionaries}, f)
+    if bootstrapped:
+        for d in ['meta', 'image', 'image_face', 'image_face_blur']:
+            os.makedirs(f'{cache_dir}/painting/{d}', exist_ok=True)
+    return cache_dir
+
+
+def run(opt):
+    corpus = MockWikiart(opt.artists, opt.paintings)
+    rate_limits = tuple((n * opt.rate_scale, period) for n, period in API_RATE_LIMITS)
+    server = MockWikiartServer(corpus, page_size=opt.page_size, api_rate_limits=rate_limits, latency=opt.latency)
+    # the endpoints are read on import
+    os.environ['WIKIARTCRAWLER_API_ROOT'] = server.api_root
+    os.environ['WIKIARTCRAWLER_RELEASE_URL'] = server.release_url
+    sys.path.insert(0, ROOT)
+    from wikiartcrawler import WikiartAPI
+    from wikiartcrawler.downloader import IMAGE_REQUEST_PER_SECOND
+
+    result = {'import_time_s': bench_import_time()}
+    work_dir = tempfile.mkdtemp()
+    with server:
+        start = time.perf_counter()
+        api = WikiartAPI(cache_dir=init_cache(f'{work_dir}/bootstrap', corpus, bootstrapped=False))
+        result['bootstrap_s'] = time.perf_counter() - start
+        assert len(api.catalog.artists) == len(corpus.artists), 'bootstrap incomplete'
+
+        api = WikiartAPI(cache_dir=init_cache(f'{work_dir}/crawl', corpus, bootstrapped=True),
+                         access_code='benchmark', secret_code='benchmark', skip_download=False,
+                         session_num=opt.session_num, rate_limits=rate_limits, num_workers=opt.num_workers)
+        start, api_requests = time.perf_counter(), server.stats['api']
+        crawled = api.crawl(artist_url=[a['url'] for a in corpus.artists])
+        elapsed = time.perf_counter() - start
+        result['crawl_paintings_per_s'] = sum(crawled.values()) / elapsed
+        # requests per second over the requests per second allowed by the short window of every session key
+        allowed = opt.session_num * rate_limits[0][0] / rate_limits[0][1]
+        result['crawl_quota_usage'] = (server.stats['api'] - api_requests) / elapsed / allowed
+
+        download_artists = [a['url'] for a in corpus.artists[:opt.download_artists]]
+        start = time.perf_counter()
+        n_images = sum(len(api.get_painting(a) or []) for a in download_artists)
+        result['download_images_per_s'] = n_images / (time.perf_counter() - start)
+        result['download_quota_usage'] = result['download_images_per_s'] / IMAGE_REQUEST_PER_SECOND
+
+        # a large artist made of the paintings of the whole corpus
+        large = corpus.artists[0]['url']
+        records = [r for a in corpus.artists for r in corpus.records(a['url'], server.url)]
+        with open(f'{api.cache_dir}/painting/meta/{large}.json', 'w') as f:
+            json.dump(records * max(1, opt.filter_size // len(records)), f)
+        filters = dict(year_start=1800, genre=['portrait', 'landscape'], max_aspect_ratio=1.5)
+        result['get_painting_info_ms'] = 1000 * median_time(lambda: api.get_painting_info(large, **filters), 5)
+        api.build_meta_index()
+        result['query_painting_ms'] = 1000 * median_time(lambda: api.query_painting(large, **filters), 5)
+        result['meta_index_speedup'] = result['get_painting_info_ms'] / result['query_painting_ms']
+        result['server'] = dict(server.stats)
+        for k in ['api', 'image', 'release']:
+            result[f'{k}_requests'] = server.stats[k]
+    shutil.rmtree(work_dir)
+    return result
+
+
+def check_limits(result: dict):
+    """ Requests answered with 429 and rate limits exceeded by the crawl or the download. """
+    violations = []
+    if result['server']['rate_limited'] > 0:
+        violations.append(f"rate_limited: {result['server']['rate_limited']} requests answered with 429")
+    for k in QUOTA_USAGE:
+        if result[k] > 1:
+            violations.append(f'{k}: {result[k]:.4g} (rate limit exceeded)')
+    return violations
+
+
+def compare(result: dict, baseline: dict, tolerance: float):
+    """ Metrics worse than the baseline by more than the tolerance (relative). """
+    regressions = []
+    for k, higher_is_better in METRICS.items():
+        if k not in baseline:
+            continue
+        worse = result[k] < baseline[k] / (1 + tolerance) if higher_is_better else \
+            result[k] > baseline[k] * (1 + tolerance)
+        if worse:
+            regressions.append(f'{k}: {result[k]:.4g} (baseline {baseline[k]:.4g})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark against a local WikiArt stand-in server')
+    parser.add_argument('--artists', default=20, type=int)
+    parser.add_argument('--paintings', default=30, type=int)
+    parser.add_argument('--page-size', default=10, type=int)
+    parser.add_argument('--latency', default=0.01, type=float, help='seconds added to every API response')
+    parser.add_argument('--rate-scale', default=20, type=float, help='multiplier of the documented rate limits')
+    parser.add_argument('--session-num', default=4, type=int)
+    parser.add_argument('--num-workers', default=8, type=int)
+    parser.add_argument('--download-artists', default=2, type=int)
+    parser.add_argument('--filter-size', default=20000, type=int, help='paintings of the large artist')
+    parser.add_argument('--tolerance', default=0.5, type=float, help='relative regression allowed')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', default=None, help='write the result as JSON')
+    opt = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s', level=logging.WARNING)
+
+    result = run(opt)
+    print(json.dumps(result, indent=1))
+    if opt.output is not None:
+        with open(opt.output, 'w') as f:
+            json.dump(result, f, indent=1)
+    regressions = check_limits(result)
+    if opt.update_baseline:
+        if len(regressions) > 0:
+            print('baseline not updated, the rate limits were exceeded:\n\t' + '\n\t'.join(regressions))
+            sys.exit(1)
+        with open(opt.baseline, 'w') as f:
+            json.dump({k: result[k] for k in METRICS}, f, indent=1)
+            f.write('\n')
+        print(f'baseline updated: {opt.baseline}')
+        return
+    if os.path.exists(opt.baseline):
+        with open(opt.baseline) as f:
+            regressions += compare(result, json.load(f), opt.tolerance)
+    else:
+        print('no baseline found, run with `--update-baseline` to store one')
+    if len(regressions) > 0:
+        print('regression:\n\t' + '\n\t'.join(regressions))
+        sys.exit(1)
+    print('no regression')
+
+
+if __name__ == '__main__':
+    main()
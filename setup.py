@@ -30,6 +30,13 @@ setup(
     install_requires=[
         "tqdm",
         "requests",
-    ]
+        "numpy",
+        "Pillow",
+    ],
+    extras_require={
+        "async": ["aiohttp"],
+        "face": ["opencv-python-headless"],
+        "fast": ["orjson", "zstandard"],
+    }
 )
 
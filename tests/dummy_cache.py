@@ -0,0 +1,70 @@
+""" Build a small offline cache directory that WikiartAPI can be instantiated on without network """
+import os
+import json
+
+ARTISTS = {
+    'paul-cezanne': '57726d84edc2cb3880b48a5b',
+    'vincent-van-gogh': '57726d82edc2cb3880b486a0',
+    'claude-monet': '57726d84edc2cb3880b48a9b',
+}
+GENRES = ['portrait', 'landscape', 'still life']
+MEDIA = [['oil', 'canvas'], ['watercolor', 'paper'], ['oil', 'panel']]
+STYLES = ['Post-Impressionism', 'Impressionism', 'Cubism']
+
+
+def painting(artist, i, with_detail: bool = True):
+    """ A painting record as returned by `PaintingsByArtist` (+ `Painting` detail). """
+    url = f'{artist}-painting-{i}'
+    record = {
+        'id': f'{artist}-{i:04d}',
+        'title': f'painting {i}',
+        'url': url,
+        'artistUrl': artist,
+        'artistName': artist.replace('-', ' ').title(),
+        'artistId': ARTISTS.get(artist),
+        'completitionYear': 1860 + i,
+        'width': 400 + 100 * (i % 4),
+        'height': 400 + 50 * (i % 3),
+        'image': f'https://uploads.wikiart.org/images/{artist}/{url}.jpg!Large.jpg'
+    }
+    if with_detail:
+        record['detail'] = {
+            'id': record['id'],
+            'genres': [GENRES[i % 3]],
+            'media': MEDIA[i % 3],
+            'styles': [STYLES[i % 3]],
+            'tags': ['tag']
+        }
+    return record
+
+
+def write_image(path, seed: int = 0, size=(64, 48)):
+    """ Write a small JPEG (a valid image if Pillow is available). """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        from PIL import Image
+        import numpy as np
+        rng = np.random.RandomState(seed)
+        array = (rng.rand(size[1], size[0], 3) * 255).astype('uint8')
+        Image.fromarray(array).save(path, format='JPEG')
+    except ImportError:
+        with open(path, 'wb') as f:
+            f.write(b'\xff\xd8' + bytes([seed % 256]) * 32 + b'\xff\xd9')
+
+
+def build_cache(cache_dir, n_painting: int = 6, images: bool = True):
+    """ Create dictionaries/artists files and meta/image trees for `ARTISTS`. """
+    for d in ['meta', 'image', 'image_face', 'image_face_blur']:
+        os.makedirs(f'{cache_dir}/painting/{d}', exist_ok=True)
+    with open(f'{cache_dir}/dictionaries.json', 'w') as f:
+        json.dump({'Impressionism': {'id': '57726b4eedc2cb3880ad6e38', 'url': 'impressionism', 'group': 1}}, f)
+    with open(f'{cache_dir}/artists.json', 'w') as f:
+        json.dump(ARTISTS, f)
+    for n, artist in enumerate(ARTISTS):
+        paintings = [painting(artist, i) for i in range(n_painting)]
+        with open(f'{cache_dir}/painting/meta/{artist}.json', 'w') as f:
+            json.dump(paintings, f)
+        if images:
+            for i, p in enumerate(paintings):
+                write_image(f"{cache_dir}/painting/image/{artist}/{p['url']}.jpg", seed=n * 100 + i)
+    return cache_dir
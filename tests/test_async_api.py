@@ -0,0 +1,78 @@
+""" UnitTest for the asyncio client against the benchmark stand-in of the WikiArt API (offline) """
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark'))
+from mock_server import MockWikiart, MockWikiartServer
+from wikiartcrawler import WikiartAPI
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class Test(unittest.TestCase):
+    """Test the async client shares the cache with WikiartAPI"""
+
+    def test_crawl(self):
+        from wikiartcrawler.async_api import AsyncWikiartAPI
+        corpus = MockWikiart(n_artists=2, n_paintings=12)
+        with MockWikiartServer(corpus, page_size=5) as server, tempfile.TemporaryDirectory() as cache_dir:
+            for d in ['meta', 'image', 'image_face', 'image_face_blur']:
+                os.makedirs(f'{cache_dir}/painting/{d}')
+            with open(f'{cache_dir}/artists.json', 'w') as f:
+                json.dump({a['url']: a['id'] for a in corpus.artists}, f)
+            with open(f'{cache_dir}/dictionaries.json', 'w') as f:
+                json.dump({}, f)
+            artist = corpus.artists[0]['url']
+
+            async def run():
+                async with AsyncWikiartAPI(cache_dir=cache_dir, access_code='a', secret_code='b',
+                                           skip_download=False, session_num=2, rate_limits=((100, 1),)) as api:
+                    self.assertEqual(len(api.scheduler.session_keys), 2)
+                    pages = [page async for page in api.iter_pages(
+                        f"{server.api_root}/PaintingsByArtist?id={corpus.artists[0]['id']}")]
+                    self.assertEqual([len(p['data']) for p in pages], [5, 5, 2])
+                    return await api.get_painting(artist, year_start=1600)
+
+            with mock.patch('wikiartcrawler.async_api.API_ROOT', server.api_root):
+                files = asyncio.run(run())
+            self.assertEqual(len(files), 12)
+            self.assertTrue(all(os.path.exists(p) for p in files))
+            with open(f'{cache_dir}/painting/meta/{artist}.json') as f:
+                self.assertEqual(json.load(f), corpus.records(artist, server.url))
+            # the sync client reads the same cache
+            self.assertEqual(WikiartAPI(cache_dir=cache_dir).get_painting(artist), sorted(files))
+
+    def test_shared_quota(self):
+        from wikiartcrawler.async_api import AsyncWikiartAPI
+        from wikiartcrawler.scheduler import SessionKeyScheduler
+        corpus = MockWikiart(n_artists=1, n_paintings=12)
+        scheduler = SessionKeyScheduler(['shared-key'], ((100, 1),))
+        with MockWikiartServer(corpus, page_size=5) as server, tempfile.TemporaryDirectory() as cache_dir:
+            for name in ['artists.json', 'dictionaries.json']:
+                with open(f'{cache_dir}/{name}', 'w') as f:
+                    json.dump({}, f)
+
+            async def run():
+                async with AsyncWikiartAPI(cache_dir=cache_dir, access_code='a', secret_code='b',
+                                           skip_download=False, scheduler=scheduler) as api:
+                    self.assertIs(api.scheduler, scheduler)
+                    return [page async for page in api.iter_pages(
+                        f"{server.api_root}/PaintingsByArtist?id={corpus.artists[0]['id']}")]
+
+            with mock.patch('wikiartcrawler.async_api.API_ROOT', server.api_root):
+                self.assertEqual(len(asyncio.run(run())), 3)
+            # no login: the requests are made with the key of the shared scheduler and counted in its quota
+            self.assertEqual(scheduler.stats()['shared-key']['used'], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+""" UnitTest for the parallel bootstrap of release archives """
+import io
+import os
+import json
+import hashlib
+import zipfile
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from wikiartcrawler.bootstrap import bootstrap, load_manifest
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for k, v in files.items():
+            z.writestr(k, v)
+    return buffer.getvalue()
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    """ Serve release archives and count the requests. """
+    files = {
+        '/meta.zip': make_zip({'meta/artist-a.json': json.dumps([]), 'meta/artist-b.json': json.dumps([])}),
+        '/g1.zip': make_zip({'g1/artist-a/x.jpg': b'x', 'g1/artist-a/y.jpg': b'y'}),
+        '/g2.zip': make_zip({'g2/artist-a/x.jpg': b'x', 'g2/artist-b/z.jpg': b'z'}),
+        '/image_face.zip': make_zip({'image_face/artist-a/x.jpg': b'face'}),
+    }
+    requested = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        body = self.files[self.path]
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+    """Test bootstrap extracts archives in place and skips completed ones"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ReleaseHandler)
+        url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.archives = [('meta', f'{url}/meta.zip', 'painting/meta'),
+                        ('g1', f'{url}/g1.zip', 'painting/image'),
+                        ('g2', f'{url}/g2.zip', 'painting/image'),
+                        ('image_face', f'{url}/image_face.zip', 'painting/image_face')]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_bootstrap(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            manifest = bootstrap(cache_dir, self.archives, num_extract_workers=2)
+            self.assertEqual(sorted(manifest), ['g1', 'g2', 'image_face', 'meta'])
+            self.assertEqual(manifest['g2']['files'], 2)
+            self.assertEqual(manifest['g2']['checksum'],
+                             f"sha256:{hashlib.sha256(ReleaseHandler.files['/g2.zip']).hexdigest()}")
+            self.assertEqual(sorted(os.listdir(f'{cache_dir}/painting/meta')), ['artist-a.json', 'artist-b.json'])
+            self.assertEqual(sorted(os.listdir(f'{cache_dir}/painting/image/artist-a')), ['x.jpg', 'y.jpg'])
+            self.assertEqual(os.listdir(f'{cache_dir}/painting/image/artist-b'), ['z.jpg'])
+            self.assertEqual(os.listdir(f'{cache_dir}/painting/image_face/artist-a'), ['x.jpg'])
+            self.assertFalse(os.path.exists(f'{cache_dir}/tmp/bootstrap'))
+
+            # completed archives are skipped, a new one is fetched
+            n = len(ReleaseHandler.requested)
+            extra = ('image_face_blur', self.archives[-1][1], 'painting/image_face_blur')
+            bootstrap(cache_dir, self.archives + [extra])
+            self.assertEqual(len(ReleaseHandler.requested), n + 1)
+            self.assertIn('image_face_blur', load_manifest(cache_dir))
+
+    def test_checksum(self):
+        digest = hashlib.sha256(ReleaseHandler.files['/g1.zip']).hexdigest()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            manifest = bootstrap(cache_dir, [self.archives[1] + (f'sha256:{digest}',)], num_extract_workers=1)
+            self.assertEqual(manifest['g1']['checksum'], f'sha256:{digest}')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with self.assertRaises(ValueError):
+                bootstrap(cache_dir, [self.archives[1] + ('sha256:0000',)], num_extract_workers=1)
+            self.assertEqual(load_manifest(cache_dir), {})
+            self.assertFalse(os.path.exists(f'{cache_dir}/painting/image'))
+
+    def test_legacy_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.makedirs(f'{cache_dir}/painting/meta')
+            n = len(ReleaseHandler.requested)
+            bootstrap(cache_dir, self.archives[:1])
+            self.assertEqual(len(ReleaseHandler.requested), n)
+            self.assertEqual(list(load_manifest(cache_dir)), ['meta'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+""" UnitTest for the cache catalog """
+import os
+import time
+import tempfile
+import json
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI, available_artist, get_artist
+from wikiartcrawler.catalog import get_catalog
+from dummy_cache import build_cache, write_image, painting
+
+
+class Test(unittest.TestCase):
+    """Test catalog lookups and mtime invalidation"""
+
+    def test_catalog(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=3)
+            catalog = get_catalog(cache_dir)
+            self.assertIs(catalog, get_catalog(cache_dir))
+            self.assertEqual(available_artist(cache_dir), ['claude-monet', 'paul-cezanne', 'vincent-van-gogh'])
+            self.assertEqual(get_artist(['impressionism', 'post-impressionism'], cache_dir),
+                             ['claude-monet', 'paul-cezanne', 'vincent-van-gogh'])
+            self.assertEqual(get_artist('baroque', cache_dir), [])
+
+            api = WikiartAPI(cache_dir=cache_dir)
+            self.assertEqual(len(api.get_painting('paul-cezanne')), 3)
+            self.assertEqual(len(api.get_painting('*')), 9)
+            self.assertIsNone(api.get_painting('paul-cezanne', image_type='face'))
+
+            # new files and artists are picked up through the directory mtime
+            time.sleep(0.01)
+            write_image(f'{cache_dir}/painting/image/paul-cezanne/new.jpg')
+            write_image(f'{cache_dir}/painting/image_face/paul-cezanne/new.jpg')
+            os.remove(f'{cache_dir}/painting/meta/claude-monet.json')
+            self.assertEqual(len(api.get_painting('paul-cezanne')), 4)
+            self.assertEqual(api.get_painting('paul-*', image_type='face'),
+                             [f'{cache_dir}/painting/image_face/paul-cezanne/new.jpg'])
+            self.assertNotIn('claude-monet', catalog)
+            self.assertEqual(available_artist(cache_dir), ['paul-cezanne', 'vincent-van-gogh'])
+
+    def test_extension(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=2)
+            record = painting('paul-cezanne', 2)
+            record['image'] = record['image'].replace('.jpg', '.png')
+            with open(f'{cache_dir}/painting/meta/paul-cezanne.json') as f:
+                records = json.load(f) + [record]
+            with open(f'{cache_dir}/painting/meta/paul-cezanne.json', 'w') as f:
+                json.dump(records, f)
+            image_dir = f'{cache_dir}/painting/image/paul-cezanne'
+            write_image(f"{image_dir}/{record['url']}.png")
+            write_image(f"{image_dir}/{record['url']}.png.tmp.host.1.2")
+            self.assertEqual(len(get_catalog(cache_dir).images('paul-cezanne')), 3)
+
+            # a cached image of any extension is not downloaded again
+            api = WikiartAPI(cache_dir=cache_dir, skip_download=False)
+            with mock.patch('wikiartcrawler.wikiart_api.download_images') as download:
+                self.assertIn(f"{image_dir}/{record['url']}.png", api.get_painting('paul-cezanne', year_start=1800))
+                download.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+""" UnitTest for the resumable meta crawl """
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI
+from dummy_cache import build_cache
+
+
+def listing(artist, n):
+    """ Paintings of the artist as returned by `PaintingsByArtist` """
+    return [{'id': f'{artist}-{i}', 'url': f'{artist}-{i}', 'artistUrl': artist,
+             'image': f'https://uploads.wikiart.org/images/{artist}/{artist}-{i}.jpg'} for i in range(n)]
+
+
+class Test(unittest.TestCase):
+    """Test checkpointing and resume of get_painting_info crawl"""
+
+    def test_resume(self):
+        artist = 'paul-cezanne'
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, images=False)
+            os.remove(f'{cache_dir}/painting/meta/{artist}.json')
+            api = WikiartAPI(cache_dir=cache_dir, skip_download=False, num_workers=1)
+            paintings = listing(artist, 10)
+            requested = []
+
+            def detail(paint_id, session_key=None, scheduler=None):
+                if len(requested) == 6:
+                    raise ConnectionError('crash')
+                requested.append(paint_id)
+                return {'id': paint_id, 'genres': ['portrait'], 'media': ['oil'], 'styles': []}
+
+            with mock.patch('wikiartcrawler.wikiart_api.api_request', return_value=paintings), \
+                    mock.patch('wikiartcrawler.wikiart_api.get_painting_detail', side_effect=detail):
+                with self.assertRaises(ConnectionError):
+                    api.get_painting_info(artist)
+                with open(f'{cache_dir}/painting/checkpoint/{artist}.jsonl') as f:
+                    self.assertEqual(len(f.read().splitlines()), 6)
+                requested.append(None)  # let the resumed crawl pass
+                info = api.get_painting_info(artist, genre=['portrait'])
+
+            self.assertEqual(len(requested), 11)  # 6 before the crash + marker + 4 after resume
+            self.assertEqual([i['id'] for i in info], [i['id'] for i in paintings])
+            self.assertFalse(os.path.exists(f'{cache_dir}/painting/checkpoint/{artist}.jsonl'))
+            with open(f'{cache_dir}/painting/meta/{artist}.json') as f:
+                self.assertEqual(len(json.load(f)), 10)
+
+    def test_crawl_many(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, images=False)
+            for a in ['paul-cezanne', 'claude-monet']:
+                os.remove(f'{cache_dir}/painting/meta/{a}.json')
+            api = WikiartAPI(cache_dir=cache_dir, skip_download=False)
+            with mock.patch('wikiartcrawler.wikiart_api.api_request',
+                            side_effect=lambda *args, **kwargs: listing('x', 3)), \
+                    mock.patch('wikiartcrawler.wikiart_api.get_painting_detail', return_value={'genres': []}):
+                out = api.crawl(['paul-cezanne', 'claude-monet', 'vincent-van-gogh'])
+            self.assertEqual(out, {'claude-monet': 3, 'paul-cezanne': 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+""" UnitTest for the perceptual-hash dedup index """
+import random
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.dedup import BKTree, hamming, phash, dhash
+from dummy_cache import build_cache
+
+
+class Test(unittest.TestCase):
+    """Test hashing, BK-tree search and get_painting(dedup=True)"""
+
+    def test_bktree(self):
+        rng = random.Random(0)
+        values = [rng.getrandbits(64) for _ in range(500)]
+        tree = BKTree()
+        for n, v in enumerate(values):
+            tree.add(v, n)
+        for query in values[:20]:
+            expected = sorted(n for n, v in enumerate(values) if hamming(query, v) <= 20)
+            self.assertEqual(sorted(n for _, n in tree.search(query, 20)), expected)
+
+    def test_dedup(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=4)
+            source = f'{cache_dir}/painting/image/paul-cezanne/paul-cezanne-painting-0.jpg'
+            # a resized reproduction of the same work under another artist, and an exact copy
+            copy = f'{cache_dir}/painting/image/claude-monet/claude-monet-painting-3.jpg'
+            with Image.open(source) as img:
+                img.resize((128, 96)).save(copy, quality=70)
+            shutil.copy(source, f'{cache_dir}/painting/image/vincent-van-gogh/vincent-van-gogh-painting-2.jpg')
+            self.assertLessEqual(hamming(phash(source), phash(copy)), 4)
+            self.assertLessEqual(hamming(dhash(source), dhash(copy)), 4)
+
+            api = WikiartAPI(cache_dir=cache_dir)
+            index = api.build_dedup_index(num_workers=2)
+            self.assertEqual(len(index.entries), 12)
+            self.assertEqual(index.clusters(), [['claude-monet-0003', 'paul-cezanne-0000', 'vincent-van-gogh-0002']])
+            self.assertEqual(len(api.get_painting('claude-monet', dedup=True)), 4)
+            self.assertEqual(len(api.get_painting('paul-cezanne', dedup=True)), 3)
+            self.assertEqual(len(api.get_painting('vincent-van-gogh', media=['oil'], dedup=True)), 2)
+            self.assertEqual(len(api.get_painting('vincent-van-gogh', media=['oil'])), 3)
+
+            # an image cached after the build is hashed before the index is used
+            shutil.copy(source, f'{cache_dir}/painting/image/claude-monet/extra.jpg')
+            self.assertEqual(len(api.get_painting('claude-monet')), 5)
+            self.assertEqual(len(api.get_painting('claude-monet', dedup=True)), 4)
+            self.assertEqual(len(WikiartAPI(cache_dir=cache_dir).dedup_index().entries), 13)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+""" UnitTest for the adaptive artist discovery (offline, through the benchmark stand-in server) """
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark'))
+from mock_server import MockWikiart, MockWikiartServer
+from wikiartcrawler import WikiartAPI, configure_session
+from wikiartcrawler.session import DEFAULT_CONFIG
+from wikiartcrawler.wikiart_api import CUSTOM_ARTISTS
+from wikiartcrawler.discovery import ArtistDiscovery
+from dummy_cache import build_cache
+
+NO_LIMIT = ((1000, 1),)
+
+
+def mock_corpus():
+    """ Corpus where `UpdatedArtists` lists only two artists """
+    corpus = MockWikiart(n_artists=12, n_paintings=8)
+    for a in corpus.artists[2:]:
+        a['lastUpdated'] = ''
+    return corpus
+
+
+class Test(unittest.TestCase):
+    """Test the coverage, the number of requests and the resume of the discovery"""
+
+    def setUp(self):
+        configure_session(max_retries=0)
+
+    def tearDown(self):
+        configure_session(**DEFAULT_CONFIG)
+
+    def test_expand(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            discovery = ArtistDiscovery(f'{tmp}/state.json', {'a': '1'}, alphabet='xy', max_depth=3)
+            self.assertEqual(discovery.pending(), ['x', 'y'])
+            discovery.add('x', [{'artistUrl': 'a', 'artistId': '1'}], saturated=True)
+            discovery.add('y', [{'artistUrl': 'b', 'artistId': '2'}], saturated=True)
+            # one-letter terms are expanded even if their first page only lists known artists
+            self.assertEqual(discovery.expand().pending(), ['xx', 'xy', 'yx', 'yy'])
+            discovery.add('xx', [{'artistUrl': 'a', 'artistId': '1'}], saturated=True)
+            discovery.add('xy', None, saturated=False)
+            discovery.add('yx', [{'artistUrl': 'c', 'artistId': '3'}], saturated=True)
+            resumed = ArtistDiscovery(f'{tmp}/state.json', {})
+            self.assertEqual(resumed.pending(), ['yy'])
+            resumed.add('yy', [{'artistUrl': 'b', 'artistId': '2'}], saturated=False)
+            # `xx` brought no new artist and `yy` is complete: both are pruned
+            self.assertEqual(resumed.expand().pending(), ['yxx', 'yxy'])
+            resumed.add('yxx', [{'artistUrl': 'd', 'artistId': '4'}], saturated=True)
+            resumed.add('yxy', [], saturated=False)
+            self.assertTrue(resumed.expand().done)  # maximum depth
+            self.assertEqual(resumed.close(), {'a': '1', 'b': '2', 'c': '3', 'd': '4'})
+            self.assertFalse(os.path.exists(f'{tmp}/state.json'))
+
+    def test_discovery(self):
+        corpus = mock_corpus()
+        expected = dict({a['url']: a['id'] for a in corpus.artists}, **CUSTOM_ARTISTS)
+        with MockWikiartServer(corpus, page_size=20, api_rate_limits=NO_LIMIT) as server, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, images=False)
+            api = WikiartAPI(cache_dir=cache_dir, skip_download=False, num_workers=4, rate_limits=NO_LIMIT)
+            with mock.patch('wikiartcrawler.wikiart_api.API_ROOT', server.api_root):
+                search = api._search_paintings
+                with mock.patch.object(api, '_search_paintings', side_effect=[search('a')] + [KeyboardInterrupt]):
+                    with self.assertRaises(KeyboardInterrupt):
+                        api.get_full_artist(True)
+                server.stats['api'] = 0
+                self.assertEqual(api.get_full_artist(True), expected)
+            # one page per term, far below the 676 fully paginated terms of the two-letter sweep
+            self.assertLess(server.stats['api'], 676 // 2)
+            with open(f'{cache_dir}/artists.json') as f:
+                self.assertEqual(json.load(f), expected)
+            self.assertFalse(os.path.exists(f'{cache_dir}/discovery_state.json'))
+
+    def test_async(self):
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            self.skipTest('requires aiohttp')
+        from wikiartcrawler import AsyncWikiartAPI
+        corpus = mock_corpus()
+        with MockWikiartServer(corpus, page_size=20, api_rate_limits=NO_LIMIT) as server, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, images=False)
+
+            async def run():
+                with mock.patch('wikiartcrawler.async_api.API_ROOT', server.api_root):
+                    api = AsyncWikiartAPI(cache_dir=cache_dir, skip_download=False, rate_limits=NO_LIMIT)
+                    async with api:
+                        return await api.get_full_artist(True)
+
+            self.assertEqual(asyncio.run(run()), dict({a['url']: a['id'] for a in corpus.artists}, **CUSTOM_ARTISTS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+""" UnitTest for crawl coordination over a shared cache directory """
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.distributed import hash_partition, Lease, LeaseQueue
+from dummy_cache import build_cache, painting, ARTISTS
+
+
+class Test(unittest.TestCase):
+    """Test hash partitioning, leases and two workers crawling one cache"""
+
+    def test_hash_partition(self):
+        items = [f'artist-{i}' for i in range(100)]
+        parts = [hash_partition(items, r, 3) for r in range(3)]
+        self.assertEqual(sorted(sum(parts, [])), sorted(items))
+        self.assertTrue(all(len(p) > 20 for p in parts))
+        self.assertEqual(parts[1], hash_partition(list(reversed(items)), 1, 3)[::-1])
+
+    def test_lease(self):
+        with tempfile.TemporaryDirectory() as d:
+            a, b = Lease(f'{d}/x.lease', 'a', ttl=0.2), Lease(f'{d}/x.lease', 'b', ttl=0.2)
+            self.assertTrue(a.acquire())
+            self.assertFalse(b.acquire())
+            time.sleep(0.3)  # a does not renew: the lease expires
+            self.assertTrue(b.acquire())
+            self.assertFalse(a.owned())
+            a.release()
+            self.assertTrue(os.path.exists(f'{d}/x.lease'))
+            b.release()
+            self.assertFalse(os.path.exists(f'{d}/x.lease'))
+
+            # a lock file being written is held until it is older than the ttl
+            with open(f'{d}/x.lease', 'w') as f:
+                f.write('{"own')
+            self.assertFalse(a.acquire())
+            time.sleep(0.3)
+            self.assertTrue(a.acquire())
+            a.release()
+
+            # the leases are renewed while the items are processed
+            queue = LeaseQueue(d, 'a', ttl=0.3)
+            for item in queue.claim(['x', 'y']):
+                time.sleep(0.5)
+                self.assertFalse(Lease(f'{d}/{item}.lease', 'b').acquire())
+            self.assertEqual(os.listdir(d), [])
+
+    def test_crawl(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, images=False)
+            for a in ARTISTS:
+                os.remove(f'{cache_dir}/painting/meta/{a}.json')
+            crawled = []
+
+            def listing(url, session_key=None, ignore_error=False, scheduler=None):
+                artist = [a for a, i in ARTISTS.items() if i == url.split('=')[-1]][0]
+                crawled.append(artist)
+                time.sleep(0.1)
+                return [painting(artist, i, with_detail=False) for i in range(3)]
+
+            def detail(paint_id, session_key=None, scheduler=None):
+                return {'id': paint_id, 'genres': ['portrait'], 'media': ['oil'], 'styles': []}
+
+            with mock.patch('wikiartcrawler.wikiart_api.api_request', side_effect=listing), \
+                    mock.patch('wikiartcrawler.wikiart_api.get_painting_detail', side_effect=detail):
+                workers = [WikiartAPI(cache_dir=cache_dir, skip_download=False, num_workers=1, worker_id=w)
+                           for w in ['w0', 'w1']]
+                outputs = [{}, {}]
+                threads = [threading.Thread(target=lambda n: outputs[n].update(workers[n].crawl(lease=True)),
+                                            args=(n,)) for n in range(2)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            self.assertEqual(sorted(crawled), sorted(ARTISTS))
+            self.assertEqual(sorted(list(outputs[0]) + list(outputs[1])), sorted(ARTISTS))
+            for a in ARTISTS:
+                with open(f'{cache_dir}/painting/meta/{a}.json') as f:
+                    self.assertEqual(len(json.load(f)), 3)
+            self.assertEqual(os.listdir(f'{cache_dir}/lock/crawl'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+""" UnitTest for the concurrent image downloader """
+import os
+import time
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from wikiartcrawler.downloader import TokenBucket, download_images
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """ Serve the request path as the image content. """
+
+    def do_GET(self):
+        if 'missing' in self.path:
+            self.send_error(404)
+            return
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+    """Test concurrent image download"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_download_order(self):
+        with tempfile.TemporaryDirectory() as d:
+            urls = [f'{self.url}/image-{i}.jpg' for i in range(30)]
+            paths = [f'{d}/{i}.jpg' for i in range(30)]
+            out = download_images(urls, paths, num_workers=8, rate=1000)
+            self.assertEqual(out, paths)
+            for i, p in enumerate(paths):
+                with open(p, 'rb') as f:
+                    self.assertEqual(f.read(), f'/image-{i}.jpg'.encode())
+
+    def test_download_error(self):
+        with tempfile.TemporaryDirectory() as d:
+            urls = [f'{self.url}/image-{i}.jpg' for i in range(4)] + [f'{self.url}/missing.jpg']
+            paths = [f'{d}/{i}.jpg' for i in range(5)]
+            for num_workers in [1, 4]:
+                self.assertEqual(download_images(urls, paths, num_workers=num_workers, rate=1000), paths[:4])
+                self.assertFalse(os.path.exists(paths[4]))
+
+    def test_rate_limit(self):
+        bucket = TokenBucket(rate=20, capacity=5)
+        with tempfile.TemporaryDirectory() as d:
+            start = time.monotonic()
+            download_images([f'{self.url}/{i}.jpg' for i in range(15)], [f'{d}/{i}.jpg' for i in range(15)],
+                            num_workers=8, bucket=bucket)
+            # the bucket starts empty: 15 tokens at 20 per second
+            self.assertGreaterEqual(time.monotonic() - start, 0.7)
+            self.assertEqual(len(os.listdir(d)), 15)
+
+        # no window of one second takes more than the rate
+        bucket = TokenBucket(rate=20)
+        times = []
+        for _ in range(30):
+            bucket.acquire()
+            times.append(time.monotonic())
+        self.assertLessEqual(max(sum(t <= s + 1 for t in times[n:]) for n, s in enumerate(times)), 21)
+
+
+if __name__ == "__main__":
+    unittest.main()
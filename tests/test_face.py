@@ -0,0 +1,83 @@
+""" UnitTest for the face extraction and corner blur """
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.face import corner_blur_mask, blur_corners, extract_face, extract_faces, cv2
+from dummy_cache import build_cache, write_image
+
+
+class CenterDetector:
+    """ A face in the middle of the (padded) image, or none for small images """
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        if min(h, w) < 150:
+            return []
+        return [((w // 2 - 20, h // 2 - 20, 40, 40), ((w // 2 - 10, h // 2 - 10), (w // 2 + 10, h // 2 - 5)))]
+
+
+class Test(unittest.TestCase):
+    """Test the blur mask, the crop and the incremental extraction"""
+
+    def test_blur(self):
+        mask = corner_blur_mask(64)
+        self.assertEqual(mask.shape, (64, 64, 1))
+        self.assertEqual(mask[32, 32, 0], 1)
+        self.assertEqual(mask[0, 0, 0], 0)
+        self.assertTrue(np.allclose(mask, mask[::-1, ::-1]))
+        images = (np.random.RandomState(0).rand(3, 64, 64, 3) * 255).astype(np.uint8)
+        blurred = blur_corners(images)
+        self.assertEqual(blurred.shape, images.shape)
+        self.assertTrue(np.array_equal(blurred[:, 28:36, 28:36], images[:, 28:36, 28:36]))
+        self.assertLess(blurred[:, :4, :4].std(), images[:, :4, :4].std())
+        self.assertTrue(np.array_equal(blur_corners(images[0]), blurred[0]))
+
+    def test_extract(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_image(f'{tmp}/large.jpg', size=(160, 120))
+            write_image(f'{tmp}/small.jpg', size=(64, 48))
+            face = extract_face(f'{tmp}/large.jpg', CenterDetector(), size=32)
+            self.assertEqual(face.shape, (32, 32, 3))
+            self.assertIsNone(extract_face(f'{tmp}/small.jpg', CenterDetector()))
+            items = [(f'{tmp}/{i}.jpg', f'{tmp}/face/{i}.jpg', f'{tmp}/blur/{i}.jpg') for i in ['large', 'small']]
+            self.assertEqual(extract_faces(items, CenterDetector(), size=32, num_workers=2), [True, False])
+            with Image.open(f'{tmp}/blur/large.jpg') as img:
+                self.assertEqual(img.size, (32, 32))
+            self.assertEqual(sorted(os.listdir(f'{tmp}/face')), ['large.jpg'])
+
+            # the outputs of an image without face anymore (eg. with other parameters) are removed
+            self.assertEqual(extract_faces(items[:1], CenterDetector(), size=32, num_workers=1), [True])
+            write_image(f'{tmp}/large.jpg', size=(64, 48))
+            self.assertEqual(extract_faces(items[:1], CenterDetector(), size=32, num_workers=1), [False])
+            self.assertEqual(os.listdir(f'{tmp}/face') + os.listdir(f'{tmp}/blur'), [])
+
+            # an unreadable image counts as one without face and keeps its outputs
+            write_image(f'{tmp}/large.jpg', size=(160, 120))
+            self.assertEqual(extract_faces(items[:1], CenterDetector(), size=32, num_workers=1), [True])
+            with open(f'{tmp}/large.jpg', 'wb') as f:
+                f.write(b'<html>blocked</html>')
+            self.assertEqual(extract_faces(items, CenterDetector(), size=32, num_workers=1), [False, False])
+            self.assertEqual(os.listdir(f'{tmp}/face') + os.listdir(f'{tmp}/blur'), ['large.jpg', 'large.jpg'])
+
+    @unittest.skipIf(cv2 is None or not hasattr(cv2, 'CascadeClassifier'), 'requires OpenCV with Haar cascades')
+    def test_api(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir)
+            api = WikiartAPI(cache_dir=cache_dir)
+            # random noise has no face: the portraits are recorded so that a rerun skips them
+            self.assertEqual(api.extract_faces(num_workers=2), {'processed': 6, 'faces': 0, 'no_face': 6})
+            self.assertEqual(api.extract_faces(num_workers=2)['processed'], 0)
+            self.assertEqual(api.extract_faces('claude-monet', force=True, num_workers=2)['processed'], 2)
+            with open(f'{cache_dir}/painting/face_state.json') as f:
+                self.assertEqual(len(json.load(f)['no_face']), 6)
+            self.assertEqual(api.extract_faces(size=128, num_workers=2)['processed'], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+""" UnitTest for the visual feature index and the similarity search """
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler import features
+from wikiartcrawler.features import image_features, FeatureIndex, FEATURE_DIM
+from dummy_cache import build_cache
+
+
+class Test(unittest.TestCase):
+    """Test the features, the chunked top-k search and the incremental index"""
+
+    def test_search(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = FeatureIndex(tmp)
+            rng = np.random.RandomState(0)
+            matrix = rng.rand(10, FEATURE_DIM).astype(np.float32)
+            with open(index.matrix_file, 'wb') as f:
+                f.write(matrix.tobytes())
+            index.keys = [f'k{i}' for i in range(10)]
+            index._row = {k: n for n, k in enumerate(index.keys)}
+            queries = rng.rand(3, FEATURE_DIM).astype(np.float32)
+            expected = np.argsort(-(queries @ matrix.T), axis=1)[:, :4]
+            with mock.patch.object(features, 'SEARCH_CHUNK', 3):
+                result = index.search(queries, k=4)
+                self.assertEqual([[k for k, _ in r] for r in result], [[f'k{i}' for i in e] for e in expected])
+                candidates = sorted([1, 2, 9], key=lambda i: -queries[0] @ matrix[i])
+                self.assertEqual([k for k, _ in index.search(queries[0], k=2, candidates=['k1', 'k2', 'k9'])],
+                                 [f'k{i}' for i in candidates[:2]])
+
+    def test_similar_paintings(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir)
+            image_dir = f'{cache_dir}/painting/image'
+            source = f'{image_dir}/paul-cezanne/paul-cezanne-painting-0.jpg'
+            # a slightly brighter copy of a painting of another artist
+            with Image.open(source) as img:
+                array = np.asarray(img).astype(np.int64)
+            Image.fromarray(np.clip(array + 8, 0, 255).astype(np.uint8)).save(
+                f'{image_dir}/claude-monet/claude-monet-painting-5.jpg')
+            self.assertAlmostEqual(float(np.linalg.norm(image_features(source))), 1, places=5)
+
+            api = WikiartAPI(cache_dir=cache_dir)
+            index = api.build_feature_index(batch_size=4, num_workers=2)
+            self.assertEqual(len(index), 18)
+            result = api.similar_paintings('paul-cezanne-0000', k=3)
+            self.assertEqual(len(result), 3)
+            self.assertEqual(result[0][:2],
+                             ('claude-monet-0005', f'{image_dir}/claude-monet/claude-monet-painting-5.jpg'))
+            self.assertEqual([r[0][0] for r in api.similar_paintings([source], k=1)], ['claude-monet-0005'])
+            self.assertTrue(all(i[0].startswith('vincent') for i in api.similar_paintings(
+                source, k=5, artist_url='vincent-van-gogh')))
+
+            # only new images are computed, and removed images are dropped
+            os.remove(f'{image_dir}/vincent-van-gogh/vincent-van-gogh-painting-0.jpg')
+            self.assertEqual(index.version, 1)
+            index = api.build_feature_index(num_workers=2)
+            self.assertEqual((len(index), index.version), (17, 2))
+            vector = FeatureIndex(f'{cache_dir}/painting/features').vector('paul-cezanne-0000')
+            self.assertTrue(np.array_equal(vector, image_features(source)))
+            with mock.patch.object(features, '_features_batch', side_effect=AssertionError):
+                self.assertEqual(api.build_feature_index(num_workers=2).version, 2)
+
+            # an unreadable image is a row of zeros until it is readable again
+            broken = f'{image_dir}/claude-monet/claude-monet-painting-4.jpg'
+            os.rename(broken, f'{broken}.bak')
+            with open(broken, 'wb') as f:
+                f.write(b'<html>blocked</html>')
+            index = api.build_feature_index(num_workers=2)
+            self.assertEqual(index.failed, {'claude-monet-0004'})
+            self.assertFalse(index.vector('claude-monet-0004').any())
+            os.replace(f'{broken}.bak', broken)
+            os.utime(broken, (os.path.getatime(broken), index.mtimes[index.keys.index('claude-monet-0004')]))
+            index = api.build_feature_index(num_workers=2)
+            self.assertEqual((index.failed, index.version), (set(), 4))
+            self.assertTrue(index.vector('claude-monet-0004').any())
+            self.assertEqual(sorted(os.listdir(f'{cache_dir}/painting/features')),
+                             ['features.3.f32', 'features.4.f32', 'index.json'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+""" UnitTest for the image dimension/integrity index """
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.image_index import read_jpeg_header, scan_image
+from dummy_cache import build_cache, write_image
+
+
+class Test(unittest.TestCase):
+    """Test JPEG header parsing, corrupt file detection and the size filters of get_painting"""
+
+    def test_header(self):
+        for mode in ['RGB', 'L', 'CMYK']:
+            for progressive in [False, True]:
+                buffer = io.BytesIO()
+                Image.new(mode, (123, 45)).save(buffer, format='JPEG', progressive=progressive, dpi=(72, 72))
+                buffer.seek(0)
+                self.assertEqual(read_jpeg_header(buffer), (123, 45))
+        self.assertIsNone(read_jpeg_header(io.BytesIO(b'<html>blocked</html>')))
+
+    def test_png(self):
+        with tempfile.TemporaryDirectory() as d:
+            Image.new('RGB', (30, 20)).save(f'{d}/image.png')
+            with open(f'{d}/blocked.jpg', 'wb') as f:
+                f.write(b'<html>blocked</html>')
+            self.assertEqual([scan_image(f'{d}/image.png')[k] for k in ['width', 'height', 'complete']], [30, 20, True])
+            self.assertFalse(scan_image(f'{d}/blocked.jpg')['complete'])
+
+    def test_get_painting(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=4)
+            image_dir = f'{cache_dir}/painting/image/paul-cezanne'
+            write_image(f'{image_dir}/paul-cezanne-painting-1.jpg', size=(200, 50))
+            truncated = f'{image_dir}/paul-cezanne-painting-2.jpg'
+            with open(truncated, 'rb') as f:
+                data = f.read()
+            with open(truncated, 'wb') as f:
+                f.write(data[:len(data) // 2])
+            self.assertFalse(scan_image(truncated)['complete'])
+            self.assertEqual(scan_image(f'{image_dir}/paul-cezanne-painting-1.jpg')['width'], 200)
+
+            api = WikiartAPI(cache_dir=cache_dir)
+            # the meta information (400px or more) does not match the cached files (64 x 48)
+            self.assertEqual(len(api.get_painting('paul-cezanne', min_width=100, min_height=40)), 4)
+            index = api.build_image_index(num_workers=2)
+            self.assertEqual(len(index.entries), 12)
+            self.assertEqual(index.corrupt, [truncated])
+            self.assertEqual(len(api.get_painting('paul-cezanne', max_aspect_ratio=2)), 2)
+            self.assertEqual(api.get_painting('paul-cezanne', min_width=100, min_height=40),
+                             [f'{image_dir}/paul-cezanne-painting-1.jpg'])
+            self.assertEqual(len(api.get_painting('claude-monet', max_aspect_ratio=2, genre=['portrait'])), 2)
+            # downloads are disabled: the corrupt image is reported but not removed
+            self.assertEqual(api.repair_images(), [truncated])
+            self.assertTrue(os.path.exists(truncated))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+""" Import-time benchmark: `import wikiartcrawler` must stay light """
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_IMPORT_TIME = 0.5  # seconds, generous bound for slow CI nodes (about 10ms locally)
+SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import wikiartcrawler
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+
+class Test(unittest.TestCase):
+    """Test package import is fast and free of side effects"""
+
+    def test_import_time(self):
+        with tempfile.TemporaryDirectory() as home:
+            env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+            out = subprocess.run([sys.executable, '-c', SCRIPT], env=env, capture_output=True, check=True, text=True)
+            out = json.loads(out.stdout)
+            self.assertFalse(os.path.exists(f'{home}/.cache/wikiartcrawler'))
+        for heavy in ['requests', 'tqdm', 'numpy', 'wikiartcrawler.wikiart_api', 'wikiartcrawler.groups.baroque']:
+            self.assertNotIn(heavy, out['modules'])
+        self.assertLess(out['elapsed'], MAX_IMPORT_TIME)
+
+    def test_lazy_group(self):
+        from wikiartcrawler import artist_group
+        self.assertIn('caravaggio', artist_group.baroque)
+        self.assertEqual(artist_group.load_artists('baroque'), artist_group.baroque)
+        with self.assertRaises(ValueError):
+            artist_group.load_artists('cubism')
+        with self.assertRaises(AttributeError):
+            getattr(artist_group, 'cubism')
+
+
+if __name__ == "__main__":
+    unittest.main()
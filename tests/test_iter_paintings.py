@@ -0,0 +1,43 @@
+""" UnitTest for the streaming painting iterator """
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI
+from dummy_cache import build_cache
+
+
+class Test(unittest.TestCase):
+    """Test lazy iteration, prefetch and rank sharding"""
+
+    def test_iter(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=5)
+            api = WikiartAPI(cache_dir=cache_dir)
+            records = list(api.iter_paintings(media=['oil']))
+            expected = []
+            for a in ['claude-monet', 'paul-cezanne', 'vincent-van-gogh']:
+                expected += api.get_painting(a, media=['oil'])
+            self.assertEqual([p for _, p in records], expected)
+            self.assertTrue(all('oil' in m['detail']['media'] for m, _ in records))
+
+            prefetched = list(api.iter_paintings(media=['oil'], prefetch_size=2))
+            self.assertEqual(prefetched, records)
+
+            # every rank gets whole artists and only reads its own
+            shards = [list(api.iter_paintings(media=['oil'], rank=r, world_size=3)) for r in range(3)]
+            self.assertEqual(sum(len(s) for s in shards), len(records))
+            self.assertEqual(sorted(p for s in shards for _, p in s), sorted(expected))
+            artists = [set(m['artistUrl'] for m, _ in s) for s in shards]
+            self.assertEqual(sum(len(a) for a in artists), 3)
+            with mock.patch.object(api, 'get_painting', wraps=api.get_painting) as get_painting:
+                list(api.iter_paintings(media=['oil'], rank=0, world_size=3))
+                self.assertEqual(set(c[0][0] for c in get_painting.call_args_list), artists[0])
+
+            # the index gives the same records, with the detail section
+            api.build_meta_index()
+            self.assertEqual(list(api.iter_paintings(media=['oil'])), records)
+
+
+if __name__ == "__main__":
+    unittest.main()
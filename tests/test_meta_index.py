@@ -0,0 +1,71 @@
+""" UnitTest for the columnar meta index """
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.meta_index import MetaIndex
+from dummy_cache import build_cache
+
+FILTERS = [
+    {},
+    {'year_start': 1862, 'year_end': 1864},
+    {'media': ['oil', 'canvas']},
+    {'media': ['oil', 'canvas'], 'genre': ['portrait']},
+    {'style': ['Impressionism']},
+    {'max_aspect_ratio': 1.3, 'min_height': 450},
+    {'min_width': 600, 'genre': ['landscape', 'still life']},
+]
+
+
+class Test(unittest.TestCase):
+    """Test vectorized filters agree with get_painting_info"""
+
+    def test_query(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=12)
+            api = WikiartAPI(cache_dir=cache_dir)
+            self.assertIsNone(api.meta_index)
+            paths = [api.get_painting('paul-cezanne', **f) for f in FILTERS]
+            index = api.build_meta_index()
+            self.assertEqual(len(index), 36)
+            for f, p in zip(FILTERS, paths):
+                expected = []
+                for a in ['claude-monet', 'paul-cezanne', 'vincent-van-gogh']:
+                    expected += [i['id'] for i in api.get_painting_info(a, **f)]
+                self.assertEqual([i['id'] for i in api.query_painting(**f)], expected, f)
+                if len(f) > 0:
+                    self.assertEqual(api.get_painting('paul-cezanne', **f), p, f)
+            # reloaded from disk by a new instance
+            self.assertEqual(len(WikiartAPI(cache_dir=cache_dir).query_painting('paul-cezanne', media=['oil'])), 8)
+
+            # a meta file rewritten in place (the mtime of the directory does not change)
+            meta_file = f'{cache_dir}/painting/meta/paul-cezanne.json'
+            with open(meta_file) as f:
+                paintings = json.load(f)
+            with open(meta_file, 'w') as f:
+                json.dump(paintings[:4], f)
+            os.utime(meta_file, (os.path.getatime(meta_file), os.path.getmtime(meta_file) + 10))
+            # a new artist moved into the meta directory (its mtime changes)
+            with open(f'{cache_dir}/painting/new-artist.json', 'w') as f:
+                json.dump(paintings[:2], f)
+            os.replace(f'{cache_dir}/painting/new-artist.json', f'{cache_dir}/painting/meta/new-artist.json')
+            api = WikiartAPI(cache_dir=cache_dir)
+            with mock.patch.object(MetaIndex, 'load', wraps=MetaIndex.load) as load:
+                self.assertFalse(api.meta_index.is_fresh('paul-cezanne', f'{cache_dir}/painting/meta'))
+                self.assertTrue(api.meta_index.is_fresh('claude-monet', f'{cache_dir}/painting/meta'))
+                self.assertEqual(len(api.get_painting('paul-cezanne', year_start=1800)), 4)
+                self.assertEqual(len(api.get_painting('claude-monet', year_start=1800)), 12)
+                self.assertEqual(len(api.query_painting('paul-cezanne')), 4)
+                self.assertEqual([i['artistUrl'] for i in api.query_painting(year_start=1800)],
+                                 ['claude-monet'] * 12 + ['new-artist'] * 2 + ['paul-cezanne'] * 4 +
+                                 ['vincent-van-gogh'] * 12)
+                self.assertEqual(load.call_count, 1)
+            # the other artists are still read from the index until it is rebuilt
+            self.assertTrue(api.meta_index.is_fresh('claude-monet', f'{cache_dir}/painting/meta'))
+            self.assertTrue(api.build_meta_index().is_fresh('paul-cezanne', f'{cache_dir}/painting/meta'))
+
+if __name__ == "__main__":
+    unittest.main()
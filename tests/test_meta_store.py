@@ -0,0 +1,61 @@
+""" UnitTest for the compressed meta store """
+import os
+import json
+import tempfile
+import unittest
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.meta_store import write_meta_store, read_meta_store, store_path, zstandard
+from dummy_cache import build_cache, painting
+
+FILTERS = [{}, {'genre': ['portrait']}, {'media': ['oil'], 'year_start': 1862}, {'style': ['Cubism']},
+           {'max_aspect_ratio': 1.2}]
+
+
+class Test(unittest.TestCase):
+    """Test the round trip, the lazy detail and the migration of the meta cache"""
+
+    def test_round_trip(self):
+        records = [painting('paul-cezanne', i) for i in range(4)] + [painting('paul-cezanne', 4, False)]
+        records[0]['year'] = '1860'
+        records[1]['detail'] = None
+        del records[2]['title']
+        with tempfile.TemporaryDirectory() as tmp:
+            for compression in ['zlib'] + (['zstd'] if zstandard is not None else []):
+                write_meta_store(records, f'{tmp}/meta.bin', compression)
+                decoded = read_meta_store(f'{tmp}/meta.bin')
+                self.assertIsNotNone(decoded[0]._raw)
+                self.assertEqual(decoded[0]['url'], records[0]['url'])
+                self.assertIsNotNone(decoded[0]._raw)  # light fields do not decode the detail
+                self.assertEqual([dict(i.items()) for i in decoded], records)
+                self.assertIsNone(decoded[0]._raw)
+                self.assertNotIn('title', decoded[2])
+                self.assertIsNone(decoded[4].get('detail'))
+                with self.assertRaises(AttributeError):
+                    decoded[0].other = 1
+
+    def test_migrate(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir)
+            api = WikiartAPI(cache_dir=cache_dir)
+            expected = [api.get_painting_info('claude-monet', **kwargs) for kwargs in FILTERS]
+            self.assertEqual(len(api.migrate_meta(num_workers=2)), 3)
+            self.assertEqual(api.migrate_meta(num_workers=2), [])
+            self.assertEqual([api.get_painting_info('claude-monet', **kwargs) for kwargs in FILTERS], expected)
+            json.dumps(api.get_painting_info('claude-monet'))
+            self.assertEqual(type(next(api.iter_paintings('claude-monet'))[0]), dict)
+            self.assertEqual(len(api.get_painting('claude-monet', genre=['portrait'])), 2)
+
+            # a crawl rewrites the meta JSON: the older meta store is ignored until the next migration
+            meta_file = f'{cache_dir}/painting/meta/claude-monet.json'
+            with open(meta_file, 'w') as f:
+                json.dump([painting('claude-monet', 0)], f)
+            store = store_path(cache_dir, 'claude-monet')
+            os.utime(meta_file, (os.path.getmtime(store) + 1, os.path.getmtime(store) + 1))
+            self.assertEqual(len(api.get_painting_info('claude-monet')), 1)
+            self.assertEqual(api.migrate_meta(num_workers=2), ['claude-monet'])
+            self.assertEqual(len(read_meta_store(store)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
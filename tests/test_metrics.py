@@ -0,0 +1,60 @@
+""" UnitTest for the crawl metrics """
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import metrics
+from wikiartcrawler.metrics import Metrics
+
+
+class Test(unittest.TestCase):
+    """Test counters, histograms, exports and the instrumentation of api_request"""
+
+    def test_registry(self):
+        m = Metrics(buckets=(0.1, 1))
+        m.inc('requests_total', endpoint='Painting', status=200)
+        m.inc('requests_total', 2, endpoint='Painting', status=429)
+        m.inc('cache_total', 3, result='hit')
+        m.inc('cache_total', result='miss')
+        for v in [0.05, 0.5, 5]:
+            m.observe('latency_seconds', v, endpoint='Painting')
+        self.assertEqual(m.value('requests_total', endpoint='Painting'), 3)
+        self.assertEqual(m.value('requests_total', status=429), 2)
+        self.assertEqual(m.hit_ratio('cache_total'), 0.75)
+
+        snapshot = m.snapshot()
+        self.assertEqual(snapshot['hit_ratios'], {'cache_total': 0.75})
+        histogram = snapshot['histograms']['latency_seconds'][0]
+        self.assertEqual((histogram['buckets'], histogram['count']), ({'0.1': 1, '1': 2}, 3))
+
+        text = m.to_prometheus()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{endpoint="Painting",status="429"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="Painting",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="Painting",le="+Inf"} 3', text)
+        with tempfile.TemporaryDirectory() as d:
+            m.dump(f'{d}/metrics.prom')
+            m.dump(f'{d}/metrics.json')
+            with open(f'{d}/metrics.prom') as f:
+                self.assertEqual(f.read(), text)
+            with open(f'{d}/metrics.json') as f:
+                self.assertEqual(json.load(f)['counters']['cache_total'][0], {'labels': {'result': 'hit'}, 'value': 3})
+            self.assertEqual(sorted(os.listdir(d)), ['metrics.json', 'metrics.prom'])
+
+    def test_api_request(self):
+        from wikiartcrawler.wikiart_api import api_request
+        response = mock.Mock(status_code=200, content=b'{"data": [1, 2], "hasMore": false}')
+        response.json.return_value = {'data': [1, 2], 'hasMore': False}
+        metrics.reset()
+        with mock.patch('wikiartcrawler.wikiart_api.http_get', return_value=response):
+            api_request('https://www.wikiart.org/en/api/2/PaintingsByArtist?id=1', session_key='secret-key')
+        self.assertEqual(metrics.METRICS.value('wikiart_api_requests_total', endpoint='PaintingsByArtist'), 1)
+        self.assertEqual(metrics.METRICS.value('wikiart_download_bytes_total', source='api'), len(response.content))
+        self.assertNotIn('secret-key', metrics.to_prometheus())
+        self.assertIn(metrics.key_label('secret-key'), metrics.to_prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
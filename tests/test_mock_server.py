@@ -0,0 +1,59 @@
+""" UnitTest of the crawler against the benchmark stand-in of the WikiArt API (offline) """
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark'))
+from mock_server import MockWikiart, MockWikiartServer
+from wikiartcrawler import WikiartAPI, configure_session
+from wikiartcrawler.session import DEFAULT_CONFIG
+from wikiartcrawler.wikiart_api import api_request
+
+
+class Test(unittest.TestCase):
+    """Test pagination, rate limits and crawl through the stand-in server"""
+
+    def setUp(self):
+        configure_session(max_retries=0)
+
+    def tearDown(self):
+        configure_session(**DEFAULT_CONFIG)
+
+    def test_pagination_rate_limit(self):
+        with MockWikiartServer(MockWikiart(n_artists=3, n_paintings=25), page_size=10,
+                               api_rate_limits=((5, 60),)) as server:
+            artist = server.corpus.artists[0]
+            paintings = api_request(f"{server.api_root}/PaintingsByArtist?id={artist['id']}")
+            self.assertEqual([i['id'] for i in paintings], [i['id'] for i in server.corpus.paintings[artist['url']]])
+            self.assertEqual(server.stats['api'], 3)
+            api_request(f'{server.api_root}/UpdatedArtists')
+            api_request(f'{server.api_root}/UpdatedDictionaries')
+            with self.assertRaises(ValueError):
+                api_request(f'{server.api_root}/UpdatedArtists')
+            self.assertEqual(server.stats['rate_limited'], 1)
+
+    def test_crawl(self):
+        corpus = MockWikiart(n_artists=2, n_paintings=12)
+        with MockWikiartServer(corpus, page_size=5) as server, tempfile.TemporaryDirectory() as cache_dir:
+            for d in ['meta', 'image', 'image_face', 'image_face_blur']:
+                os.makedirs(f'{cache_dir}/painting/{d}')
+            with open(f'{cache_dir}/artists.json', 'w') as f:
+                json.dump({a['url']: a['id'] for a in corpus.artists}, f)
+            with open(f'{cache_dir}/dictionaries.json', 'w') as f:
+                json.dump({}, f)
+            with mock.patch('wikiartcrawler.wikiart_api.API_ROOT', server.api_root):
+                api = WikiartAPI(cache_dir=cache_dir, access_code='a', secret_code='b', skip_download=False,
+                                 session_num=2, rate_limits=((100, 1),))
+                self.assertEqual(len(api.scheduler.session_keys), 2)
+                artist = corpus.artists[1]['url']
+                self.assertEqual(api.crawl(artist_url=artist), {artist: 12})
+                self.assertEqual(len(api.get_painting(artist, year_start=1600)), 12)
+            with open(f'{cache_dir}/painting/meta/{artist}.json') as f:
+                self.assertEqual(json.load(f), corpus.records(artist, server.url))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+""" UnitTest for the preprocessing pipeline """
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+from wikiartcrawler import WikiartAPI
+from dummy_cache import build_cache, write_image
+
+
+class Test(unittest.TestCase):
+    """Test batched preprocessing and its derived cache"""
+
+    def test_preprocess(self):
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as output_dir:
+            build_cache(cache_dir, n_painting=5)
+            write_image(f'{cache_dir}/painting/image/paul-cezanne/paul-cezanne-painting-4.jpg', size=(200, 40))
+            # an unreadable image is skipped instead of stopping the run
+            with open(f'{cache_dir}/painting/image/claude-monet/claude-monet-painting-5.jpg', 'wb') as f:
+                f.write(b'<html>blocked</html>')
+            api = WikiartAPI(cache_dir=cache_dir)
+            batches = api.preprocess(output_dir, ['paul-cezanne', 'claude-monet'], size=32, batch_size=4,
+                                     num_workers=2)
+            self.assertEqual(len(batches), 3)
+            self.assertEqual(np.load(batches[0]).shape, (4, 32, 32, 3))
+            self.assertEqual(np.load(batches[0]).dtype, np.uint8)
+            with open(batches[-1].replace('.npy', '.json')) as f:
+                self.assertEqual(len(json.load(f)), 2)
+
+            # cached transforms are reused, the aspect ratio constraint uses the actual image
+            derived = [os.path.join(r, f) for r, _, fs in os.walk(f'{cache_dir}/painting/derived') for f in fs]
+            mtime = {d: os.path.getmtime(d) for d in derived if d.endswith('.npy')}
+            api.preprocess(output_dir, ['paul-cezanne', 'claude-monet'], size=32, batch_size=4, num_workers=2)
+            self.assertEqual(mtime, {d: os.path.getmtime(d) for d in mtime})
+            batches = api.preprocess(output_dir, 'paul-cezanne', size=32, max_aspect_ratio=3, num_workers=2)
+            with open(batches[0].replace('.npy', '.json')) as f:
+                self.assertEqual(len(json.load(f)), 4)  # painting-4 is 200x40 on disk
+            # the batches of the earlier, longer run are removed
+            self.assertEqual(sorted(os.listdir(output_dir)), ['batch-00000.json', 'batch-00000.npy'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+""" UnitTest for the session key scheduler """
+import time
+import unittest
+
+from wikiartcrawler.scheduler import SessionKeyScheduler
+
+
+class Test(unittest.TestCase):
+    """Test quota-aware session key scheduling"""
+
+    def test_spread_over_keys(self):
+        scheduler = SessionKeyScheduler(['a', 'b'], rate_limits=((2, 0.3), (100, 3600)))
+        keys = [scheduler.acquire() for _ in range(4)]
+        self.assertEqual(sorted(keys), ['a', 'a', 'b', 'b'])
+        stats = scheduler.stats()
+        self.assertEqual(stats['a'], {'used': 2, 'remaining': [0, 98]})
+        # every key is exhausted so the next request waits for the short window to slide
+        start = time.monotonic()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+
+    def test_block(self):
+        scheduler = SessionKeyScheduler(['a', 'b'], rate_limits=((10, 1),))
+        scheduler.block('a')
+        self.assertEqual({scheduler.acquire() for _ in range(5)}, {'b'})
+        self.assertEqual(scheduler.remaining('a'), [0])
+
+    def test_anonymous(self):
+        scheduler = SessionKeyScheduler(None)
+        self.assertIsNone(scheduler.acquire())
+        self.assertEqual(scheduler.used, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+""" UnitTest for the shared HTTP session """
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from wikiartcrawler.session import configure_session, DEFAULT_CONFIG, http_get
+from wikiartcrawler.scheduler import SessionKeyScheduler
+from wikiartcrawler.wikiart_api import api_request
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """ Fail every other request with 503 and record the client port of each request. """
+    protocol_version = 'HTTP/1.1'
+    calls = []
+
+    def do_GET(self):
+        self.calls.append(self.client_address[1])
+        status, body = (503, b'busy') if len(self.calls) % 2 == 1 else (200, b'{"ok": true}')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuotaHandler(BaseHTTPRequestHandler):
+    """ Answer 429 to the requests of the session key `exhausted`. """
+    protocol_version = 'HTTP/1.1'
+    calls = []
+
+    def do_GET(self):
+        self.calls.append(self.path)
+        status, body = (429, b'{"error": "quota"}') if 'exhausted' in self.path else (200, b'{"ok": true}')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+    """Test retry and keep-alive of the shared session"""
+
+    @classmethod
+    def setUpClass(cls):
+        configure_session(backoff_factor=0)
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        configure_session(**DEFAULT_CONFIG)
+
+    def test_retry_keep_alive(self):
+        for _ in range(3):
+            r = http_get(f'{self.url}/api')
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.json(), {'ok': True})
+        self.assertEqual(len(FlakyHandler.calls), 6)
+        # every request goes through the same pooled connection
+        self.assertEqual(len(set(FlakyHandler.calls)), 1)
+
+    def test_quota(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), QuotaHandler)
+        url = f'http://127.0.0.1:{server.server_address[1]}/api'
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            self.assertEqual(http_get(f'{url}?authSessionKey=exhausted', quota_retry=False).status_code, 429)
+            self.assertEqual(len(QuotaHandler.calls), 1)
+            # the scheduler sees the 429 of the first request and moves on to the other key
+            scheduler = SessionKeyScheduler(['exhausted', 'valid'])
+            self.assertEqual(api_request(url, scheduler=scheduler), {'ok': True})
+            self.assertEqual(len(QuotaHandler.calls), 3)
+            self.assertEqual(scheduler.remaining('exhausted'), [0, 0])
+            # without scheduler the 429 is retried within the transport
+            http_get(f'{url}?authSessionKey=exhausted')
+            self.assertEqual(len(QuotaHandler.calls), 4 + DEFAULT_CONFIG['max_retries'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+""" UnitTest for the sharded image store """
+import tempfile
+import unittest
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.shard import ShardReader
+from dummy_cache import build_cache
+
+
+class Test(unittest.TestCase):
+    """Test shard export, mmap random access and sequential stream"""
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as output_dir:
+            build_cache(cache_dir, n_painting=6)
+            api = WikiartAPI(cache_dir=cache_dir)
+            paths = api.get_painting('paul-cezanne', media=['oil']) + api.get_painting('claude-monet', media=['oil'])
+            reader = api.export_shards(output_dir, ['paul-cezanne', 'claude-monet'], media=['oil'],
+                                       shard_size=2000, num_workers=2)
+            self.assertEqual(len(reader), len(paths))
+            self.assertGreater(len(reader.shards), 1)
+
+            reader = ShardReader(output_dir)
+            key, image, meta = reader.get('paul-cezanne__paul-cezanne-painting-0')
+            with open(f'{cache_dir}/painting/image/paul-cezanne/paul-cezanne-painting-0.jpg', 'rb') as f:
+                self.assertEqual(image, f.read())
+            self.assertEqual(meta['id'], 'paul-cezanne-0000')
+            self.assertIn('oil', meta['detail']['media'])
+
+            streamed = list(reader)
+            self.assertEqual([i[0] for i in streamed], reader.keys)
+            self.assertEqual(streamed[3], reader[3])
+            split = list(reader.stream(0, 2)) + list(reader.stream(1, 2))
+            self.assertEqual(sorted(i[0] for i in split), sorted(reader.keys))
+            reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+""" UnitTest for the single-pass painting statistics """
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI, get_artist
+from wikiartcrawler.stats import PaintingStats
+from dummy_cache import build_cache, write_image
+
+GROUPS = ['impressionism', 'post-impressionism']
+FILTERS = [{}, {'image_type': 'face_blur'}, {'media': ['oil', 'canvas']},
+           {'media': ['oil', 'canvas'], 'genre': ['portrait']}, {'genre': ['landscape']}]
+
+
+class Test(unittest.TestCase):
+    """Test the counts against get_painting and the incremental update"""
+
+    def test_count(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir)
+            for i in range(3):
+                write_image(f'{cache_dir}/painting/image_face_blur/paul-cezanne/paul-cezanne-painting-{i}.jpg')
+            os.remove(f'{cache_dir}/painting/image/claude-monet/claude-monet-painting-0.jpg')
+            api = WikiartAPI(cache_dir=cache_dir)
+            stats = api.painting_stats(GROUPS)
+            for kwargs in FILTERS:
+                expected = {g: sum(len(api.get_painting(a, **kwargs) or []) for a in get_artist(g, cache_dir))
+                            for g in GROUPS}
+                expected['All'] = sum(expected.values())
+                self.assertEqual(stats.count(groups=GROUPS, **kwargs), expected)
+            self.assertEqual(stats.table({'face': {'image_type': 'face'}}, GROUPS)['face']['All'], 0)
+
+            # only the aggregated art movements are counted
+            self.assertEqual(list(stats.count()), GROUPS + ['All'])
+            with self.assertRaises(AssertionError):
+                stats.count(groups=['baroque'])
+
+    def test_update(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir)
+            PaintingStats(cache_dir).update(GROUPS)
+            stats = PaintingStats(cache_dir)
+            with mock.patch.object(PaintingStats, '_aggregate', wraps=stats._aggregate) as aggregate:
+                stats.update(GROUPS)
+                self.assertEqual(aggregate.call_count, 0)
+                os.remove(f'{cache_dir}/painting/image/claude-monet/claude-monet-painting-0.jpg')
+                stats.update(GROUPS)
+                self.assertEqual(aggregate.call_args_list, [mock.call('claude-monet')])
+            self.assertEqual(stats.count(), {'impressionism': 5, 'post-impressionism': 12, 'All': 17})
+            self.assertEqual(PaintingStats(cache_dir).count(), stats.count())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+""" UnitTest for the content-addressed image store """
+import os
+import shutil
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.store import ImageStore, parse_size
+from wikiartcrawler.util import HOSTNAME
+from dummy_cache import build_cache, write_image
+
+
+def fake_download(urls, paths, **kwargs):
+    for n, p in enumerate(paths):
+        write_image(p, seed=1000 + n)
+    return paths
+
+
+class Test(unittest.TestCase):
+    """Test deduplicated storage, eviction and transparent re-fetch"""
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('20GB'), 20 * 1024 ** 3)
+        self.assertEqual(parse_size('1.5 kb'), 1536)
+        self.assertEqual(parse_size(100), 100)
+
+    def test_remove_stale_tmp(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            old = time.time() - 2 * 24 * 3600
+            for host in [HOSTNAME, 'other-host']:
+                for name in ['stale', 'active']:
+                    write_image(f'{cache_dir}/tmp/{host}/{name}/part/image.jpg')
+                    for root, dirs, files in os.walk(f'{cache_dir}/tmp/{host}/{name}'):
+                        for i in [root] + [os.path.join(root, f) for f in files]:
+                            os.utime(i, (old, old))
+                # a file written recently deep inside a directory that was created long ago
+                write_image(f'{cache_dir}/tmp/{host}/active/part/new.jpg')
+                os.utime(f'{cache_dir}/tmp/{host}/active/part', (old, old))
+            store = ImageStore(cache_dir)
+            self.assertEqual(store.remove_stale_tmp(), [f'{cache_dir}/tmp/{HOSTNAME}/stale'])
+            self.assertEqual(sorted(os.listdir(f'{cache_dir}/tmp/{HOSTNAME}')), ['active'])
+            self.assertEqual(sorted(os.listdir(f'{cache_dir}/tmp/other-host')), ['active', 'stale'])
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=4)
+            image_dir = f'{cache_dir}/painting/image'
+            # the same painting under another artist
+            shutil.copy(f'{image_dir}/paul-cezanne/paul-cezanne-painting-0.jpg',
+                        f'{image_dir}/claude-monet/claude-monet-painting-3.jpg')
+            api = WikiartAPI(cache_dir=cache_dir, image_store=True)
+            self.assertEqual(len(api.store.paths), 12)
+            self.assertEqual(len(api.store.objects), 11)
+            self.assertTrue(os.path.samefile(f'{image_dir}/paul-cezanne/paul-cezanne-painting-0.jpg',
+                                             f'{image_dir}/claude-monet/claude-monet-painting-3.jpg'))
+            size = api.store.size
+
+            # LRU: the images of the last requested artist are kept
+            for a in ['claude-monet', 'vincent-van-gogh', 'paul-cezanne']:
+                api.get_painting(a)
+            store = ImageStore(cache_dir, budget=size // 2)
+            sha = store.paths[f'{image_dir}/paul-cezanne/paul-cezanne-painting-1.jpg']
+            self.assertEqual(store.objects[sha]['hits'], 1)
+            monet = [p for p in api.catalog.images('claude-monet') if 'painting-3' not in p]
+            evicted = store.enforce()
+            self.assertLessEqual(store.size, size // 2)
+            self.assertTrue(all(not os.path.exists(p) for p in evicted))
+            self.assertFalse(any('paul-cezanne' in p for p in evicted))
+            self.assertTrue(all(p in evicted for p in monet))
+            self.assertEqual(ImageStore(cache_dir).evicted, set(evicted))
+
+            # evicted images are downloaded again on request
+            api = WikiartAPI(cache_dir=cache_dir, image_store=True)
+            with mock.patch('wikiartcrawler.wikiart_api.download_images', side_effect=fake_download) as download:
+                self.assertEqual(len(api.get_painting('claude-monet')), 4)
+                self.assertEqual(sorted(download.call_args[0][1]), sorted(p for p in evicted if 'claude-monet' in p))
+                self.assertEqual(len(api.get_painting('claude-monet', year_start=1800)), 4)
+                self.assertEqual(download.call_count, 1)
+            self.assertEqual(api.store.evicted_paths(f'{image_dir}/claude-monet'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
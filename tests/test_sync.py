@@ -0,0 +1,61 @@
+""" UnitTest for the incremental sync """
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from wikiartcrawler import WikiartAPI
+from wikiartcrawler.sync import load_sync_state
+from dummy_cache import build_cache, painting
+
+
+class Test(unittest.TestCase):
+    """Test resume from pagination token and merge of new paintings only"""
+
+    def test_sync(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_cache(cache_dir, n_painting=3, images=False)
+            api = WikiartAPI(cache_dir=cache_dir, skip_download=False)
+            calls = []
+
+            def pages(url, ignore_error=False, scheduler=None, pagination_token=None):
+                calls.append((url, pagination_token))
+                if pagination_token is None and 'fromDate' not in url:
+                    yield {'data': [{'url': 'new-artist', 'id': '1'}], 'hasMore': True, 'paginationToken': 'p2'}
+                    return  # interrupted before the second page
+                if pagination_token == 'p2':
+                    yield {'data': [{'url': 'other-artist', 'id': '2'}], 'hasMore': False}
+                    return
+                yield {'data': [{'url': 'paul-cezanne', 'id': api.dict_artist['paul-cezanne']}], 'hasMore': False}
+
+            listing = [painting('paul-cezanne', i, with_detail=False) for i in range(5)]
+            with mock.patch('wikiartcrawler.sync.iter_api_pages', side_effect=pages), \
+                    mock.patch('wikiartcrawler.sync.api_request', return_value=listing), \
+                    mock.patch('wikiartcrawler.sync.get_painting_detail',
+                               side_effect=lambda i, **kwargs: {'id': i, 'genres': ['portrait']}) as detail:
+                api.sync(dictionaries=False, releases=False)
+                state = load_sync_state(cache_dir)
+                self.assertEqual(state['artists']['pagination_token'], 'p2')
+                self.assertNotIn('last_sync', state['artists'])
+
+                api.sync(dictionaries=False, releases=False)  # resumes from p2, baseline is recorded
+                self.assertEqual(calls[-1], ('https://www.wikiart.org/en/api/2/UpdatedArtists', 'p2'))
+                state = load_sync_state(cache_dir)
+                self.assertIsNotNone(state['artists']['last_sync'])
+                with open(f'{cache_dir}/artists.json') as f:
+                    self.assertIn('other-artist', json.load(f))
+
+                summary = api.sync(dictionaries=False, releases=False)
+                self.assertIn('fromDate=', calls[-1][0])
+                self.assertEqual(summary['paintings'], {'paul-cezanne': 2})
+                self.assertEqual(sorted(c.args[0] for c in detail.call_args_list),
+                                 ['paul-cezanne-0003', 'paul-cezanne-0004'])
+            with open(f'{cache_dir}/painting/meta/paul-cezanne.json') as f:
+                meta = json.load(f)
+            self.assertEqual([i['id'] for i in meta], [i['id'] for i in listing])
+            self.assertEqual(meta[0]['detail']['styles'], ['Post-Impressionism'])  # cached detail is kept
+            self.assertEqual(load_sync_state(cache_dir)['pending_artists'], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
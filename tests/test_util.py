@@ -0,0 +1,93 @@
+""" UnitTest for streaming download and extraction """
+import io
+import gzip
+import os
+import hashlib
+import zipfile
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from wikiartcrawler.util import wget, _wget, extract_archive
+
+
+def make_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for i in range(3):
+            z.writestr(f'archive/artist-{i}/painting.jpg', os.urandom(50000))
+    return buffer.getvalue()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """ Serve `files` with HTTP Range support. """
+    files = {'/archive.zip': make_zip()}
+    ranges = []
+
+    def do_GET(self):
+        body = self.files[self.path]
+        start = 0
+        if 'Range' in self.headers:
+            start = int(self.headers['Range'].split('=')[1].split('-')[0])
+            self.ranges.append(start)
+        if start >= len(body):
+            self.send_response(416)
+            self.end_headers()
+            return
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+    """Test streaming wget with resume and checksum"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/archive.zip'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_resume(self):
+        body = RangeHandler.files['/archive.zip']
+        digest = hashlib.sha256(body).hexdigest()
+        with tempfile.TemporaryDirectory() as d:
+            with open(f'{d}/archive.zip.part', 'wb') as f:
+                f.write(body[:1000])
+            path = _wget(self.url, d, checksum=f'sha256:{digest}', progress=False)
+            self.assertEqual(RangeHandler.ranges[-1], 1000)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), body)
+            self.assertFalse(os.path.exists(f'{d}/archive.zip.part'))
+
+    def test_checksum(self):
+        with tempfile.TemporaryDirectory() as d:
+            with self.assertRaises(ValueError):
+                _wget(self.url, d, checksum='sha256:0000', progress=False)
+            self.assertEqual(os.listdir(d), [])
+
+    def test_extract(self):
+        with tempfile.TemporaryDirectory() as d:
+            wget(self.url, d)
+            self.assertEqual(sorted(os.listdir(f'{d}/archive')), ['artist-0', 'artist-1', 'artist-2'])
+            self.assertFalse(os.path.exists(f'{d}/archive.zip'))
+            with gzip.open(f'{d}/list.json.gz', 'wb') as f:
+                f.write(b'[]')
+            self.assertEqual(extract_archive(f'{d}/list.json.gz', f'{d}/out'), 1)
+            with open(f'{d}/out/list.json') as f:
+                self.assertEqual(f.read(), '[]')
+            self.assertIsNone(extract_archive(f'{d}/out/list.json', d))
+
+
+if __name__ == "__main__":
+    unittest.main()
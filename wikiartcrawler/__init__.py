@@ -1,3 +1,17 @@
-from .wikiart_api import WikiartAPI
+from importlib import import_module
+
 from .artist_group import VALID_ARTIST_GROUPS, available_artist, get_artist
 from . import artist_group
+
+# imported on first access so that `import wikiartcrawler` does not pull in requests/tqdm/numpy
+_LAZY_ATTRIBUTES = {
+    'WikiartAPI': 'wikiart_api',
+    'AsyncWikiartAPI': 'async_api',
+    'configure_session': 'session',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(import_module('.{}'.format(_LAZY_ATTRIBUTES[name]), __name__), name)
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
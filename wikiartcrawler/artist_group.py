@@ -1,7 +1,8 @@
 import os
 from typing import List
-from glob import glob
-from .wikiart_api import CACHE_DIR
+from importlib import import_module
+from .util import CACHE_DIR
+from .catalog import get_catalog
 __root = os.path.dirname(os.path.abspath(__file__))
 
 VALID_ARTIST_GROUPS = [
@@ -11,57 +12,24 @@ VALID_ARTIST_GROUPS = [
 ]
 
 
+# art movement -> module under `groups` holding its artist list
+GROUP_MODULES = {g: g.replace('-', '_') for g in VALID_ARTIST_GROUPS}
+
+
 def load_artists(group_name):
-    if group_name == 'abstract-expressionism':
-        from .groups.abstract_expressionism import groups
-    elif group_name == 'baroque':
-        from .groups.baroque import groups
-    elif group_name == 'ecole-de-paris':
-        from .groups.ecole_de_paris import groups
-    elif group_name == 'expressionism':
-        from .groups.expressionism import groups
-    elif group_name == 'impressionism':
-        from .groups.impressionism import groups
-    elif group_name == 'naive-art-primitivism':
-        from .groups.naive_art_primitivism import groups
-    elif group_name == 'neo-impressionism':
-        from .groups.neo_impressionism import groups
-    elif group_name == 'neoclassicism':
-        from .groups.neoclassicism import groups
-    elif group_name == 'post-impressionism':
-        from .groups.post_impressionism import groups
-    elif group_name == 'pre-raphaelite-brotherhood':
-        from .groups.pre_raphaelite_brotherhood import groups
-    elif group_name == 'realism':
-        from .groups.realism import groups
-    elif group_name == 'rococo':
-        from .groups.rococo import groups
-    elif group_name == 'romanticism':
-        from .groups.romanticism import groups
-    elif group_name == 'surrealism':
-        from .groups.surrealism import groups
-    elif group_name == 'symbolism':
-        from .groups.symbolism import groups
-    else:
+    if group_name not in GROUP_MODULES:
         raise ValueError('unknown group: {}'.format(group_name))
-    return groups
+    return import_module('.groups.{}'.format(GROUP_MODULES[group_name]), __package__).groups
 
 
 def available_artist(cache_dir: str = None):
     cache_dir = CACHE_DIR if cache_dir is None else cache_dir
-    return sorted([os.path.basename(i).replace('.json', '') for i in glob('{}/painting/meta/*.json'.format(cache_dir))])
+    return sorted(get_catalog(cache_dir).artists)
 
 
 def get_artist(groups: List or str, cache_dir: str = None):
-    if type(groups) is str:
-        groups = [groups]
-    _artist = available_artist(cache_dir)
-    full_artist = []
-    for g in groups:
-        print(_artist)
-        print(g)
-        full_artist += list(filter(lambda x: x in _artist, load_artists(g)))
-    return sorted(list(set(full_artist)))
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    return get_catalog(cache_dir).group_artists(groups)
 
 
 # def load_txt(_file):
@@ -71,18 +39,10 @@ def get_artist(groups: List or str, cache_dir: str = None):
 #         return sorted(list(set([i for i in f.read().split('\n') if len(i) > 0])))
 
 
-expressionism = load_artists('expressionism')
-impressionism = load_artists('impressionism')
-neo_impressionism = load_artists('neo-impressionism')
-post_impressionism = load_artists('post-impressionism')
-pre_raphaelite_brotherhood = load_artists('pre-raphaelite-brotherhood')
-romanticism = load_artists('romanticism')
-surrealism = load_artists('surrealism')
-symbolism = load_artists('symbolism')
-abstract_expressionism = load_artists('abstract-expressionism')
-baroque = load_artists('baroque')
-ecole_de_paris = load_artists('ecole-de-paris')
-naive_art_primitivism = load_artists('naive-art-primitivism')
-neoclassicism = load_artists('neoclassicism')
-realism = load_artists('realism')
-rococo = load_artists('rococo')
+def __getattr__(name):
+    """ Load the artist list of a group on first access (eg. `artist_group.impressionism`). """
+    for group_name, module_name in GROUP_MODULES.items():
+        if name == module_name:
+            globals()[name] = load_artists(group_name)
+            return globals()[name]
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
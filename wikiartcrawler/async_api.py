@@ -0,0 +1,428 @@
+""" Asyncio client mirroring `WikiartAPI` on the same cache directory (requires aiohttp) """
+import os
+import json
+import asyncio
+import logging
+from typing import List
+
+from . import metrics
+from .util import CACHE_DIR, atomic_json_dump, tmp_path
+from .catalog import get_catalog
+from .downloader import get_bucket, IMAGE_REQUEST_PER_SECOND
+from .meta_index import match_painting
+from .meta_store import read_meta
+from .discovery import ArtistDiscovery
+from .scheduler import SessionKeyScheduler, API_RATE_LIMITS, ANY_KEY
+from .wikiart_api import API_ROOT, CUSTOM_ARTISTS, load_checkpoint, login_url
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+__all__ = 'AsyncWikiartAPI'
+
+ASSET_URL = 'https://raw.githubusercontent.com/asahi417/wikiart-crawler/master/assets'
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def _read_json(path: str):
+    with open(path) as f:
+        return json.load(f)
+
+
+class AsyncWikiartAPI:
+    """ Non-blocking counterpart of `WikiartAPI` for asyncio services.
+
+    Requests go through one `aiohttp.ClientSession` and the number of requests in flight is bounded by a semaphore.
+    The image downloads draw from the per-host token bucket of `downloader.get_bucket`, shared with the sync client
+    of the same process. The API quota is shared only if the scheduler of a `WikiartAPI` is passed as `scheduler`,
+    otherwise the client logs in and tracks the quota of its own session keys.
+    The cache files (`artists.json`, `dictionaries.json`, `painting/meta`, the crawl checkpoints and the image
+    directories) have the same format as `WikiartAPI`, so both clients can work on the same `cache_dir`.
+
+    ```
+    async with AsyncWikiartAPI(access_code='...', secret_code='...', skip_download=False) as api:
+        files = await api.get_painting('paul-cezanne', genre=['portrait'])
+    ```
+    """
+
+    def __init__(self,
+                 credentials: List = None,
+                 access_code: str = None,
+                 secret_code: str = None,
+                 session_key: List = None,
+                 session_num: int = 10,
+                 cache_dir: str = None,
+                 skip_download: bool = True,
+                 max_concurrency: int = 32,
+                 rate_limits=API_RATE_LIMITS,
+                 scheduler: SessionKeyScheduler = None,
+                 image_rate: float = IMAGE_REQUEST_PER_SECOND,
+                 timeout: float = 60,
+                 max_retries: int = 5,
+                 backoff_factor: float = 0.5):
+        """ Asyncio WikiArt client, opened with `async with` (or `await api.open()`).
+
+        @param credentials: list of {access_code, secret_code} to log in with
+        @param access_code: access code of a single credential
+        @param secret_code: secret code of a single credential
+        @param session_key: list of session keys (instead of credentials)
+        @param session_num: number of session keys per credential
+        @param cache_dir: cache directory shared with `WikiartAPI`
+        @param skip_download: use the cache only (no API request nor image download)
+        @param max_concurrency: max number of requests in flight
+        @param rate_limits: list of (requests, seconds) per session key
+        @param scheduler: scheduler to share with a `WikiartAPI` (eg. `api.scheduler`), used instead of logging in
+        @param image_rate: max image requests per second per host (the bucket of the host is created once per process)
+        @param timeout: total timeout of a request in seconds
+        @param max_retries: retries on connection error or 429/5xx response
+        @param backoff_factor: exponential backoff factor between retries
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncWikiartAPI requires aiohttp: `pip install aiohttp`')
+        if credentials is None and access_code and secret_code:
+            credentials = [{'access_code': access_code, 'secret_code': secret_code}]
+        self.credentials = None if skip_download else credentials
+        self._session_key = session_key
+        self.session_num = session_num
+        self.cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+        self.skip_download = skip_download
+        self.max_concurrency = max_concurrency
+        self.rate_limits = rate_limits
+        self.image_rate = image_rate
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.catalog = get_catalog(self.cache_dir)
+        self.scheduler = scheduler
+        self.dict_group = None
+        self.dict_artist = None
+        self._session = None
+        self._semaphore = None
+
+    async def open(self):
+        """ Open the HTTP session, log in and load the dictionary/artist lists. """
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        if self.scheduler is None:
+            if self.credentials is not None:
+                keys = await asyncio.gather(*[self.get_session_key(**c) for c in self.credentials
+                                              for _ in range(self.session_num)])
+                self._session_key = [k for k in keys if k is not None] or None
+            logging.info(f'{len(self._session_key or [])} session keys')
+            self.scheduler = SessionKeyScheduler(self._session_key, self.rate_limits)
+        self.dict_group = await self.get_full_group()
+        self.dict_artist = await self.get_full_artist()
+        return self
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _get(self, url: str, retry_status=RETRY_STATUS):
+        """ GET with retry on connection error and 429/5xx responses, within the concurrency bound.
+
+        @param retry_status: status codes to retry on
+        @return: (status code, body)
+        """
+        host = url.split('/')[2] if '://' in url else ''
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    async with self._session.get(url) as response:
+                        status, body = response.status, await response.read()
+                if status not in retry_status or attempt == self.max_retries:
+                    return status, body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.inc('wikiart_http_errors_total', host=host, error=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+            metrics.inc('wikiart_http_retries_total', host=host)
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+    async def _acquire(self, session_key=ANY_KEY):
+        """ Wait (without blocking the loop) for a session key with remaining quota. """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            key, wait = self.scheduler.try_acquire(session_key)
+            if wait == 0:
+                metrics.observe('wikiart_scheduler_wait_seconds', loop.time() - start)
+                return key
+            await asyncio.sleep(wait)
+
+    async def _api_get(self, url: str, session_key: str, pagination_token: str):
+        if pagination_token is not None:
+            url = f"{url}{'&' if '?' in url else '?'}paginationToken={pagination_token}"
+        if session_key is not None:
+            url = f"{url}{'&' if '?' in url else '?'}authSessionKey={session_key}"
+        endpoint = metrics.endpoint_label(url)
+        with metrics.timer('wikiart_api_request_seconds', endpoint=endpoint):
+            # a 429 is not retried on the same key: `iter_pages` blocks the key and moves on to another one
+            status, body = await self._get(url, tuple(i for i in RETRY_STATUS if i != 429))
+        metrics.inc('wikiart_api_requests_total', endpoint=endpoint, session_key=metrics.key_label(session_key),
+                    status=status)
+        metrics.inc('wikiart_download_bytes_total', len(body), source='api')
+        return status, body
+
+    async def iter_pages(self, url: str, ignore_error: bool = False, pagination_token: str = None):
+        """ Async generator of the response pages of an API request (see `iter_api_pages`).
+
+        @param url: API endpoint
+        @param ignore_error: stop instead of raising on API error
+        @param pagination_token: resume a paginated request from this token
+        """
+        endpoint = metrics.endpoint_label(url)
+        session_key = ANY_KEY
+        while True:
+            if session_key is ANY_KEY:
+                # move on to another session key if the API still reports the quota of the key is exhausted
+                for _ in range(len(self.scheduler.session_keys)):
+                    key = await self._acquire()
+                    status, body = await self._api_get(url, key, pagination_token)
+                    if status != 429:
+                        break
+                    logging.warning('quota exhausted, blocking the session key for an hour')
+                    self.scheduler.block(key)
+                session_key = key
+            else:
+                status, body = await self._api_get(url, await self._acquire(session_key), pagination_token)
+                if status == 429:
+                    logging.warning('quota exhausted, blocking the session key for an hour')
+                    self.scheduler.block(session_key)
+            try:
+                data = json.loads(body)
+                error = None if status == 200 else f'API error\n\t url: {url}\n\t error: {data}'
+            except json.decoder.JSONDecodeError:
+                data, error = None, f'JSONDecodeError: {status}'
+            if error is not None:
+                metrics.inc('wikiart_api_errors_total', endpoint=endpoint,
+                            error='json' if data is None else str(status))
+                if not ignore_error:
+                    raise ValueError(error)
+                logging.warning(error)
+                return
+            yield data
+            if not data.get('hasMore'):
+                return
+            pagination_token = data['paginationToken']
+
+    async def request(self, url: str, ignore_error: bool = False):
+        """ Request the API and concatenate paginated results (see `api_request`). """
+        full_list = None
+        async for data in self.iter_pages(url, ignore_error):
+            if 'data' not in data:
+                return data
+            full_list = data['data'] if full_list is None else full_list + data['data']
+        return full_list
+
+    async def get_session_key(self, access_code: str, secret_code: str):
+        status, body = await self._get(login_url(API_ROOT, access_code, secret_code))
+        try:
+            return json.loads(body).get('SessionKey') if status == 200 else None
+        except json.decoder.JSONDecodeError:
+            return None
+
+    async def _load_list(self, name: str, force_refresh: bool):
+        """ Cached `dictionaries.json`/`artists.json`, fetched from the repository assets if missing. """
+        cache_file = f'{self.cache_dir}/{name}'
+        if os.path.exists(cache_file) and not force_refresh:
+            return await asyncio.to_thread(_read_json, cache_file)
+        if not force_refresh:
+            status, body = await self._get(f'{ASSET_URL}/{name}')
+            assert status == 200, f'failed to fetch {name}: {status}'
+            data = json.loads(body)
+            await asyncio.to_thread(atomic_json_dump, data, cache_file)
+            return data
+        assert not self.skip_download
+        return None
+
+    async def get_full_group(self, force_refresh: bool = False):
+        data = await self._load_list('dictionaries.json', force_refresh)
+        if data is not None:
+            return data
+        data = await self.request(f'{API_ROOT}/UpdatedDictionaries')
+        data = {i['title']: {'id': i['id'], 'url': i['url'], 'group': i['group']} for i in data}
+        await asyncio.to_thread(atomic_json_dump, data, f'{self.cache_dir}/dictionaries.json')
+        return data
+
+    async def _search_paintings(self, term: str, max_pages: int = 1):
+        """ First `max_pages` pages of `PaintingSearch` for the term (see `WikiartAPI._search_paintings`). """
+        records, saturated, n = None, False, 0
+        async for page in self.iter_pages(f'{API_ROOT}/PaintingSearch?term={term}', ignore_error=True):
+            records = (records or []) + page.get('data', [])
+            saturated, n = bool(page.get('hasMore')), n + 1
+            if n == max_pages:
+                break
+        return records, saturated, max(n, 1)
+
+    async def get_full_artist(self, force_refresh: bool = False, max_depth: int = 3, max_pages: int = 1):
+        data = await self._load_list('artists.json', force_refresh)
+        if data is not None:
+            return data
+        data = await self.request(f'{API_ROOT}/UpdatedArtists', ignore_error=True) or []
+        data = {i['url']: i['id'] for i in data}
+        data.update(CUSTOM_ARTISTS)
+        logging.info(f'`UpdatedArtists` returned {len(data)} artists, enriching the list with `PaintingSearch`')
+        # the same discovery state as `WikiartAPI.get_full_artist`, so either client resumes it
+        discovery = ArtistDiscovery(f'{self.cache_dir}/discovery_state.json', data, max_depth=max_depth)
+
+        async def search(term):
+            discovery.add(term, *await self._search_paintings(term, max_pages))
+
+        while not discovery.done:
+            await asyncio.gather(*[search(t) for t in discovery.pending()])
+            discovery.expand()
+        data = {k: v for k, v in discovery.close().items() if k is not None}
+        await asyncio.to_thread(atomic_json_dump, data, f'{self.cache_dir}/artists.json')
+        return data
+
+    async def get_painting_detail(self, paint_id: str):
+        return await self.request(f'{API_ROOT}/Painting?id={paint_id}')
+
+    async def crawl_painting_info(self, artist_url: str):
+        """ Fetch the painting list and the details of an artist into the meta cache (see `WikiartAPI`).
+
+        Details are requested concurrently and checkpointed in the same files as `WikiartAPI.crawl_painting_info`,
+        so a crawl interrupted in either client resumes in the other.
+
+        @return: list of paintings, or None if the artworks are blocked on copyright grounds
+        """
+        assert not self.skip_download
+        assert artist_url in self.dict_artist, f'{artist_url} not found in the artist list'
+        cache_file = f'{self.cache_dir}/painting/meta/{artist_url}.json'
+        checkpoint_dir = f'{self.cache_dir}/painting/checkpoint'
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        list_file = f'{checkpoint_dir}/{artist_url}.list.json'
+        if os.path.exists(list_file):
+            painting_info = await asyncio.to_thread(_read_json, list_file)
+        else:
+            painting_info = await self.request(f'{API_ROOT}/PaintingsByArtist?id={self.dict_artist[artist_url]}')
+            if any('FRAME-600x480' in i['image'] for i in painting_info):
+                logging.warning(f'Artworks of {artist_url} are not available in your country on copyright grounds.')
+                return None
+            await asyncio.to_thread(atomic_json_dump, painting_info, list_file)
+
+        checkpoint_file = f'{checkpoint_dir}/{artist_url}.jsonl'
+        detail = await asyncio.to_thread(load_checkpoint, checkpoint_file)
+        todo = [i['id'] for i in painting_info if i['id'] not in detail]
+        logging.info(f'requesting detail information of paintings: {len(todo)} paintings '
+                     f'({len(detail)} in checkpoint), artist: {artist_url}')
+        with open(checkpoint_file, 'a') as f:
+
+            async def fetch(paint_id):
+                detail[paint_id] = await self.get_painting_detail(paint_id)
+                f.write(json.dumps({'id': paint_id, 'detail': detail[paint_id]}) + '\n')
+                f.flush()
+
+            await asyncio.gather(*[fetch(i) for i in todo])
+
+        for i in painting_info:
+            i['detail'] = detail[i['id']]
+        await asyncio.to_thread(atomic_json_dump, painting_info, cache_file)
+        os.remove(list_file)
+        os.remove(checkpoint_file)
+        return painting_info
+
+    async def get_painting_info(self,
+                                artist_url: str,
+                                year_start: int = None,
+                                year_end: int = None,
+                                media: List = None,
+                                genre: List = None,
+                                style: List = None,
+                                max_aspect_ratio: float = None,
+                                min_height: int = None,
+                                min_width: int = None):
+        assert artist_url in self.dict_artist, f'{artist_url} not found in the artist list'
+        cache_file = f'{self.cache_dir}/painting/meta/{artist_url}.json'
+        if not os.path.exists(cache_file):
+            if self.skip_download:
+                return None
+            if await self.crawl_painting_info(artist_url) is None:
+                return []
+        painting_info = await asyncio.to_thread(read_meta, self.cache_dir, artist_url)
+        return [dict(i) for i in painting_info if match_painting(
+            i, year_start, year_end, media, genre, style, max_aspect_ratio, min_height, min_width)]
+
+    async def _download_image(self, url: str, path: str):
+        while True:
+            wait = get_bucket(url, self.image_rate).try_acquire()
+            if wait == 0:
+                break
+            await asyncio.sleep(wait)
+        with metrics.timer('wikiart_image_request_seconds'):
+            status, body = await self._get(url)
+        metrics.inc('wikiart_image_requests_total', status=status)
+        if status != 200:
+            raise ValueError(f'failed to download {url}: {status}')
+        metrics.inc('wikiart_download_bytes_total', len(body), source='image')
+
+        def write():
+            tmp = tmp_path(path)
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+
+        await asyncio.to_thread(write)
+        return path
+
+    async def get_painting(self,
+                           artist_url: str,
+                           year_start: int = None,
+                           year_end: int = None,
+                           media: List = None,
+                           genre: List = None,
+                           style: List = None,
+                           max_aspect_ratio: float = None,
+                           min_height: int = None,
+                           min_width: int = None,
+                           image_type: str = None):
+        """ Image files of the artist matching the filters, downloading the missing raw images concurrently. """
+        raw_image = image_type is None
+        image_type = 'image' if image_type is None else f'image_{image_type}'
+        filters = [year_start, year_end, media, genre, style, max_aspect_ratio, min_height, min_width]
+        if all(i is None for i in filters) and self.skip_download:
+            paths = self.catalog.images(artist_url, image_type)
+            return paths if len(paths) != 0 else None
+
+        painting_info = await self.get_painting_info(artist_url, *filters)
+        if painting_info is None:
+            return None
+        cache_dir = f'{self.cache_dir}/painting/{image_type}/{artist_url}'
+        os.makedirs(cache_dir, exist_ok=True)
+        cached = set(self.catalog.images(artist_url, image_type))
+        image_files, downloads = [], []
+        for data in painting_info:
+            if 'FRAME-600x480' in data['image']:
+                logging.warning(f'access blocked: {data}')
+                continue
+            path = f"{cache_dir}/{data['url']}.{data['image'].split('.')[-1]}"
+            metrics.inc('wikiart_image_cache_total', result='hit' if path in cached else 'miss')
+            if path not in cached:
+                if self.skip_download or not raw_image:
+                    logging.info(f'file not found but skip download: {path}')
+                    continue
+                downloads.append((data['image'], path))
+            image_files.append(path)
+        results = await asyncio.gather(*[self._download_image(u, p) for u, p in downloads], return_exceptions=True)
+        failed = set()
+        for (url, path), result in zip(downloads, results):
+            if isinstance(result, Exception):
+                logging.warning(f'failed to download {url}: {result}')
+                failed.add(path)
+        image_files = [p for p in image_files if p not in failed]
+        return image_files if len(image_files) != 0 else None
@@ -0,0 +1,113 @@
+""" Parallel download and extraction of the release archives into the cache directory """
+import os
+import json
+import time
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import List
+
+from .util import RELEASE_URL, URL_LIST, _wget, extract_archive, atomic_json_dump, file_checksum
+
+__all__ = ('RELEASE_URL', 'release_checksums', 'release_archives', 'load_manifest', 'bootstrap')
+
+
+def release_checksums():
+    """ Digests of the release archives (file name -> `{algorithm}:{hex}`) from `checksums.json` of the release.
+
+    An empty dictionary is returned if the release has no digest list, in which case the archives are not verified.
+    """
+    from .session import http_get
+    try:
+        response = http_get(f'{RELEASE_URL}/checksums.json')
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        logging.warning(f'no checksums for the release archives, they are not verified: {e}')
+        return {}
+
+
+def release_archives():
+    """ List of (name, url, target directory relative to the cache directory) of the release archives. """
+    archives = [('meta', f'{RELEASE_URL}/meta.zip', 'painting/meta')]
+    archives += [(k, url, 'painting/image') for k, url in URL_LIST.items()]
+    archives += [(k, f'{RELEASE_URL}/{k}.zip', f'painting/{k}') for k in ['image_face', 'image_face_blur']]
+    return archives
+
+
+def load_manifest(cache_dir: str):
+    """ Archives already extracted into the cache: name -> {url, checksum, files, completed}. """
+    path = f'{cache_dir}/painting/manifest.json'
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(cache_dir: str, manifest: dict):
+    path = f'{cache_dir}/painting/manifest.json'
+    atomic_json_dump(manifest, path, indent=1)
+
+
+def bootstrap(cache_dir: str,
+              archives: List = None,
+              force: bool = False,
+              num_download_workers: int = 4,
+              num_extract_workers: int = None,
+              tmp_dir: str = None):
+    """ Download the archives concurrently and extract them in worker processes straight into the cache.
+
+    Archives recorded in `painting/manifest.json` are skipped. A cache populated before the manifest existed
+    is recorded from its directories on the first run. Every archive is verified before it is extracted against
+    its checksum, given or else listed in `release_checksums()` for the archives of the release, and the sha256 of
+    the extracted archives is recorded in the manifest.
+
+    @param cache_dir: cache directory
+    @param archives: list of (name, url, target directory[, checksum as `{algorithm}:{hex}`])
+        (default: `release_archives()`)
+    @param force: download every archive even if it is in the manifest
+    @param num_download_workers: number of concurrent downloads
+    @param num_extract_workers: number of extraction processes (default: number of CPUs)
+    @param tmp_dir: download directory, removed once completed (default: `tmp/bootstrap` of the cache)
+    @return: updated manifest
+    """
+    archives = [tuple(a) + (None,) * (4 - len(a)) for a in (release_archives() if archives is None else archives)]
+    tmp_dir = f'{cache_dir}/tmp/bootstrap' if tmp_dir is None else tmp_dir
+    manifest = load_manifest(cache_dir)
+    if not force and len(manifest) == 0 and not os.path.exists(tmp_dir):
+        legacy = {name: {'url': url, 'checksum': None, 'files': None, 'completed': None}
+                  for name, url, target, _ in archives if os.path.exists(f'{cache_dir}/{target}')}
+        if len(legacy) > 0:
+            logging.info(f'recording {len(legacy)} archives of the existing cache in the manifest')
+            manifest.update(legacy)
+            _save_manifest(cache_dir, manifest)
+    todo = [a for a in archives if force or a[0] not in manifest]
+    if len(todo) == 0:
+        return manifest
+
+    if any(checksum is None and url.startswith(f'{RELEASE_URL}/') for _, url, _, checksum in todo):
+        checksums = release_checksums()
+        todo = [(name, url, target, checksum or checksums.get(os.path.basename(url)))
+                for name, url, target, checksum in todo]
+    logging.info(f'bootstrap {len(todo)} archives: {[a[0] for a in todo]}')
+    os.makedirs(tmp_dir, exist_ok=True)
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=num_download_workers) as downloader, \
+            ProcessPoolExecutor(max_workers=num_extract_workers) as extractor:
+        downloads = {downloader.submit(_wget, url, tmp_dir, checksum=checksum, progress=False): (name, url, target)
+                     for name, url, target, checksum in todo}
+        extractions = {}
+        for future in as_completed(downloads):
+            name, url, target = downloads[future]
+            path = future.result()
+            logging.info(f'downloaded {name}, extracting into {target}')
+            extractions[extractor.submit(extract_archive, path, f'{cache_dir}/{target}', 1)] = (name, url, path)
+        for future in as_completed(extractions):
+            name, url, path = extractions[future]
+            manifest[name] = {'url': url, 'checksum': f'sha256:{file_checksum(path)}', 'files': future.result(),
+                              'completed': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            _save_manifest(cache_dir, manifest)
+            os.remove(path)
+    shutil.rmtree(tmp_dir)
+    logging.info(f'bootstrap completed in {time.time() - start:.1f}s')
+    return manifest
@@ -0,0 +1,101 @@
+""" In-memory catalog of the cache directory (artists with meta, image paths per image type) """
+import os
+import threading
+from fnmatch import fnmatch
+from typing import List
+
+__all__ = ('Catalog', 'get_catalog')
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _is_image(name: str):
+    """ Whether a file of an image directory is an image (not hidden nor a temporary file of `tmp_path`). """
+    return not name.startswith('.') and '.tmp.' not in name and os.path.splitext(name)[1] != ''
+
+
+class Catalog:
+    """ Set/dict index of the cache, rebuilt only when the mtime of the corresponding directory changes.
+
+    - `painting/meta/*.json` -> set of available artists
+    - `painting/{image_type}/{artist}/*` -> list of image paths per artist, whatever their extension (the
+      temporary files of a write in progress are skipped)
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._artists = (None, frozenset())  # (mtime, artists)
+        self._artist_dirs = {}  # image_type -> (mtime, artists having an image directory)
+        self._images = {}  # (image_type, artist) -> (mtime, paths)
+        self._lock = threading.Lock()
+
+    @property
+    def artists(self):
+        """ Set of artists having a meta file. """
+        meta_dir = f'{self.cache_dir}/painting/meta'
+        mtime = _mtime(meta_dir)
+        with self._lock:
+            if mtime is None:
+                self._artists = (None, frozenset())
+            elif self._artists[0] != mtime:
+                self._artists = (mtime, frozenset(
+                    i[:-len('.json')] for i in os.listdir(meta_dir) if i.endswith('.json')))
+            return self._artists[1]
+
+    def __contains__(self, artist_url):
+        return artist_url in self.artists
+
+    def group_artists(self, groups: List or str):
+        """ Sorted artists of the art movements that are available in the cache. """
+        from .artist_group import load_artists
+        groups = [groups] if type(groups) is str else groups
+        artists = self.artists
+        return sorted(set(a for g in groups for a in load_artists(g) if a in artists))
+
+    def image_artists(self, image_type: str = 'image'):
+        """ Set of artists having an image directory for the image type. """
+        root = f'{self.cache_dir}/painting/{image_type}'
+        mtime = _mtime(root)
+        with self._lock:
+            if mtime is None:
+                return frozenset()
+            if image_type not in self._artist_dirs or self._artist_dirs[image_type][0] != mtime:
+                self._artist_dirs[image_type] = (mtime, frozenset(
+                    i for i in os.listdir(root) if os.path.isdir(f'{root}/{i}')))
+            return self._artist_dirs[image_type][1]
+
+    def images(self, artist_url: str, image_type: str = 'image'):
+        """ Sorted image paths of the artist (`artist_url` can be a glob pattern such as `*`). """
+        if any(c in artist_url for c in '*?['):
+            paths = []
+            for a in sorted(self.image_artists(image_type)):
+                if fnmatch(a, artist_url):
+                    paths += self.images(a, image_type)
+            return paths
+        artist_dir = f'{self.cache_dir}/painting/{image_type}/{artist_url}'
+        mtime = _mtime(artist_dir)
+        key = (image_type, artist_url)
+        with self._lock:
+            if mtime is None:
+                self._images.pop(key, None)
+                return []
+            if key not in self._images or self._images[key][0] != mtime:
+                self._images[key] = (mtime, sorted(
+                    f'{artist_dir}/{i}' for i in os.listdir(artist_dir) if _is_image(i)))
+            return list(self._images[key][1])
+
+
+def get_catalog(cache_dir: str):
+    """ Catalog shared by every caller working on `cache_dir`. """
+    with _CATALOGS_LOCK:
+        if cache_dir not in _CATALOGS:
+            _CATALOGS[cache_dir] = Catalog(cache_dir)
+        return _CATALOGS[cache_dir]
@@ -0,0 +1,169 @@
+""" Perceptual-hash index to find near-duplicate images across artists """
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict
+
+import numpy as np
+from PIL import Image
+
+from .util import atomic_json_dump
+
+__all__ = ('dhash', 'phash', 'hamming', 'BKTree', 'DedupIndex')
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits):
+    return int(''.join('1' if b else '0' for b in bits.flatten()), 2)
+
+
+def dhash(path: str, hash_size: int = 8):
+    """ Difference hash: sign of the horizontal gradient of a (hash_size + 1) x hash_size thumbnail. """
+    with Image.open(path) as img:
+        img.draft('L', (hash_size * 4, hash_size * 4))
+        pixels = np.asarray(img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.float32)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(path: str, hash_size: int = 8):
+    """ Perceptual hash: low-frequency 2D DCT coefficients of a 32 x 32 thumbnail compared with their median. """
+    with Image.open(path) as img:
+        img.draft('L', (64, 64))
+        pixels = np.asarray(img.convert('L').resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    dct = (_DCT32 @ pixels @ _DCT32.T)[:hash_size, :hash_size]
+    return _bits_to_int(dct > np.median(dct[1:, 1:]))
+
+
+HASH_FUNCTIONS = {'dhash': dhash, 'phash': phash}
+
+
+def hamming(a: int, b: int):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """ Burkhard-Keller tree over the hamming distance: radius search visits only the branches that can match. """
+
+    def __init__(self):
+        self.root = None  # [hash, items, {distance: child}]
+
+    def add(self, value: int, item):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            if d not in node[2]:
+                node[2][d] = [value, [item], {}]
+                return
+            node = node[2][d]
+
+    def search(self, value: int, radius: int):
+        """ Items whose hash is within `radius` of `value`, as a list of (distance, item). """
+        output = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                output += [(d, i) for i in node[1]]
+            stack += [child for k, child in node[2].items() if d - radius <= k <= d + radius]
+        return output
+
+
+def _hash_file(path: str, method: str):
+    try:
+        return HASH_FUNCTIONS[method](path)
+    except OSError:
+        logging.warning(f'failed to read image: {path}')
+        return None
+
+
+class DedupIndex:
+    """ Persistent perceptual hashes of cached images keyed by painting id (or by file name if unknown). """
+
+    def __init__(self, path: str, method: str = None):
+        """ Load the index at `path` (hashes of another `method` are discarded; default: the stored method). """
+        self.path = path
+        self.entries = {}  # key -> [hex hash, image path, mtime]
+        data = {'method': 'phash', 'entries': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+        self.method = data['method'] if method is None else method
+        assert self.method in HASH_FUNCTIONS, self.method
+        if data['method'] == self.method:
+            self.entries = data['entries']
+        self.paths = set(e[1] for e in self.entries.values())  # images of the last update (unreadable ones too)
+        self._duplicates = None
+
+    def update(self, items: Dict, num_workers: int = None):
+        """ Hash new or modified images in parallel and drop the entries of removed images.
+
+        @param items: key -> image path
+        @param num_workers: number of processes
+        """
+        todo = {k: p for k, p in items.items()
+                if k not in self.entries or self.entries[k][1] != p or self.entries[k][2] != os.path.getmtime(p)}
+        self.entries = {k: v for k, v in self.entries.items() if k in items}
+        if len(todo) > 0:
+            logging.info(f'computing {self.method} of {len(todo)} images')
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                hashes = executor.map(_hash_file, list(todo.values()), [self.method] * len(todo),
+                                      chunksize=max(1, len(todo) // (4 * (num_workers or os.cpu_count() or 1))))
+                for (k, p), h in zip(todo.items(), hashes):
+                    if h is not None:
+                        self.entries[k] = [f'{h:016x}', p, os.path.getmtime(p)]
+        atomic_json_dump({'method': self.method, 'entries': self.entries}, self.path)
+        self.paths = set(items.values())
+        self._duplicates = None
+        return self
+
+    def clusters(self, max_distance: int = 4):
+        """ Groups of keys whose images are within `max_distance` bits of each other (singletons excluded). """
+        tree = BKTree()
+        keys = sorted(self.entries)
+        for k in keys:
+            tree.add(int(self.entries[k][0], 16), k)
+        parent = {k: k for k in keys}
+
+        def find(k):
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
+
+        for k in keys:
+            for _, other in tree.search(int(self.entries[k][0], 16), max_distance):
+                a, b = find(k), find(other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+        groups = {}
+        for k in keys:
+            groups.setdefault(find(k), []).append(k)
+        return [g for g in groups.values() if len(g) > 1]
+
+    def duplicates(self, max_distance: int = 4):
+        """ Image paths to drop so that only the first key (in sorted order) of each cluster is kept. """
+        if self._duplicates is None or self._duplicates[0] != max_distance:
+            drop = set(self.entries[k][1] for g in self.clusters(max_distance) for k in g[1:])
+            self._duplicates = (max_distance, drop)
+        return self._duplicates[1]
+
+    def filter(self, paths: List, max_distance: int = 4):
+        drop = self.duplicates(max_distance)
+        return [p for p in paths if p not in drop]
@@ -0,0 +1,107 @@
+""" Adaptive discovery of artists through `PaintingSearch` over a prefix trie of search terms """
+import os
+import json
+import logging
+import threading
+from string import ascii_lowercase
+from typing import Dict, List
+
+from .util import atomic_json_dump
+
+__all__ = ('ArtistDiscovery',)
+
+# saturated terms shorter than this are expanded even if their first pages only list known artists
+MIN_DEPTH = 2
+
+
+class ArtistDiscovery:
+    """ Search terms expanded level by level: one letter, then two letters, ...
+
+    A term is searched for `max_pages` pages only. If the result is saturated (more pages remain) and it brought
+    new artists, the term is expanded into `term + letter` at the next level; otherwise its subtree is pruned,
+    since a complete result already lists every artist matching the longer terms. The first pages of a short term
+    such as `a` only show a small part of its result, so a saturated term shorter than `MIN_DEPTH` is always
+    expanded, whether or not those pages brought new artists. The terms of a level are
+    independent so they can be searched concurrently; their results are merged in sorted order once the whole
+    level is searched, which keeps the expansion deterministic. The state is saved after every term so an
+    interrupted discovery resumes where it stopped.
+
+    Usage: `while not d.done: [d.add(t, *search(t)) for t in d.pending()]; d.expand()`
+    """
+
+    def __init__(self, path: str, known: Dict, alphabet: str = ascii_lowercase, max_depth: int = 3):
+        """ Discovery state at `path` (resumed with its own parameters if it exists).
+
+        @param path: state file
+        @param known: artists known before the discovery (url -> id), eg. from `UpdatedArtists`
+        @param alphabet: characters of the search terms
+        @param max_depth: maximum term length
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+            logging.info(f"resuming artist discovery: {len(self.state['frontier'])} terms at the current level")
+        else:
+            self.state = {'alphabet': alphabet, 'max_depth': max_depth, 'artists': dict(known),
+                          'frontier': list(alphabet), 'results': {}, 'requests': 0, 'terms': 0}
+
+    @property
+    def artists(self):
+        return self.state['artists']
+
+    @property
+    def done(self):
+        return len(self.state['frontier']) == 0
+
+    def pending(self):
+        """ Terms of the current level that are not searched yet. """
+        return [t for t in self.state['frontier'] if t not in self.state['results']]
+
+    def add(self, term: str, records: List, saturated: bool, requests: int = 1):
+        """ Record the result of a term.
+
+        @param term: search term
+        @param records: paintings returned by `PaintingSearch` (None if the request failed)
+        @param saturated: whether the result has more pages than those fetched
+        @param requests: number of API requests made for the term
+        """
+        if records is None:
+            logging.warning(f'`PaintingSearch` failed for term {term}, skipping')
+            records, saturated = [], False
+        artists = {i['artistUrl']: i['artistId'] for i in records if i.get('artistUrl') is not None}
+        with self._lock:
+            self.state['results'][term] = {'artists': artists, 'saturated': saturated}
+            self.state['requests'] += requests
+            atomic_json_dump(self.state, self.path)
+
+    def expand(self):
+        """ Merge the results of the current level and move on to the next one. """
+        assert len(self.pending()) == 0, 'terms of the current level are not searched yet'
+        frontier = []
+        new = 0
+        for term in sorted(self.state['frontier']):
+            result = self.state['results'][term]
+            added = [k for k in result['artists'] if k not in self.artists]
+            self.artists.update({k: result['artists'][k] for k in added})
+            new += len(added)
+            if result['saturated'] and (len(added) > 0 or len(term) < MIN_DEPTH) \
+                    and len(term) < self.state['max_depth']:
+                frontier += [term + c for c in self.state['alphabet']]
+        logging.info(f"artist discovery: {len(self.state['frontier'])} terms of length "
+                     f"{len(self.state['frontier'][0])}, {new} new artists, {len(frontier)} terms at the next level")
+        self.state['terms'] += len(self.state['frontier'])
+        self.state['frontier'] = frontier
+        self.state['results'] = {}
+        atomic_json_dump(self.state, self.path)
+        return self
+
+    def close(self):
+        """ Remove the state file of a completed discovery. """
+        assert self.done
+        logging.info(f"artist discovery: {len(self.artists)} artists with {self.state['requests']} requests over "
+                     f"{self.state['terms']} terms")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return self.artists
@@ -0,0 +1,204 @@
+""" Coordination of several crawlers sharing one cache directory: hash partitioning and lease files """
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List
+
+from .util import HOSTNAME, tmp_path
+
+__all__ = ('default_worker_id', 'hash_partition', 'Lease', 'hold', 'LeaseQueue')
+
+
+def default_worker_id():
+    """ Identifier unique to the host and process. """
+    return f'{HOSTNAME}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+
+
+def hash_partition(items: List, rank: int, world_size: int):
+    """ Items assigned to worker `rank` out of `world_size`, by a hash stable across machines and runs. """
+    assert 0 <= rank < world_size, f'rank {rank} out of world size {world_size}'
+    return [i for i in items if int(hashlib.md5(str(i).encode()).hexdigest(), 16) % world_size == rank]
+
+
+def _alive(content: dict):
+    """ False if the lease was taken by a process of this host that is not running anymore. """
+    if content.get('host') != HOSTNAME or content.get('pid') is None:
+        return True
+    try:
+        os.kill(content['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Lease:
+    """ Lock file with an expiry, shared through the file system.
+
+    The lock file is written aside and hard linked into place, so it appears atomically with the owner and the
+    expiry time (the link fails if the file exists). A lock file that cannot be parsed is considered held until
+    it is older than the ttl. An expired lease (eg. of a crashed worker, or of a dead process on the same host)
+    is taken over by rewriting the file and reading it back, which is best effort when several workers take over
+    the same expired lease at once.
+    """
+
+    def __init__(self, path: str, owner: str, ttl: float = 600):
+        self.path = path
+        self.owner = owner
+        self.ttl = ttl
+        self.released = False
+        self._lock = threading.Lock()
+
+    def _content(self):
+        return json.dumps(
+            {'owner': self.owner, 'host': HOSTNAME, 'pid': os.getpid(), 'expires': time.time() + self.ttl})
+
+    def read(self):
+        """ Content of the lock file, None if there is none or an empty dictionary if it cannot be parsed. """
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.decoder.JSONDecodeError:
+            return {}
+
+    def _held(self, current: dict):
+        """ Whether the lease is held by another worker that is not expired. """
+        if current.get('owner') is None:
+            try:
+                return time.time() - os.path.getmtime(self.path) < self.ttl
+            except FileNotFoundError:
+                return False
+        return current['owner'] != self.owner and current['expires'] > time.time() and _alive(current)
+
+    def _create(self):
+        tmp = tmp_path(self.path)
+        with open(tmp, 'w') as f:
+            f.write(self._content())
+        try:
+            os.link(tmp, self.path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp)
+
+    def acquire(self):
+        """ Take the lease if it is free or expired (non-blocking). """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.released = False
+        while not self._create():
+            current = self.read()
+            if current is None:  # released in the meantime
+                continue
+            if self._held(current):
+                return False
+            logging.info(f'taking over the expired lease {self.path}')
+            self.renew()
+            time.sleep(0.05)  # let a concurrent takeover land before checking who won
+            return self.owned()
+        return True
+
+    def owned(self):
+        current = self.read()
+        return current is not None and current.get('owner') == self.owner
+
+    def renew(self):
+        """ Extend the expiry (atomic rewrite of the lock file). """
+        with self._lock:
+            if self.released:
+                return
+            tmp = tmp_path(self.path)
+            with open(tmp, 'w') as f:
+                f.write(self._content())
+            os.replace(tmp, self.path)
+
+    def release(self):
+        with self._lock:
+            self.released = True
+            if self.owned():
+                os.remove(self.path)
+
+
+class _Heartbeat(threading.Thread):
+    """ Renew leases every third of their time to live while the work is in progress. """
+
+    def __init__(self, leases: List, interval: float):
+        super().__init__(daemon=True)
+        self.leases = leases
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for lease in list(self.leases):
+                lease.renew()
+
+
+@contextmanager
+def hold(path: str, owner: str = None, ttl: float = 600, poll: float = 1.0):
+    """ Wait for the lease at `path` and keep it renewed until the block exits (a cross-machine mutex). """
+    lease = Lease(path, owner or default_worker_id(), ttl)
+    while not lease.acquire():
+        time.sleep(poll)
+    heartbeat = _Heartbeat([lease], ttl / 3)
+    heartbeat.start()
+    try:
+        yield lease
+    finally:
+        heartbeat.stopped.set()
+        lease.release()
+
+
+class LeaseQueue:
+    """ Work queue over a shared directory: each worker claims items one at a time through a lease file, so
+    workers started at any time share the remaining items dynamically. """
+
+    def __init__(self, lease_dir: str, owner: str = None, ttl: float = 600):
+        """ Lease-file work queue.
+
+        @param lease_dir: directory of the lease files (shared by every worker)
+        @param owner: worker identifier (default: host, pid and a random suffix)
+        @param ttl: seconds before the lease of an unresponsive worker can be taken over
+        """
+        self.lease_dir = lease_dir
+        self.owner = owner or default_worker_id()
+        self.ttl = ttl
+
+    def claim(self, items: List, done=None):
+        """ Yield the items this worker holds the lease of, skipping items that are done or leased by others.
+
+        The lease of an item is renewed in the background while the caller works on it, and released when the
+        caller asks for the next item.
+
+        @param items: work items (used in the lease file name)
+        @param done: function returning True if an item is already completed (checked after the lease is taken)
+        """
+        held = []
+        heartbeat = _Heartbeat(held, self.ttl / 3)
+        heartbeat.start()
+        try:
+            for item in items:
+                if done is not None and done(item):
+                    continue
+                lease = Lease(f'{self.lease_dir}/{item}.lease', self.owner, self.ttl)
+                if not lease.acquire():
+                    continue
+                try:
+                    if done is not None and done(item):
+                        continue
+                    held.append(lease)
+                    yield item
+                finally:
+                    if lease in held:
+                        held.remove(lease)
+                    lease.release()
+        finally:
+            heartbeat.stopped.set()
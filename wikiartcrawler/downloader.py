@@ -0,0 +1,100 @@
+""" Concurrent image downloader with per-host token-bucket rate limiting """
+import time
+import threading
+import logging
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+__all__ = ('TokenBucket', 'get_bucket', 'download_images')
+
+# Images downloading: 20 requests per second (see the limits in `wikiart_api.py`)
+IMAGE_REQUEST_PER_SECOND = 20
+# the host buckets are paced slightly below the limit, so the jitter of the arrival of the requests stays within it
+RATE_HEADROOM = 0.95
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """ Thread-safe token bucket: `rate` tokens per second, up to `capacity` tokens in burst.
+
+    The bucket starts empty and holds a single token by default, so no window of one second takes more than
+    `rate` tokens (a full bucket of `rate` tokens would let the first second take twice the rate).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        assert rate > 0, rate
+        assert capacity >= 1, capacity
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1):
+        """ Consume `tokens` if available and return 0, else return the seconds to wait (non-blocking). """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """ Block until `tokens` are available and consume them. """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+
+def get_bucket(url: str, rate: float = IMAGE_REQUEST_PER_SECOND):
+    """ Token bucket shared by every download to the host of `url` (`rate` is the request limit of the host). """
+    host = urlparse(url).netloc
+    with _BUCKETS_LOCK:
+        if host not in _BUCKETS:
+            _BUCKETS[host] = TokenBucket(rate * RATE_HEADROOM)
+        return _BUCKETS[host]
+
+
+def download_images(urls: List,
+                    export_paths: List,
+                    num_workers: int = 8,
+                    rate: float = IMAGE_REQUEST_PER_SECOND,
+                    bucket: TokenBucket = None):
+    """ Download images in parallel within the per-host request budget.
+
+    @param urls: list of image urls
+    @param export_paths: list of local paths, aligned with `urls`
+    @param num_workers: number of concurrent downloads
+    @param rate: max image requests per second per host (ignored if `bucket` is given)
+    @param bucket: shared token bucket to use for every request
+    @return: paths of the images downloaded, in the input order (a failed image is logged and skipped)
+    """
+    from .wikiart_api import get_image
+    assert len(urls) == len(export_paths), f'{len(urls)} != {len(export_paths)}'
+
+    def _download(url, path):
+        (get_bucket(url, rate) if bucket is None else bucket).acquire()
+        logging.debug(f'downloading {url} -> {path}')
+        try:
+            get_image(url, path)
+        except Exception as e:
+            logging.warning(f'failed to download {url}: {e}')
+            return None
+        return path
+
+    if num_workers is None or num_workers <= 1:
+        paths = [_download(u, p) for u, p in zip(urls, export_paths)]
+    else:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(_download, u, p) for u, p in zip(urls, export_paths)]
+            paths = [f.result() for f in futures]
+    return [p for p in paths if p is not None]
@@ -0,0 +1,209 @@
+""" CPU face extraction (mirror padding, detection, eye alignment, crop) and corner blur of the WikiART Face set """
+import os
+import math
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from .util import tmp_path
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+__all__ = ('corner_blur_mask', 'blur_corners', 'FaceDetector', 'extract_face', 'extract_faces')
+
+MAX_SIDE = 1024  # images are downscaled to this size before detection
+JPEG_QUALITY = 95
+
+
+def corner_blur_mask(size: int, radius: float = 0.8, softness: float = 0.3):
+    """ Weight of the sharp image for a `size` x `size` face: 1 inside the centered disc of `radius` (relative to
+    half the side) and falling smoothly to 0 over `softness` towards the corners.
+
+    @return: float32 array (size, size, 1)
+    """
+    center = (size - 1) / 2
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    r = np.hypot(x - center, y - center) / (size / 2)
+    w = np.clip((radius + softness - r) / softness, 0, 1)
+    return (w * w * (3 - 2 * w))[..., None]  # smoothstep
+
+
+def blur_corners(images: np.ndarray, blur_radius: float = 8, radius: float = 0.8, softness: float = 0.3):
+    """ Blend each face with its blurred copy through `corner_blur_mask` (a single vectorized operation).
+
+    @param images: uint8 array (size, size, 3) or a batch (n, size, size, 3)
+    @param blur_radius: radius of the gaussian blur of the background
+    @return: uint8 array of the same shape
+    """
+    batch = images[None] if images.ndim == 3 else images
+    blurred = np.stack([np.asarray(Image.fromarray(i).filter(ImageFilter.GaussianBlur(blur_radius))) for i in batch])
+    mask = corner_blur_mask(batch.shape[1], radius, softness)
+    output = np.rint(batch * mask + blurred * (1 - mask)).astype(np.uint8)
+    return output[0] if images.ndim == 3 else output
+
+
+class FaceDetector:
+    """ OpenCV face detector: the Haar cascade bundled with OpenCV 4, or YuNet if an ONNX model is given.
+
+    The detectors are loaded on first use, so instances can be sent to worker processes.
+    """
+
+    def __init__(self, model_path: str = None, min_face: int = 48, score_threshold: float = 0.8):
+        """ Face detector.
+
+        @param model_path: YuNet ONNX model (eg. `face_detection_yunet_2023mar.onnx` of the OpenCV model zoo),
+            required with OpenCV 5 where the Haar cascades were removed
+        @param min_face: minimum face size in pixels
+        @param score_threshold: minimum YuNet score
+        """
+        if cv2 is None:
+            raise ImportError('face detection requires OpenCV: `pip install opencv-python-headless`')
+        assert model_path is not None or hasattr(cv2, 'CascadeClassifier'), \
+            'this OpenCV has no Haar cascade, give a YuNet model with `model_path`'
+        self.model_path = model_path
+        self.min_face = min_face
+        self.score_threshold = score_threshold
+        self._models = None
+
+    def __getstate__(self):
+        return dict(self.__dict__, _models=None)
+
+    def _load(self):
+        if self._models is None:
+            cv2.setNumThreads(1)  # one process per core, and deterministic results
+            if self.model_path is not None:
+                self._models = (cv2.FaceDetectorYN.create(self.model_path, '', (320, 320), self.score_threshold),)
+            else:
+                self._models = (cv2.CascadeClassifier(f'{cv2.data.haarcascades}haarcascade_frontalface_default.xml'),
+                                cv2.CascadeClassifier(f'{cv2.data.haarcascades}haarcascade_eye.xml'))
+        return self._models
+
+    def detect(self, image: np.ndarray):
+        """ Faces of an RGB image as a list of ((x, y, w, h), (left eye, right eye) or None), largest first. """
+        models = self._load()
+        if self.model_path is not None:
+            bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            models[0].setInputSize((bgr.shape[1], bgr.shape[0]))
+            _, rows = models[0].detect(bgr)
+            rows = [] if rows is None else rows  # x, y, w, h, right eye, left eye, nose, mouth corners, score
+            faces = [((r[0], r[1], r[2], r[3]), ((r[6], r[7]), (r[4], r[5]))) for r in rows
+                     if min(r[2], r[3]) >= self.min_face]
+        else:
+            gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY))
+            faces = []
+            for x, y, w, h in models[0].detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                                         minSize=(self.min_face, self.min_face)):
+                eyes = models[1].detectMultiScale(gray[y:y + h // 2, x:x + w], scaleFactor=1.1, minNeighbors=5)
+                eyes = sorted(eyes, key=lambda e: -e[2] * e[3])[:2]
+                eyes = tuple(sorted((x + ex + ew / 2, y + ey + eh / 2) for ex, ey, ew, eh in eyes)) \
+                    if len(eyes) == 2 else None
+                faces.append(((x, y, w, h), eyes))
+        return sorted(faces, key=lambda f: -f[0][2] * f[0][3])
+
+
+def extract_face(path: str, detector: FaceDetector, size: int = 256, margin: float = 0.4, pad: float = 0.25):
+    """ Largest face of an image, aligned on the eyes and cropped into a `size` x `size` uint8 RGB array.
+
+    The image is mirror padded first, so that the rotation and a face close to the border never bring black
+    corners into the crop (the steps of the README figure, with a Lanczos resize in place of super resolution).
+
+    @param path: image file
+    @param detector: `FaceDetector`
+    @param size: output size
+    @param margin: context around the detected box, relative to its size
+    @param pad: mirror padding, relative to the longer side
+    @return: uint8 array (size, size, 3), or None if no face is found
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', (MAX_SIDE, MAX_SIDE))
+        img = img.convert('RGB')
+        if max(img.size) > MAX_SIDE:
+            scale = MAX_SIDE / max(img.size)
+            img = img.resize((round(img.size[0] * scale), round(img.size[1] * scale)), Image.LANCZOS)
+        image = np.asarray(img)
+    h, w = image.shape[:2]
+    p = int(pad * max(h, w))
+    padded = np.pad(image, ((p, p), (p, p), (0, 0)), mode='symmetric')
+    # faces found in the mirrored border are reflections of the faces of the image
+    faces = [f for f in detector.detect(padded)
+             if p <= f[0][0] + f[0][2] / 2 < p + w and p <= f[0][1] + f[0][3] / 2 < p + h]
+    if len(faces) == 0:
+        return None
+    (x, y, fw, fh), eyes = faces[0]
+    center = (x + fw / 2, y + fh / 2)
+    img = Image.fromarray(padded)
+    if eyes is not None:
+        (lx, ly), (rx, ry) = eyes
+        img = img.rotate(math.degrees(math.atan2(ry - ly, rx - lx)), resample=Image.BICUBIC, center=center)
+    half = max(fw, fh) * (1 + margin) / 2
+    crop = img.crop((round(center[0] - half), round(center[1] - half),
+                     round(center[0] + half), round(center[1] + half)))
+    return np.asarray(crop.resize((size, size), Image.LANCZOS), dtype=np.uint8)
+
+
+def _save(array: np.ndarray, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tmp_path(path)
+    Image.fromarray(array).save(tmp, format='JPEG', quality=JPEG_QUALITY)
+    os.replace(tmp, path)
+
+
+def _process_batch(batch: List, detector: FaceDetector, size: int, blur_radius: float):
+    """ Extract the faces of a batch of (image, face path, blurred face path), blurring them together.
+
+    The outputs of an earlier run are removed for the images in which no face is found anymore. An unreadable image
+    counts as one without face, but its outputs are kept.
+    """
+    faces, unreadable = [], set()
+    for n, (src, _, _) in enumerate(batch):
+        try:
+            faces.append(extract_face(src, detector, size))
+        except OSError:  # truncated file, or not an image (`PIL.UnidentifiedImageError`)
+            logging.warning(f'failed to read image: {src}')
+            faces.append(None)
+            unreadable.add(n)
+    found = [(n, f) for n, f in enumerate(faces) if f is not None]
+    if len(found) > 0:
+        blurred = blur_corners(np.stack([f for _, f in found]), blur_radius)
+        for (n, face), face_blur in zip(found, blurred):
+            _save(face, batch[n][1])
+            _save(face_blur, batch[n][2])
+    for n, ((_, face_path, blur_path), face) in enumerate(zip(batch, faces)):
+        if face is None and n not in unreadable:
+            for path in [face_path, blur_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+    return [f is not None for f in faces]
+
+
+def extract_faces(items: List,
+                  detector: FaceDetector = None,
+                  size: int = 256,
+                  blur_radius: float = 8,
+                  batch_size: int = 32,
+                  num_workers: int = None):
+    """ Extract faces in batches across a process pool.
+
+    @param items: list of (image path, face path, blurred face path)
+    @param detector: `FaceDetector` (default: Haar cascade)
+    @param size: face image size
+    @param blur_radius: gaussian blur radius of the corners
+    @param batch_size: number of images per task
+    @param num_workers: number of processes (default: number of CPUs)
+    @return: list of booleans, True if a face was saved for the item
+    """
+    detector = FaceDetector() if detector is None else detector
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    found = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for result in executor.map(
+                _process_batch, batches, *[[i] * len(batches) for i in [detector, size, blur_radius]]):
+            found += result
+    logging.info(f'{sum(found)} faces extracted from {len(items)} images')
+    return found
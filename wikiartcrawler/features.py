@@ -0,0 +1,178 @@
+""" Compact visual features of the cached images in a float32 memmap, with a batched top-k similarity search """
+import os
+import json
+import logging
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict
+
+import numpy as np
+from PIL import Image
+
+from .util import atomic_json_dump, tmp_path
+
+__all__ = ('image_features', 'FeatureIndex', 'FEATURE_DIM')
+
+HISTOGRAM_BINS = 4  # per channel: 4 x 4 x 4 joint RGB histogram
+THUMBNAIL_SIZE = 8  # 8 x 8 RGB thumbnail
+FEATURE_DIM = HISTOGRAM_BINS ** 3 + THUMBNAIL_SIZE ** 2 * 3
+SEARCH_CHUNK = 65536  # rows of the matrix multiplied at once
+
+
+def _normalize(x):
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norm > 0, norm, 1)
+
+
+def image_features(path: str):
+    """ L2 normalized concatenation of a joint RGB histogram and of a mean-centered thumbnail.
+
+    The inner product of two features is a cosine similarity giving equal weight to the color distribution and
+    to the coarse layout of the images.
+
+    @return: float32 array (FEATURE_DIM,)
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', (64, 64))  # let the JPEG decoder downscale by a power of two
+        img = img.convert('RGB')
+        pixels = np.asarray(img.resize((32, 32), Image.BILINEAR), dtype=np.float32) / 255
+        thumbnail = np.asarray(img.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BOX), dtype=np.float32) / 255
+    bins = np.minimum((pixels * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    codes = (bins[..., 0] * HISTOGRAM_BINS + bins[..., 1]) * HISTOGRAM_BINS + bins[..., 2]
+    histogram = np.sqrt(np.bincount(codes.ravel(), minlength=HISTOGRAM_BINS ** 3).astype(np.float32))
+    thumbnail = (thumbnail - thumbnail.mean()).ravel()
+    feature = np.concatenate([_normalize(histogram), _normalize(thumbnail)])
+    return (feature / np.sqrt(2)).astype(np.float32)
+
+
+def _features_batch(paths: List):
+    """ Features of a batch of images (a row of zeros for an unreadable image) and the positions of those images. """
+    output = np.zeros((len(paths), FEATURE_DIM), dtype=np.float32)
+    failed = []
+    for n, path in enumerate(paths):
+        try:
+            output[n] = image_features(path)
+        except OSError:
+            logging.warning(f'failed to read image: {path}')
+            failed.append(n)
+    return output, failed
+
+
+class FeatureIndex:
+    """ Features of the cached images in `{index_dir}/features.{version}.f32` (rows aligned with the keys of
+    `index.json`, which names the matrix file of its version).
+
+    The matrix is memory mapped, so a search reads the rows in chunks without loading the whole index. An update
+    writes the matrix of the next version before replacing `index.json` and keeps the previous matrix, so a reader
+    finds the matrix of the index it loaded. Unreadable images are kept as rows of zeros and computed again at the
+    next update.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.keys, self.paths, self.mtimes, self.failed, self.version = [], [], [], set(), 0
+        if os.path.exists(f'{index_dir}/index.json'):
+            with open(f'{index_dir}/index.json') as f:
+                index = json.load(f)
+            if index['dim'] == FEATURE_DIM and 'version' in index:
+                self.keys, self.paths, self.mtimes = index['keys'], index['paths'], index['mtimes']
+                self.failed, self.version = set(index['failed']), index['version']
+        self._row = {k: n for n, k in enumerate(self.keys)}
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._row
+
+    @property
+    def matrix_file(self):
+        return f'{self.index_dir}/features.{self.version}.f32'
+
+    @property
+    def matrix(self):
+        """ Read-only float32 memmap (number of images, FEATURE_DIM). """
+        if self._matrix is None:
+            if len(self) == 0:
+                return np.zeros((0, FEATURE_DIM), dtype=np.float32)
+            self._matrix = np.memmap(self.matrix_file, dtype=np.float32, mode='r', shape=(len(self), FEATURE_DIM))
+        return self._matrix
+
+    def update(self, items: Dict, batch_size: int = 256, num_workers: int = None):
+        """ Compute the features of new, modified or previously unreadable images in parallel batches and drop the
+        removed images.
+
+        @param items: key (painting id) -> image path
+        @param batch_size: number of images per task
+        @param num_workers: number of processes
+        """
+        keys = sorted(items)
+        mtimes = [os.path.getmtime(items[k]) for k in keys]
+        todo = [n for n, k in enumerate(keys) if k not in self._row or k in self.failed
+                or self.paths[self._row[k]] != items[k] or self.mtimes[self._row[k]] != mtimes[n]]
+        if len(todo) == 0 and keys == self.keys:
+            return self
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = f'{self.index_dir}/features.{self.version + 1}.f32'
+        tmp = tmp_path(path)
+        # an empty index keeps a single row of zeros since a memmap cannot be empty
+        matrix = np.memmap(tmp, dtype=np.float32, mode='w+', shape=(max(len(keys), 1), FEATURE_DIM))
+        todo_rows = set(todo)
+        kept = np.array([n for n in range(len(keys)) if n not in todo_rows], dtype=np.int64)
+        for i in range(0, len(kept), SEARCH_CHUNK):
+            matrix[kept[i:i + SEARCH_CHUNK]] = self.matrix[[self._row[keys[n]] for n in kept[i:i + SEARCH_CHUNK]]]
+        failed = set()
+        if len(todo) > 0:
+            logging.info(f'computing the features of {len(todo)} images')
+            batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                for rows, (features, batch_failed) in zip(batches, executor.map(
+                        _features_batch, [[items[keys[n]] for n in rows] for rows in batches])):
+                    matrix[rows] = features
+                    failed.update(keys[rows[n]] for n in batch_failed)
+        matrix.flush()
+        del matrix
+        self._matrix = None
+        os.replace(tmp, path)
+        keep = [self.matrix_file, path]  # a reader of the previous index may still open its matrix
+        self.keys, self.paths, self.mtimes = keys, [items[k] for k in keys], mtimes
+        self.failed, self.version = failed, self.version + 1
+        atomic_json_dump({'dim': FEATURE_DIM, 'version': self.version, 'keys': keys, 'paths': self.paths,
+                          'mtimes': mtimes, 'failed': sorted(failed)}, f'{self.index_dir}/index.json')
+        for old in glob(f'{self.index_dir}/features*.f32'):
+            if old not in keep:
+                os.remove(old)
+        self._row = {k: n for n, k in enumerate(self.keys)}
+        return self
+
+    def vector(self, key: str):
+        return np.array(self.matrix[self._row[key]])
+
+    def search(self, queries: np.ndarray, k: int = 10, candidates: List = None):
+        """ Top-k most similar images of each query by inner product, over the matrix read chunk by chunk.
+
+        @param queries: float32 array (FEATURE_DIM,) or (number of queries, FEATURE_DIM)
+        @param k: number of results per query
+        @param candidates: keys to search among (default: every image)
+        @return: for each query (or for the single query), list of (key, similarity) sorted by similarity
+        """
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries).astype(np.float32)
+        rows = np.arange(len(self)) if candidates is None else \
+            np.array(sorted(self._row[c] for c in candidates if c in self._row), dtype=np.int64)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for i in range(0, len(rows), SEARCH_CHUNK):
+            chunk = rows[i:i + SEARCH_CHUNK]
+            block = self.matrix[chunk[0]:chunk[-1] + 1] if candidates is None else self.matrix[chunk]
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            ids = np.concatenate([best_rows, np.broadcast_to(chunk, (len(queries), len(chunk)))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores, ids = np.take_along_axis(scores, top, 1), np.take_along_axis(ids, top, 1)
+            best_scores, best_rows = scores, ids
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        output = [[(self.keys[r], float(s)) for r, s in zip(best_rows[q][o], best_scores[q][o])]
+                  for q, o in enumerate(order)]
+        return output[0] if single else output
@@ -0,0 +1,140 @@
+""" Index of the true dimensions, size, checksum and integrity of cached images (JPEG headers only, no decode) """
+import os
+import json
+import struct
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from .util import atomic_json_dump, CHUNK_SIZE
+
+__all__ = ('read_jpeg_header', 'scan_image', 'ImageIndex')
+
+# start-of-frame markers carrying the image dimensions (excluding DHT 0xC4, JPG 0xC8 and DAC 0xCC)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_jpeg_header(f):
+    """ (width, height) from the SOF segment of a JPEG file object, or None if the header is invalid. """
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        byte = f.read(1)
+        while byte == b'\xff':  # fill bytes
+            byte = f.read(1)
+        if byte == b'':
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # markers without payload
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack('>H', length)[0]
+        if marker in SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack('>HH', segment[1:5])
+            return width, height
+        if marker == 0xDA:  # start of scan before any frame header
+            return None
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _read_other_header(path: str):
+    """ (width, height) and integrity of a non-JPEG image decoded by Pillow, or (None, False) if it is invalid. """
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            size = img.size
+            img.load()
+        return size, True
+    except (OSError, SyntaxError, ValueError):
+        return None, False
+
+
+def scan_image(path: str):
+    """ Dimensions, byte size, md5 and integrity of an image file.
+
+    A JPEG file is complete if it has a frame header and ends with the EOI marker (trailing padding is ignored).
+    Other formats (eg. PNG) are rare on WikiArt and decoded with Pillow instead.
+
+    @return: dictionary of width, height, size, md5, complete, mtime
+    """
+    with open(path, 'rb') as f:
+        is_jpeg = f.read(2) == b'\xff\xd8'
+        f.seek(0)
+        dimension = read_jpeg_header(f)
+        f.seek(0)
+        md5 = hashlib.md5()
+        tail = b''
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+            tail = (tail + chunk)[-64:]
+    complete = dimension is not None and tail.rstrip(b'\x00\r\n ').endswith(b'\xff\xd9')
+    if not is_jpeg:
+        dimension, complete = _read_other_header(path)
+    width, height = dimension if dimension is not None else (None, None)
+    return {
+        'width': width,
+        'height': height,
+        'size': os.path.getsize(path),
+        'md5': md5.hexdigest(),
+        'complete': complete,
+        'mtime': os.path.getmtime(path)
+    }
+
+
+class ImageIndex:
+    """ Persistent `scan_image` result of every file of an image directory, keyed by path. """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def update(self, paths: List, num_workers: int = None):
+        """ Scan new or modified files in parallel and drop the entries of removed files. """
+        paths = set(paths)
+        todo = [p for p in paths if p not in self.entries or self.entries[p]['mtime'] != os.path.getmtime(p)]
+        self.entries = {k: v for k, v in self.entries.items() if k in paths}
+        if len(todo) > 0:
+            logging.info(f'scanning {len(todo)} images')
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                for p, entry in zip(todo, executor.map(
+                        scan_image, todo, chunksize=max(1, len(todo) // (4 * (num_workers or os.cpu_count() or 1))))):
+                    self.entries[p] = entry
+        atomic_json_dump(self.entries, self.path)
+        return self
+
+    def get(self, path: str):
+        """ Entry of the file (scanned on the fly if it is new or modified since the last update). """
+        entry = self.entries.get(path)
+        if entry is None or entry['mtime'] != os.path.getmtime(path):
+            entry = self.entries[path] = scan_image(path)
+        return entry
+
+    @property
+    def corrupt(self):
+        return sorted(k for k, v in self.entries.items() if not v['complete'])
+
+    def filter(self, paths: List, max_aspect_ratio: float = None, min_height: int = None, min_width: int = None):
+        """ Complete files whose true dimensions satisfy the filters. """
+        output = []
+        for p in paths:
+            entry = self.get(p)
+            if not entry['complete']:
+                continue
+            w, h = entry['width'], entry['height']
+            if max_aspect_ratio is not None and not (min(w, h) > 0 and max(w, h) / min(w, h) <= max_aspect_ratio):
+                continue
+            if min_height is not None and h < min_height:
+                continue
+            if min_width is not None and w < min_width:
+                continue
+            output.append(p)
+        return output
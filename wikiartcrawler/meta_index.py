@@ -0,0 +1,211 @@
+""" Columnar index over the painting meta cache for vectorized filtering across the corpus """
+import os
+import json
+import logging
+from glob import glob
+from typing import List, Dict
+
+import numpy as np
+
+__all__ = ('MetaIndex', 'match_painting', 'light_record')
+
+CATEGORICAL = ('styles', 'media', 'genres')  # multi-valued fields of the painting detail
+NUMERIC = ('completitionYear', 'width', 'height')
+
+
+def _number(value):
+    return float(value) if type(value) in [int, float] else np.nan
+
+
+def match_painting(painting: Dict,
+                   year_start: int = None,
+                   year_end: int = None,
+                   media: List = None,
+                   genre: List = None,
+                   style: List = None,
+                   max_aspect_ratio: float = None,
+                   min_height: int = None,
+                   min_width: int = None):
+    """ Whether a painting record of the meta cache matches every filter (record-wise version of `MetaIndex`). """
+    year, width, height = [_number(painting.get(k)) for k in NUMERIC]
+    if year_start is not None and not year >= year_start:
+        return False
+    if year_end is not None and not year <= year_end:
+        return False
+    if any(i is not None for i in [style, media, genre]):  # the detail is decoded only if a filter needs it
+        detail = painting.get('detail') or {}
+        for field, values in zip(CATEGORICAL, [style, media, genre]):
+            if values is not None and not any(v in (detail.get(field) or []) for v in values):
+                return False
+    if max_aspect_ratio is not None:
+        if not min(width, height) > 0 or not max(width, height) / min(width, height) <= max_aspect_ratio:
+            return False
+    if min_height is not None and not height >= min_height:
+        return False
+    if min_width is not None and not width >= min_width:
+        return False
+    return True
+
+
+def light_record(painting: Dict, artist_url: str):
+    """ Painting record of the meta cache in the layout of `MetaIndex.records` (no `detail`). """
+    record = {k: painting.get(k) or '' for k in ['id', 'url', 'image']}
+    record['artistUrl'] = artist_url
+    for k in NUMERIC:
+        value = _number(painting.get(k))
+        record[k] = None if np.isnan(value) else int(value)
+    return record
+
+
+class MetaIndex:
+    """ Paintings of every artist in `painting/meta` compiled into NumPy columns.
+
+    Multi-valued categorical fields (styles, media, genres) are encoded as integer codes into a vocabulary,
+    laid out in CSR form (`{field}_offsets`, `{field}_codes`) so that a filter is a single `np.isin`.
+
+    The mtime of every meta file is recorded, so an artist crawled again (or removed) after the build is stale
+    while the other artists of the index remain usable.
+    """
+
+    def __init__(self, columns: Dict):
+        self.columns = columns
+        self.artists = list(columns['artist_vocab'])
+        self._artist_code = {a: n for n, a in enumerate(self.artists)}
+        self._row = {}  # field -> row number of each code, derived from the offsets
+        for field in CATEGORICAL:
+            offsets = columns[f'{field}_offsets']
+            self._row[field] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        self._vocab = {field: {v: n for n, v in enumerate(columns[f'{field}_vocab'])} for field in CATEGORICAL}
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __contains__(self, artist_url):
+        return artist_url in self._artist_code
+
+    def stale_artists(self, meta_dir: str, artists: List = None):
+        """ Artists of the index whose meta file changed or was removed since the index was built.
+
+        @param meta_dir: meta directory the index was built from
+        @param artists: artists to check (default: every artist of the index)
+        """
+        artists = self.artists if artists is None else [a for a in artists if a in self]
+        if 'meta_mtime' not in self.columns:  # index built before the mtime of the files was recorded
+            return list(artists)
+        stale = []
+        for a in artists:
+            try:
+                mtime = os.stat(f'{meta_dir}/{a}.json').st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime != float(self.columns['meta_mtime'][self._artist_code[a]]):
+                stale.append(a)
+        return stale
+
+    def is_fresh(self, artist_url: str, meta_dir: str):
+        """ Whether the artist is in the index with the current version of its meta file. """
+        return artist_url in self and len(self.stale_artists(meta_dir, [artist_url])) == 0
+
+    @classmethod
+    def build(cls, meta_dir: str):
+        """ Compile every `{artist}.json` in `meta_dir` into an index. """
+        files = sorted(glob(f'{meta_dir}/*.json'))
+        artists = [os.path.basename(i)[:-len('.json')] for i in files]
+        meta_mtime = [os.stat(i).st_mtime for i in files]
+        rows = {k: [] for k in ['artist', 'id', 'url', 'image'] + list(NUMERIC)}
+        categorical = {field: {'vocab': {}, 'codes': [], 'offsets': [0]} for field in CATEGORICAL}
+        for n, path in enumerate(files):
+            with open(path) as f:
+                paintings = json.load(f)
+            for p in paintings:
+                rows['artist'].append(n)
+                for k in ['id', 'url', 'image']:
+                    rows[k].append(p.get(k) or '')
+                for k in NUMERIC:
+                    rows[k].append(_number(p.get(k)))
+                detail = p.get('detail') or {}
+                for field, c in categorical.items():
+                    c['codes'] += [c['vocab'].setdefault(v, len(c['vocab'])) for v in set(detail.get(field) or [])]
+                    c['offsets'].append(len(c['codes']))
+        columns = {
+            'artist_vocab': np.array(artists, dtype=str),
+            'meta_mtime': np.array(meta_mtime, dtype=np.float64),
+            'artist': np.array(rows['artist'], dtype=np.int32),
+        }
+        for k in ['id', 'url', 'image']:
+            columns[k] = np.array(rows[k], dtype=str)
+        for k in NUMERIC:
+            columns[k] = np.array(rows[k], dtype=np.float64)
+        for field, c in categorical.items():
+            columns[f'{field}_vocab'] = np.array(list(c['vocab'].keys()), dtype=str)
+            columns[f'{field}_codes'] = np.array(c['codes'], dtype=np.int32)
+            columns[f'{field}_offsets'] = np.array(c['offsets'], dtype=np.int64)
+        logging.info(f'meta index: {len(columns["id"])} paintings of {len(artists)} artists')
+        return cls(columns)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            np.savez(f, **self.columns)
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as f:
+            return cls({k: f[k] for k in f.files})
+
+    def _match_any(self, field, values):
+        codes = [self._vocab[field][v] for v in values if v in self._vocab[field]]
+        mask = np.zeros(len(self), dtype=bool)
+        hit = np.isin(self.columns[f'{field}_codes'], codes)
+        mask[self._row[field][hit]] = True
+        return mask
+
+    def query(self,
+              artist_url: List or str = None,
+              year_start: int = None,
+              year_end: int = None,
+              media: List = None,
+              genre: List = None,
+              style: List = None,
+              max_aspect_ratio: float = None,
+              min_height: int = None,
+              min_width: int = None):
+        """ Row numbers of the paintings matching the filters (same semantics as `get_painting_info`).
+
+        @param artist_url: artist alias or list of them (None for the whole corpus)
+        @return: numpy array of row numbers
+        """
+        c = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if artist_url is not None:
+            artist_url = [artist_url] if type(artist_url) is str else artist_url
+            mask &= np.isin(c['artist'], [self._artist_code[a] for a in artist_url if a in self._artist_code])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if year_start is not None:
+                mask &= c['completitionYear'] >= year_start
+            if year_end is not None:
+                mask &= c['completitionYear'] <= year_end
+            for field, values in zip(CATEGORICAL, [style, media, genre]):
+                if values is not None:
+                    mask &= self._match_any(field, values)
+            if max_aspect_ratio is not None:
+                ratio = np.maximum(c['width'], c['height']) / np.minimum(c['width'], c['height'])
+                mask &= ratio <= max_aspect_ratio
+            if min_height is not None:
+                mask &= c['height'] >= min_height
+            if min_width is not None:
+                mask &= c['width'] >= min_width
+        return np.flatnonzero(mask)
+
+    def records(self, rows):
+        """ Light painting records (no `detail`) of the given rows. """
+        c = self.columns
+        output = []
+        for r in rows:
+            record = {k: str(c[k][r]) for k in ['id', 'url', 'image']}
+            record['artistUrl'] = self.artists[c['artist'][r]]
+            for k in NUMERIC:
+                record[k] = None if np.isnan(c[k][r]) else int(c[k][r])
+            output.append(record)
+        return output
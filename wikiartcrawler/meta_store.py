@@ -0,0 +1,204 @@
+""" Compressed binary copy of the meta cache, decoded into `__slots__` records with a lazily decoded detail """
+import os
+import json
+import zlib
+import struct
+import logging
+from collections.abc import Mapping
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from .util import tmp_path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ('PaintingRecord', 'write_meta_store', 'read_meta_store', 'load_meta', 'read_meta', 'migrate_meta')
+
+MAGIC = b'WAMETA1'
+CODECS = {b'z': 'zlib', b's': 'zstd'}
+FIELDS = ('id', 'title', 'url', 'artistUrl', 'artistName', 'artistId', 'completitionYear', 'width', 'height', 'image')
+FIELD_BIT = dict({k: n for n, k in enumerate(FIELDS)}, detail=len(FIELDS))  # bit of the key in the record mask
+
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(bytes(data))
+
+
+class PaintingRecord(Mapping):
+    """ Painting of the meta cache as a read-only mapping of its dictionary (`record['url']`, `record.get(...)`).
+
+    The `detail` is kept as the encoded slice of the decompressed file until it is accessed. `to_dict` gives the
+    plain dictionary, which the public methods of `WikiartAPI` return.
+    """
+
+    __slots__ = FIELDS + ('_mask', '_extra', '_detail', '_raw')
+
+    def __init__(self, values: List, mask: int, extra, raw):
+        for k, v in zip(FIELDS, values):
+            setattr(self, k, v)
+        self._mask = mask  # keys of the record, see FIELD_BIT
+        self._extra = extra  # keys outside FIELDS (None if there is none)
+        self._detail = None
+        self._raw = raw  # encoded detail, None once decoded or if the record has no detail
+
+    @property
+    def detail(self):
+        if self._raw is not None:
+            self._detail, self._raw = _loads(self._raw), None
+        return self._detail
+
+    def keys(self):
+        return [k for k in FIELD_BIT if self._mask >> FIELD_BIT[k] & 1] + list(self._extra or [])
+
+    def __contains__(self, key):
+        if key in FIELD_BIT:
+            return bool(self._mask >> FIELD_BIT[key] & 1)
+        return key in (self._extra or ())
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key == 'detail':
+            return self.detail
+        return getattr(self, key) if key in FIELDS else self._extra[key]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_dict(self):
+        return {k: self[k] for k in self.keys()}
+
+
+def write_meta_store(records: List, path: str, compression: str = None):
+    """ Write painting records (list of dictionaries) into a compressed meta store file.
+
+    Layout: magic, codec, then the compressed body: length of the header, the header (one row of the light fields
+    per painting with the offsets of its detail) and the concatenated encoded details.
+
+    @param records: painting records of `painting/meta/{artist}.json`
+    @param path: output file
+    @param compression: `zstd` (default if `zstandard` is installed) or `zlib`
+    """
+    compression = compression or ('zstd' if zstandard is not None else 'zlib')
+    assert compression in CODECS.values(), compression
+    rows, details, offset = [], [], 0
+    for r in records:
+        mask = sum(1 << n for k, n in FIELD_BIT.items() if k in r)
+        extra = {k: v for k, v in r.items() if k not in FIELD_BIT} or None
+        if 'detail' in r:
+            details.append(_dumps(r['detail']))
+            rows.append([r.get(k) for k in FIELDS] + [mask, extra, offset, offset + len(details[-1])])
+            offset += len(details[-1])
+        else:
+            rows.append([r.get(k) for k in FIELDS] + [mask, extra, -1, -1])
+    header = _dumps({'fields': FIELDS, 'rows': rows})
+    body = struct.pack('>I', len(header)) + header + b''.join(details)
+    if compression == 'zstd':
+        body = zstandard.ZstdCompressor(level=10).compress(body)
+    else:
+        body = zlib.compress(body, 6)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tmp_path(path)
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + [k for k, v in CODECS.items() if v == compression][0] + body)
+    os.replace(tmp, path)
+
+
+def read_meta_store(path: str):
+    """ Painting records of a meta store file as a list of `PaintingRecord`. """
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:len(MAGIC)] == MAGIC, f'not a meta store: {path}'
+    codec = CODECS[data[len(MAGIC):len(MAGIC) + 1]]
+    body = data[len(MAGIC) + 1:]
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError(f'{path} is compressed with zstd: `pip install zstandard`')
+        body = zstandard.ZstdDecompressor().decompress(body, max_output_size=2 ** 31)
+    else:
+        body = zlib.decompress(body)
+    body = memoryview(body)
+    header_size = struct.unpack('>I', body[:4])[0]
+    header = _loads(body[4:4 + header_size])
+    assert tuple(header['fields']) == FIELDS, f'unknown fields: {header["fields"]}'
+    details = body[4 + header_size:]
+    n = len(FIELDS)
+    return [PaintingRecord(r[:n], r[n], r[n + 1], None if r[n + 2] < 0 else details[r[n + 2]:r[n + 3]])
+            for r in header['rows']]
+
+
+def store_path(cache_dir: str, artist_url: str):
+    return f'{cache_dir}/painting/meta_store/{artist_url}.bin'
+
+
+def _is_fresh(cache_dir: str, artist_url: str):
+    """ Whether the meta store of the artist exists and is not older than its meta JSON. """
+    path = store_path(cache_dir, artist_url)
+    if not os.path.exists(path):
+        return False
+    json_file = f'{cache_dir}/painting/meta/{artist_url}.json'
+    return not os.path.exists(json_file) or os.path.getmtime(path) >= os.path.getmtime(json_file)
+
+
+def load_meta(cache_dir: str, artist_url: str):
+    """ Painting records of the artist from the meta store, or None if it is missing or older than the JSON. """
+    if not _is_fresh(cache_dir, artist_url):
+        return None
+    return read_meta_store(store_path(cache_dir, artist_url))
+
+
+def read_meta(cache_dir: str, artist_url: str):
+    """ Painting records of the artist, from the meta store if it is up to date or else from the meta JSON. """
+    records = load_meta(cache_dir, artist_url)
+    if records is None:
+        with open(f'{cache_dir}/painting/meta/{artist_url}.json') as f:
+            records = json.load(f)
+    return records
+
+
+def _convert(cache_dir: str, artist_url: str, compression: str):
+    with open(f'{cache_dir}/painting/meta/{artist_url}.json') as f:
+        write_meta_store(json.load(f), store_path(cache_dir, artist_url), compression)
+    return artist_url
+
+
+def migrate_meta(cache_dir: str, compression: str = None, num_workers: int = None):
+    """ Convert the meta JSON files that have no up-to-date meta store in a process pool.
+
+    The JSON files remain the reference written by the crawler: a meta store older than its JSON is ignored
+    until the next migration.
+
+    @param cache_dir: cache directory
+    @param compression: `zstd` or `zlib` (see `write_meta_store`)
+    @param num_workers: number of processes
+    @return: list of converted artists
+    """
+    artists = sorted(os.path.basename(i)[:-len('.json')] for i in glob(f'{cache_dir}/painting/meta/*.json'))
+    todo = [a for a in artists if not _is_fresh(cache_dir, a)]
+    if len(todo) > 0:
+        logging.info(f'converting the meta of {len(todo)} artists')
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            todo = list(executor.map(
+                _convert, [cache_dir] * len(todo), todo, [compression] * len(todo),
+                chunksize=max(1, len(todo) // (4 * (num_workers or os.cpu_count() or 1)))))
+    return todo
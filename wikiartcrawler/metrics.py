@@ -0,0 +1,153 @@
+""" Process-wide crawl metrics (counters and latency histograms) exportable as JSON or Prometheus text """
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+__all__ = ('Metrics', 'METRICS', 'inc', 'observe', 'timer', 'snapshot', 'to_prometheus', 'dump', 'reset',
+           'endpoint_label', 'key_label')
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def endpoint_label(url: str):
+    """ API endpoint of a request url (eg. `PaintingsByArtist`), without the query. """
+    return urlparse(url).path.rstrip('/').split('/')[-1] or 'unknown'
+
+
+def key_label(session_key):
+    """ Short digest of a session key so that metrics never expose the key itself. """
+    if session_key is None:
+        return 'anonymous'
+    return hashlib.sha1(str(session_key).encode()).hexdigest()[:8]
+
+
+def _labels(labels: dict):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if len(items) == 0:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+class Metrics:
+    """ Thread-safe registry of labelled counters and histograms. """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}  # name -> {labels: value}
+        self.histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = [0] * (len(self.buckets) + 2)
+            h = series[key]
+            for n, upper in enumerate(self.buckets):
+                if value <= upper:
+                    h[n] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """ Observe the elapsed seconds of the block (also when it raises). """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name: str, **labels):
+        """ Sum of a counter over the series matching the labels. """
+        with self._lock:
+            series = self.counters.get(name, {})
+            return sum(v for k, v in series.items() if set(_labels(labels)) <= set(k))
+
+    def hit_ratio(self, name: str, **labels):
+        """ hit / (hit + miss) of a counter labelled with `result`, None if it was never incremented. """
+        hit, miss = self.value(name, result='hit', **labels), self.value(name, result='miss', **labels)
+        return None if hit + miss == 0 else hit / (hit + miss)
+
+    def snapshot(self):
+        """ JSON-serializable view of every series and of the cache hit ratios. """
+        with self._lock:
+            counters = {name: [dict(labels=dict(k), value=v) for k, v in sorted(series.items())]
+                        for name, series in sorted(self.counters.items())}
+            histograms = {name: [dict(labels=dict(k), buckets=dict(zip(map(str, self.buckets), h[:-2])),
+                                      sum=h[-2], count=h[-1]) for k, h in sorted(series.items())]
+                          for name, series in sorted(self.histograms.items())}
+        ratios = {name: self.hit_ratio(name) for name in counters
+                  if any(i['labels'].get('result') in ['hit', 'miss'] for i in counters[name])}
+        return {'timestamp': time.time(), 'uptime': time.time() - self.started, 'counters': counters,
+                'histograms': histograms, 'hit_ratios': ratios}
+
+    def to_prometheus(self):
+        """ Prometheus text exposition format. """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                lines += [f'{name}{_format_labels(k)} {v}' for k, v in sorted(series.items())]
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for k, h in sorted(series.items()):
+                    lines += [f'{name}_bucket{_format_labels(k, [("le", str(upper))])} {c}'
+                              for upper, c in zip(self.buckets, h[:-2])]
+                    lines.append(f'{name}_bucket{_format_labels(k, [("le", "+Inf")])} {h[-1]}')
+                    lines.append(f'{name}_sum{_format_labels(k)} {h[-2]}')
+                    lines.append(f'{name}_count{_format_labels(k)} {h[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str, export_format: str = None):
+        """ Write the metrics atomically (eg. for the node exporter textfile collector).
+
+        @param path: output file
+        @param export_format: `json` or `prometheus` (default: `prometheus` for `.prom` files, else `json`)
+        """
+        export_format = export_format or ('prometheus' if path.endswith('.prom') else 'json')
+        assert export_format in ['json', 'prometheus'], export_format
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f'{path}.tmp{os.getpid()}'
+        with open(tmp, 'w') as f:
+            if export_format == 'json':
+                json.dump(self.snapshot(), f, indent=1)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self.counters, self.histograms = {}, {}
+            self.started = time.time()
+
+
+METRICS = Metrics()
+inc = METRICS.inc
+observe = METRICS.observe
+timer = METRICS.timer
+snapshot = METRICS.snapshot
+to_prometheus = METRICS.to_prometheus
+dump = METRICS.dump
+reset = METRICS.reset
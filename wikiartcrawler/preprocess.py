@@ -0,0 +1,118 @@
+""" Multi-core image preprocessing (decode, resize, center crop) into uint8 NumPy batches """
+import os
+import json
+import hashlib
+import logging
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from .util import tmp_path
+
+__all__ = ('transform_image', 'preprocess_images')
+
+
+def transform_image(path: str, size: int = 256, crop: bool = True):
+    """ Decode an image into a uint8 RGB array resized so that the shorter side is `size`.
+
+    @param path: image file
+    @param size: output size (shorter side, or both sides if `crop`)
+    @param crop: center crop into `size` x `size`
+    @return: uint8 array (height, width, 3)
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', (size, size))  # let the JPEG decoder downscale by a power of two
+        img = img.convert('RGB')
+        w, h = img.size
+        scale = size / min(w, h)
+        img = img.resize((max(size, round(w * scale)), max(size, round(h * scale))), Image.BICUBIC)
+        if crop:
+            w, h = img.size
+            left, top = (w - size) // 2, (h - size) // 2
+            img = img.crop((left, top, left + size, top + size))
+        return np.asarray(img, dtype=np.uint8)
+
+
+def _aspect_ratio(path: str):
+    with Image.open(path) as img:  # reads the header only
+        w, h = img.size
+    return max(w, h) / min(w, h)
+
+
+def _derived_path(path: str, derived_dir: str):
+    return f"{derived_dir}/{hashlib.md5(os.path.abspath(path).encode()).hexdigest()}.npy"
+
+
+def _process(path: str, derived_dir: str, size: int, crop: bool, max_aspect_ratio: float):
+    """ Return the cached transform of the image (None if it does not satisfy the aspect ratio or is unreadable). """
+    derived = _derived_path(path, derived_dir)
+    if os.path.exists(derived) and os.path.getmtime(derived) >= os.path.getmtime(path):
+        return derived
+    try:
+        if max_aspect_ratio is not None and _aspect_ratio(path) > max_aspect_ratio:
+            return None
+        image = transform_image(path, size, crop)
+    except OSError:  # truncated file, or not an image (`PIL.UnidentifiedImageError`)
+        logging.warning(f'failed to read image: {path}')
+        return None
+    tmp = f'{tmp_path(derived)}.npy'
+    np.save(tmp, image)
+    os.replace(tmp, derived)
+    return derived
+
+
+def preprocess_images(paths: List,
+                      output_dir: str,
+                      derived_cache_dir: str,
+                      size: int = 256,
+                      crop: bool = True,
+                      max_aspect_ratio: float = None,
+                      batch_size: int = 1024,
+                      num_workers: int = None):
+    """ Transform images in a process pool and write them as `batch-*.npy` (uint8, N x size x size x 3).
+
+    Each transformed image is cached under `derived_cache_dir/{hash of transform params}` keyed by its path,
+    so a rerun only decodes new or modified images. The batch files of an earlier run in `output_dir` are replaced,
+    and those beyond the batches of this run are removed.
+
+    @param paths: image files
+    @param output_dir: directory for `batch-*.npy` and `batch-*.json` (list of source paths of the batch)
+    @param derived_cache_dir: root directory of the per-image cache
+    @param size: output image size
+    @param crop: center crop (batches require `crop=True` so that every image has the same shape)
+    @param max_aspect_ratio: skip images whose actual aspect ratio is larger (unreadable images are skipped too)
+    @param batch_size: number of images per batch file
+    @param num_workers: number of processes (default: number of CPUs)
+    @return: list of batch files
+    """
+    assert crop, 'images of a batch must have the same shape'
+    params = {'size': size, 'crop': crop, 'max_aspect_ratio': max_aspect_ratio}
+    derived_dir = f"{derived_cache_dir}/{hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()}"
+    os.makedirs(derived_dir, exist_ok=True)
+    with open(f'{derived_dir}/params.json', 'w') as f:
+        json.dump(params, f)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        derived = list(executor.map(
+            _process, paths, *[[i] * len(paths) for i in [derived_dir, size, crop, max_aspect_ratio]],
+            chunksize=max(1, len(paths) // (4 * (num_workers or os.cpu_count() or 1)))))
+    pairs = [(p, d) for p, d in zip(paths, derived) if d is not None]
+    logging.info(f'{len(pairs)} images preprocessed ({len(paths) - len(pairs)} unreadable or skipped by the aspect '
+                 f'ratio)')
+
+    os.makedirs(output_dir, exist_ok=True)
+    batch_files = []
+    for n, i in enumerate(range(0, len(pairs), batch_size)):
+        batch = pairs[i:i + batch_size]
+        batch_file = f'{output_dir}/batch-{n:05d}.npy'
+        np.save(batch_file, np.stack([np.load(d) for _, d in batch]))
+        with open(f'{output_dir}/batch-{n:05d}.json', 'w') as f:
+            json.dump([p for p, _ in batch], f)
+        batch_files.append(batch_file)
+    written = set(batch_files + [f[:-len('.npy')] + '.json' for f in batch_files])
+    for stale in sorted(set(glob(f'{output_dir}/batch-*.npy') + glob(f'{output_dir}/batch-*.json')) - written):
+        logging.info(f'removing the stale batch file {stale}')
+        os.remove(stale)
+    return batch_files
@@ -0,0 +1,108 @@
+""" Quota-aware scheduler over a pool of API session keys """
+import time
+import threading
+from collections import deque
+from typing import List
+
+from . import metrics
+
+__all__ = ('SessionKeyScheduler', 'API_RATE_LIMITS')
+
+# API calls: 10 requests per 2.5 seconds, max requests per hour: 400 (see `wikiart_api.py`)
+API_RATE_LIMITS = ((10, 2.5), (400, 3600))
+ANY_KEY = object()
+
+
+class SessionKeyScheduler:
+    """ Track the sliding-window budget of each session key and hand out a key that has capacity.
+
+    A pool without session key is represented as `[None]` so that anonymous requests are
+    throttled with the same budget.
+    """
+
+    def __init__(self, session_keys: List = None, rate_limits=API_RATE_LIMITS):
+        self.session_keys = list(session_keys) if session_keys else [None]
+        self.rate_limits = tuple(rate_limits)
+        self._history = {k: [deque() for _ in self.rate_limits] for k in self.session_keys}
+        self._blocked_until = {k: 0.0 for k in self.session_keys}
+        self._used = {k: 0 for k in self.session_keys}
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def _wait_time(self, key, now):
+        """ Seconds until `key` can make a request (0 if it can right now). """
+        wait = max(0.0, self._blocked_until[key] - now)
+        for (limit, period), history in zip(self.rate_limits, self._history[key]):
+            while history and history[0] <= now - period:
+                history.popleft()
+            if len(history) >= limit:
+                wait = max(wait, history[0] + period - now)
+        return wait
+
+    def try_acquire(self, session_key=ANY_KEY):
+        """ Non-blocking `acquire` (eg. for an event loop).
+
+        @param session_key: restrict to a specific key
+        @return: (session key, 0) if a key has capacity (the request is recorded), else (None, seconds to wait)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if session_key is ANY_KEY:
+                n = len(self.session_keys)
+                candidates = [self.session_keys[(self._cursor + i) % n] for i in range(n)]
+            else:
+                candidates = [session_key]
+            waits = []
+            for k in candidates:
+                wait = self._wait_time(k, now)
+                if wait == 0:
+                    for history in self._history[k]:
+                        history.append(now)
+                    self._used[k] += 1
+                    if session_key is ANY_KEY:
+                        self._cursor = (self.session_keys.index(k) + 1) % len(self.session_keys)
+                    return k, 0
+                waits.append(wait)
+            return None, min(waits)
+
+    def acquire(self, session_key=ANY_KEY):
+        """ Block until a session key has capacity, record the request and return the key.
+
+        @param session_key: restrict to a specific key (eg. to keep a paginated request on one key)
+        @return: session key to use for the request
+        """
+        start = time.monotonic()
+        while True:
+            key, wait = self.try_acquire(session_key)
+            if wait == 0:
+                metrics.observe('wikiart_scheduler_wait_seconds', time.monotonic() - start)
+                return key
+            time.sleep(wait)
+
+    def block(self, session_key, seconds: float = None):
+        """ Take a key out of rotation, eg. after the API reports its quota is exhausted.
+
+        @param session_key: the key to block
+        @param seconds: duration to block (default: the longest rate-limit window)
+        """
+        seconds = max(p for _, p in self.rate_limits) if seconds is None else seconds
+        metrics.inc('wikiart_session_key_blocked_total', session_key=metrics.key_label(session_key))
+        with self._lock:
+            self._blocked_until[session_key] = time.monotonic() + seconds
+
+    def remaining(self, session_key):
+        """ Remaining number of requests of each rate-limit window for the key. """
+        with self._lock:
+            now = time.monotonic()
+            self._wait_time(session_key, now)
+            if self._blocked_until[session_key] > now:
+                return [0 for _ in self.rate_limits]
+            return [limit - len(h) for (limit, _), h in zip(self.rate_limits, self._history[session_key])]
+
+    def stats(self):
+        """ Used and remaining quota per session key. """
+        return {k: {'used': self._used[k], 'remaining': self.remaining(k)} for k in self.session_keys}
+
+    @property
+    def used(self):
+        return sum(self._used.values())
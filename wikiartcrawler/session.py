@@ -0,0 +1,102 @@
+""" Shared keep-alive HTTP session with connection pooling, retry and timeout """
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+__all__ = ('configure_session', 'get_session', 'http_get', 'http_head')
+
+DEFAULT_CONFIG = {
+    'pool_size': 16,  # connections kept alive per host
+    'max_retries': 5,
+    'backoff_factor': 0.5,  # sleep 0.5, 1, 2, 4, ... seconds between retries
+    'status_forcelist': (429, 500, 502, 503, 504),
+    'timeout': (10, 60)  # (connect, read) seconds
+}
+QUOTA_STATUS = 429  # quota of the session key exhausted
+_CONFIG = dict(DEFAULT_CONFIG)
+_SESSIONS = {}  # quota_retry -> session
+_LOCK = threading.Lock()
+
+
+def _build_session(pool_size, max_retries, backoff_factor, status_forcelist):
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False  # return the last response and let the caller validate it
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def configure_session(pool_size: int = None,
+                      max_retries: int = None,
+                      backoff_factor: float = None,
+                      status_forcelist=None,
+                      timeout=None):
+    """ Update the shared session configuration (the session is rebuilt on next use).
+
+    @param pool_size: number of keep-alive connections per host
+    @param max_retries: number of retries on connection error or `status_forcelist` response
+    @param backoff_factor: exponential backoff factor between retries
+    @param status_forcelist: status codes to retry on
+    @param timeout: request timeout in seconds, either a float or a (connect, read) tuple
+    """
+    update = dict(pool_size=pool_size, max_retries=max_retries, backoff_factor=backoff_factor,
+                  status_forcelist=status_forcelist, timeout=timeout)
+    with _LOCK:
+        _CONFIG.update({k: v for k, v in update.items() if v is not None})
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
+def get_session(quota_retry: bool = True):
+    """ Shared `requests.Session`, created on first use.
+
+    @param quota_retry: retry 429 responses within the transport; the session without it is used for the requests
+        of the session key scheduler, which has to see every 429 to block the key and move on to another one
+    """
+    with _LOCK:
+        if quota_retry not in _SESSIONS:
+            status_forcelist = _CONFIG['status_forcelist'] if quota_retry else \
+                tuple(i for i in _CONFIG['status_forcelist'] if i != QUOTA_STATUS)
+            _SESSIONS[quota_retry] = _build_session(
+                _CONFIG['pool_size'], _CONFIG['max_retries'], _CONFIG['backoff_factor'], status_forcelist
+            )
+        return _SESSIONS[quota_retry]
+
+
+def _request(method: str, url: str, quota_retry: bool = True, **kwargs):
+    kwargs.setdefault('timeout', _CONFIG['timeout'])
+    host = urlparse(url).netloc
+    try:
+        response = get_session(quota_retry).request(method, url, **kwargs)
+    except requests.RequestException as e:
+        metrics.inc('wikiart_http_errors_total', host=host, error=type(e).__name__)
+        raise
+    retries = getattr(getattr(response.raw, 'retries', None), 'history', None)
+    if retries:
+        metrics.inc('wikiart_http_retries_total', len(retries), host=host)
+    return response
+
+
+def http_get(url: str, quota_retry: bool = True, **kwargs):
+    """ GET through the shared session with the configured timeout (see `get_session` for `quota_retry`). """
+    return _request('GET', url, quota_retry, **kwargs)
+
+
+def http_head(url: str, **kwargs):
+    """ HEAD through the shared session with the configured timeout (redirects are followed). """
+    kwargs.setdefault('allow_redirects', True)
+    return _request('HEAD', url, **kwargs)
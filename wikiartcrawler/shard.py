@@ -0,0 +1,138 @@
+""" Sharded image store: large tar shards (WebDataset layout) with an offset index for mmap random access """
+import io
+import os
+import json
+import mmap
+import tarfile
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+__all__ = ('export_shards', 'ShardReader')
+
+INDEX_FILE = 'index.json'
+
+
+def _shard_name(n):
+    return f'shard-{n:05d}.tar'
+
+
+def _add(tar, name, data):
+    """ Append a file to the tar and return the offset of its data in the archive. """
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+    # the data is padded to the block size and directly precedes the current end of the archive
+    padded = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    return tar.offset - padded
+
+
+def _write_shard(path: str, items: List):
+    """ Write one shard and return the (data offset, size) of the image and meta of each item. """
+    offsets = []
+    with open(f'{path}.tmp', 'wb') as f:
+        with tarfile.open(fileobj=f, mode='w', format=tarfile.GNU_FORMAT) as tar:
+            for key, image_path, meta in items:
+                with open(image_path, 'rb') as f_image:
+                    image = f_image.read()
+                meta = json.dumps(meta).encode()
+                offsets.append([_add(tar, f'{key}.jpg', image), len(image), _add(tar, f'{key}.json', meta), len(meta)])
+    os.replace(f'{path}.tmp', path)
+    return offsets
+
+
+def export_shards(items: List,
+                  output_dir: str,
+                  shard_size: int = 1024 ** 3,
+                  num_workers: int = None):
+    """ Pack images into tar shards of about `shard_size` bytes written in parallel.
+
+    @param items: list of (key, image path, metadata dict); keys must be unique and contain no `.`
+    @param output_dir: directory for `shard-*.tar` and `index.json`
+    @param shard_size: target shard size in bytes
+    @param num_workers: number of processes writing shards (default: number of CPUs)
+    @return: `ShardReader` over the exported shards
+    """
+    assert len(set(k for k, _, _ in items)) == len(items), 'duplicated keys'
+    assert all('.' not in k for k, _, _ in items), 'keys must not contain `.`'
+    os.makedirs(output_dir, exist_ok=True)
+    shards, size = [[]], 0
+    for item in items:
+        if size >= shard_size:
+            shards.append([])
+            size = 0
+        shards[-1].append(item)
+        size += os.path.getsize(item[1])
+    shards = [s for s in shards if len(s) > 0]
+    logging.info(f'writing {len(items)} images into {len(shards)} shards: {output_dir}')
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_write_shard, f'{output_dir}/{_shard_name(n)}', s) for n, s in enumerate(shards)]
+        offsets = [f.result() for f in futures]
+    index = {'shards': [_shard_name(n) for n in range(len(shards))], 'items': []}
+    for n, (shard, shard_offsets) in enumerate(zip(shards, offsets)):
+        index['items'] += [[key, n] + o for (key, _, _), o in zip(shard, shard_offsets)]
+    with open(f'{output_dir}/{INDEX_FILE}.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(f'{output_dir}/{INDEX_FILE}.tmp', f'{output_dir}/{INDEX_FILE}')
+    return ShardReader(output_dir)
+
+
+class ShardReader:
+    """ Read exported shards either by random access (`reader[i]`, `reader.get(key)`) through mmap, or as a
+    sequential stream (`iter(reader)`, `reader.stream(rank, world_size)`). Items are (key, image bytes, meta). """
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = shard_dir
+        with open(f'{shard_dir}/{INDEX_FILE}') as f:
+            index = json.load(f)
+        self.shards = index['shards']
+        self.items = index['items']
+        self.keys = [i[0] for i in self.items]
+        self._position = {k: n for n, k in enumerate(self.keys)}
+        self._mmap = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self._position
+
+    def _shard(self, n):
+        with self._lock:
+            if n not in self._mmap:
+                with open(f'{self.shard_dir}/{self.shards[n]}', 'rb') as f:
+                    self._mmap[n] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap[n]
+
+    def __getitem__(self, i):
+        key, n, image_offset, image_size, meta_offset, meta_size = self.items[i]
+        shard = self._shard(n)
+        image = shard[image_offset:image_offset + image_size]
+        return key, image, json.loads(shard[meta_offset:meta_offset + meta_size])
+
+    def get(self, key):
+        return self[self._position[key]]
+
+    def stream(self, rank: int = 0, world_size: int = 1):
+        """ Read whole shards sequentially (shards are split over `world_size` workers). """
+        for n in range(rank, len(self.shards), world_size):
+            with tarfile.open(f'{self.shard_dir}/{self.shards[n]}', mode='r|') as tar:
+                image = None
+                for member in tar:
+                    data = tar.extractfile(member).read()
+                    key, ext = member.name.split('.', 1)
+                    if ext == 'jpg':
+                        image = data
+                    else:
+                        yield key, image, json.loads(data)
+
+    def __iter__(self):
+        return self.stream()
+
+    def close(self):
+        with self._lock:
+            for m in self._mmap.values():
+                m.close()
+            self._mmap = {}
@@ -0,0 +1,126 @@
+""" Image counts per art movement, genre, media and image type computed in a single pass over the cache """
+import os
+import json
+import logging
+from collections import Counter
+from typing import List, Dict
+
+from .util import atomic_json_dump
+from .catalog import get_catalog
+from .meta_store import read_meta
+from .artist_group import VALID_ARTIST_GROUPS, load_artists
+
+__all__ = ('PaintingStats',)
+
+IMAGE_TYPES = ('image', 'image_face', 'image_face_blur')
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class PaintingStats:
+    """ Number of cached images of every artist by (genres, media) of the painting and image type.
+
+    Each artist is aggregated once (an artist of several art movements is not read again) and the result is
+    cached in `painting/stats.json` keyed by the mtime of its meta file and image directories, so an update
+    after a crawl only reads the artists that changed. Only the art movements passed to `update` can be counted.
+    Counts follow `get_painting` with `skip_download`: an image is counted if its file is cached, and it matches
+    the genre/media filters through the meta of the painting of the same name.
+    """
+
+    def __init__(self, cache_dir: str, image_types: List = IMAGE_TYPES):
+        self.cache_dir = cache_dir
+        self.image_types = list(image_types)
+        self.path = f'{cache_dir}/painting/stats.json'
+        self.artists = {}  # artist -> {'key': [mtime, ...], 'counts': {image type: [[genres, media, count], ...]}}
+        self.groups = []  # art movements aggregated by `update`
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if 'groups' in data:
+                self.artists, self.groups = data['artists'], data['groups']
+
+    def _key(self, artist_url: str):
+        return [_mtime(f'{self.cache_dir}/painting/meta/{artist_url}.json')] + \
+            [_mtime(f'{self.cache_dir}/painting/{t}/{artist_url}') for t in self.image_types]
+
+    def _aggregate(self, artist_url: str):
+        """ Count the images of an artist by (genres, media) of their painting, reading its meta file once. """
+        meta = {}
+        for i in read_meta(self.cache_dir, artist_url):
+            if 'FRAME-600x480' in i['image']:  # blocked on copyright grounds
+                continue
+            detail = i.get('detail') or {}
+            meta[i['url']] = (tuple(sorted(set(detail.get('genres') or []))),
+                              tuple(sorted(set(detail.get('media') or []))))
+        catalog = get_catalog(self.cache_dir)
+        counts = {}
+        for image_type in self.image_types:
+            counter = Counter(meta.get(os.path.basename(p).rsplit('.', 1)[0], ((), ()))
+                              for p in catalog.images(artist_url, image_type))
+            counts[image_type] = [[list(g), list(m), n] for (g, m), n in sorted(counter.items())]
+        return counts
+
+    def update(self, groups: List or str = None):
+        """ Aggregate the artists of the art movements whose meta file or images changed since the last update.
+
+        @param groups: art movements (default: `VALID_ARTIST_GROUPS`)
+        @return: self
+        """
+        groups = VALID_ARTIST_GROUPS if groups is None else [groups] if type(groups) is str else groups
+        artists = get_catalog(self.cache_dir).artists
+        changed = 0
+        new_groups = [g for g in groups if g not in self.groups]
+        self.groups += new_groups
+        for a in sorted(set(a for g in groups for a in load_artists(g) if a in artists)):
+            key = self._key(a)
+            if a in self.artists and self.artists[a]['key'] == key:
+                continue
+            self.artists[a] = {'key': key, 'counts': self._aggregate(a)}
+            changed += 1
+        self.artists = {k: v for k, v in self.artists.items() if k in artists}
+        if changed > 0 or len(new_groups) > 0:
+            logging.info(f'painting stats: {changed} artists updated')
+            atomic_json_dump({'groups': self.groups, 'artists': self.artists}, self.path)
+        return self
+
+    def count_artist(self, artist_url: str, image_type: str = 'image', media: List = None, genre: List = None):
+        """ Number of images of the artist (same semantics as the `media`/`genre` filters of `get_painting`). """
+        if artist_url not in self.artists:
+            return 0
+        return sum(n for g, m, n in self.artists[artist_url]['counts'].get(image_type, [])
+                   if (genre is None or any(v in g for v in genre)) and (media is None or any(v in m for v in media)))
+
+    def count(self, image_type: str = 'image', media: List = None, genre: List = None, groups: List = None):
+        """ Number of images per art movement, and over all of them as `All` (an artist is counted once).
+
+        @param image_type: image type of `get_painting` (`image`, `face`, `face_blur`)
+        @param media: media filter
+        @param genre: genre filter
+        @param groups: art movements aggregated by `update` (default: all of them)
+        @return: dictionary of art movement -> number of images
+        """
+        image_type = 'image' if image_type in [None, 'image'] else f'image_{image_type}'
+        assert image_type in self.image_types, f'{image_type} is not aggregated'
+        groups = self.groups if groups is None else [groups] if type(groups) is str else groups
+        missing = [g for g in groups if g not in self.groups]
+        assert len(missing) == 0, f'{missing} are not aggregated, run `update` first'
+        per_artist = {}
+        output = {}
+        for g in groups:
+            output[g] = 0
+            for a in load_artists(g):
+                if a in self.artists:
+                    if a not in per_artist:
+                        per_artist[a] = self.count_artist(a, image_type, media, genre)
+                    output[g] += per_artist[a]
+        output['All'] = sum(per_artist.values())
+        return output
+
+    def table(self, columns: Dict, groups: List = None):
+        """ Counts of several filter sets, eg. `{'Portrait': {'genre': ['portrait']}}`, as {column: `count`}. """
+        return {k: self.count(groups=groups, **v) for k, v in columns.items()}
@@ -0,0 +1,242 @@
+""" Content-addressed, size-bounded image store with LRU/LFU eviction """
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from .util import atomic_json_dump, file_checksum, tmp_path, HOSTNAME
+
+__all__ = ('ImageStore', 'parse_size')
+
+EVICTION_POLICIES = ['lru', 'lfu']
+_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+
+def parse_size(size):
+    """ Bytes of a size given as a number or a string such as `500MB` or `20GB`. """
+    if size is None or isinstance(size, (int, float)):
+        return size
+    size = size.strip().upper()
+    number = size.rstrip('KMGTB')
+    assert size[len(number):] in _UNITS, f'unknown unit: {size}'
+    return int(float(number) * _UNITS[size[len(number):]])
+
+
+def _newest_mtime(path: str):
+    """ Newest mtime of a file, or of a directory and everything under it. """
+    mtime = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for i in dirs + files:
+            try:
+                mtime = max(mtime, os.path.getmtime(os.path.join(root, i)))
+            except FileNotFoundError:
+                pass
+    return mtime
+
+
+class ImageStore:
+    """ Store every image file once under `painting/store/objects/{sha256}` and hard-link it into the image
+    directories, so a painting referenced from several artists or groups takes the disk space of one file and
+    every path-based reader (catalog, indices, shards) keeps working.
+
+    The total size of the objects is kept within `budget` by evicting the least recently (`lru`) or least
+    frequently (`lfu`) accessed objects with every path linking to them. Accesses are appended to
+    `painting/store/access.log`, which is replayed on load, and evicted paths are recorded so that the caller
+    can fetch them again.
+    """
+
+    def __init__(self, cache_dir: str, budget=None, policy: str = 'lru'):
+        """ Content-addressed image store.
+
+        @param cache_dir: cache directory
+        @param budget: maximum size of the stored images in bytes or as a string such as `20GB` (None for no limit)
+        @param policy: eviction policy, `lru` or `lfu`
+        """
+        assert policy in EVICTION_POLICIES, f'{policy} not in {EVICTION_POLICIES}'
+        self.cache_dir = cache_dir
+        self.root = f'{cache_dir}/painting/store'
+        self.budget = parse_size(budget)
+        self.policy = policy
+        self.objects = {}  # sha256 -> {size, paths, added, last_access, hits}
+        self.paths = {}  # path -> sha256
+        self.evicted = set()
+        self._log_offset = 0
+        self._lock = threading.RLock()
+        os.makedirs(f'{self.root}/objects', exist_ok=True)
+        if os.path.exists(f'{self.root}/index.json'):
+            with open(f'{self.root}/index.json') as f:
+                index = json.load(f)
+            self.objects, self.evicted, self._log_offset = index['objects'], set(index['evicted']), index['log_offset']
+            self.paths = {p: k for k, v in self.objects.items() for p in v['paths']}
+        self._replay_log()
+
+    @property
+    def size(self):
+        """ Total bytes of the stored objects. """
+        return sum(v['size'] for v in self.objects.values())
+
+    def _object_path(self, sha):
+        return f'{self.root}/objects/{sha[:2]}/{sha}'
+
+    def _replay_log(self):
+        """ Apply the accesses logged after the last save of the index. """
+        log_file = f'{self.root}/access.log'
+        if not os.path.exists(log_file):
+            return
+        with open(log_file) as f:
+            f.seek(self._log_offset)
+            for line in f:
+                access_time, sha = line.rstrip('\n').split('\t')[:2]
+                if sha in self.objects:
+                    self.objects[sha]['last_access'] = max(self.objects[sha]['last_access'], float(access_time))
+                    self.objects[sha]['hits'] += 1
+
+    def save(self):
+        with self._lock:
+            log_file = f'{self.root}/access.log'
+            self._log_offset = os.path.getsize(log_file) if os.path.exists(log_file) else 0
+            atomic_json_dump({'objects': self.objects, 'evicted': sorted(self.evicted), 'log_offset': self._log_offset},
+                             f'{self.root}/index.json')
+
+    def _link(self, path: str, sha: str):
+        """ Replace `path` with a hard link to the object (the object is created from `path` if new). """
+        target = self._object_path(sha)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.link(path, target)
+            return True
+        if not os.path.samefile(path, target):
+            tmp = tmp_path(path)
+            os.link(target, tmp)
+            os.replace(tmp, path)
+        return False
+
+    def ingest(self, paths: List, num_workers: int = 8):
+        """ Move new or modified files into the store (hashing in a thread pool).
+
+        @param paths: image files
+        @param num_workers: number of hashing threads
+        @return: number of bytes saved by files whose content was already stored
+        """
+        with self._lock:
+            todo = [p for p in paths if p not in self.paths
+                    or not os.path.exists(self._object_path(self.paths[p]))
+                    or not os.path.samefile(p, self._object_path(self.paths[p]))]
+        if len(todo) == 0:
+            return 0
+        with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+            hashes = list(executor.map(file_checksum, todo))
+        saved = 0
+        now = time.time()
+        with self._lock:
+            for path, sha in zip(todo, hashes):
+                if path in self.paths:
+                    self._unlink_path(path, remove_file=False)
+                size = os.path.getsize(path)
+                if not self._link(path, sha):
+                    saved += size
+                entry = self.objects.setdefault(sha, {'size': size, 'paths': [], 'added': now,
+                                                      'last_access': now, 'hits': 0})
+                entry['paths'].append(path)
+                self.paths[path] = sha
+                self.evicted.discard(path)
+            self.save()
+        logging.info(f'{len(todo)} images stored ({saved / 1024 ** 2:.1f} MB shared with stored images)')
+        return saved
+
+    def _unlink_path(self, path: str, remove_file: bool = True):
+        sha = self.paths.pop(path)
+        entry = self.objects[sha]
+        entry['paths'].remove(path)
+        if remove_file and os.path.exists(path):
+            os.remove(path)
+        if len(entry['paths']) == 0:
+            if os.path.exists(self._object_path(sha)):
+                os.remove(self._object_path(sha))
+            del self.objects[sha]
+
+    def prune(self):
+        """ Forget the files removed outside of the store. """
+        with self._lock:
+            removed = [p for p in self.paths if not os.path.exists(p)]
+            for p in removed:
+                self._unlink_path(p, remove_file=False)
+            if len(removed) > 0:
+                self.save()
+        return removed
+
+    def touch(self, paths: List):
+        """ Record an access to the files in memory and in the access log. """
+        now = time.time()
+        lines = []
+        with self._lock:
+            for p in paths:
+                sha = self.paths.get(p)
+                if sha is None:
+                    continue
+                self.objects[sha]['last_access'] = now
+                self.objects[sha]['hits'] += 1
+                lines.append(f'{now}\t{sha}\t{p}\n')
+            if len(lines) > 0:
+                with open(f'{self.root}/access.log', 'a') as f:
+                    f.writelines(lines)
+
+    def enforce(self, protect: List = None):
+        """ Evict objects until the store fits in the budget.
+
+        @param protect: paths that must not be evicted (eg. the result of the current request)
+        @return: list of evicted paths
+        """
+        if self.budget is None:
+            return []
+        with self._lock:
+            size = self.size
+            if size <= self.budget:
+                return []
+            protect = set(self.paths[p] for p in protect or [] if p in self.paths)
+            if self.policy == 'lru':
+                order = sorted(self.objects, key=lambda k: self.objects[k]['last_access'])
+            else:
+                order = sorted(self.objects, key=lambda k: (self.objects[k]['hits'], self.objects[k]['last_access']))
+            evicted = []
+            for sha in order:
+                if size <= self.budget:
+                    break
+                if sha in protect:
+                    continue
+                size -= self.objects[sha]['size']
+                for p in list(self.objects[sha]['paths']):
+                    self._unlink_path(p)
+                    evicted.append(p)
+            self.evicted.update(evicted)
+            self.save()
+        logging.info(f'{len(evicted)} images evicted ({self.policy}), store size: {size / 1024 ** 2:.1f} MB')
+        return evicted
+
+    def evicted_paths(self, directory: str):
+        """ Evicted paths under a directory (eg. the image directory of an artist). """
+        directory = directory.rstrip('/') + '/'
+        with self._lock:
+            return sorted(p for p in self.evicted if p.startswith(directory))
+
+    def remove_stale_tmp(self, max_age: float = 24 * 3600):
+        """ Remove leftovers of interrupted downloads/extractions in `tmp/{HOSTNAME}` untouched for `max_age` seconds.
+
+        An entry is stale if the newest mtime of its files is older than `max_age` (a directory keeps the mtime
+        of its last created child, not of the files written inside). The directories of other hosts sharing the
+        cache are left to those hosts.
+        """
+        tmp_dir = f'{self.cache_dir}/tmp/{HOSTNAME}'
+        if not os.path.exists(tmp_dir):
+            return []
+        removed = []
+        for i in os.listdir(tmp_dir):
+            path = f'{tmp_dir}/{i}'
+            if time.time() - _newest_mtime(path) > max_age:
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+                removed.append(path)
+        return removed
@@ -0,0 +1,152 @@
+""" Incremental refresh of the artist/dictionary lists, the meta cache and the release archives """
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .util import atomic_json_dump
+from .session import http_head
+from .bootstrap import bootstrap, release_archives
+from .wikiart_api import API_ROOT, iter_api_pages, api_request, get_painting_detail
+
+__all__ = ('load_sync_state', 'sync')
+
+SYNC_STATE_FILE = 'sync_state.json'
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def load_sync_state(cache_dir: str):
+    """ Last sync time and pagination token of each endpoint, pending artists and release versions. """
+    path = f'{cache_dir}/{SYNC_STATE_FILE}'
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _sync_updates(api, state: dict, name: str, endpoint: str, merge):
+    """ Fetch the records updated since the last sync page by page, merging each page with `merge`.
+
+    The pagination token is saved after every page, so an interrupted sync resumes from the next page.
+    `last_sync` moves forward only once the last page has been merged.
+    """
+    entry = state.setdefault(name, {})
+    if entry.get('pagination_token') is None:
+        entry['started'] = _now()
+    url = f'{API_ROOT}/{endpoint}'
+    if entry.get('last_sync') is not None:
+        url = f"{url}?fromDate={entry['last_sync']}"
+    n, completed = 0, False
+    for page in iter_api_pages(url, ignore_error=True, scheduler=api.scheduler,
+                               pagination_token=entry.get('pagination_token')):
+        records = page.get('data', [])
+        merge(records)
+        n += len(records)
+        completed = not page.get('hasMore')
+        entry['pagination_token'] = None if completed else page['paginationToken']
+        atomic_json_dump(state, f'{api.cache_dir}/{SYNC_STATE_FILE}')
+    if completed:
+        entry['last_sync'] = entry['started']
+        atomic_json_dump(state, f'{api.cache_dir}/{SYNC_STATE_FILE}')
+    else:
+        logging.warning(f'`{endpoint}` sync interrupted, it resumes from the last page on the next run')
+    return n
+
+
+def sync_artist_paintings(api, artist_url: str, num_workers: int = None):
+    """ Merge new paintings of an artist into the meta cache, requesting the detail of new paintings only.
+
+    @return: number of new paintings (None if the artworks are blocked on copyright grounds)
+    """
+    cache_file = f'{api.cache_dir}/painting/meta/{artist_url}.json'
+    with open(cache_file) as f:
+        cached = {i['id']: i for i in json.load(f)}
+    listing = api_request(f'{API_ROOT}/PaintingsByArtist?id={api.dict_artist[artist_url]}',
+                          scheduler=api.scheduler)
+    if any('FRAME-600x480' in i['image'] for i in listing):
+        return None
+    new = [i for i in listing if i['id'] not in cached]
+    with ThreadPoolExecutor(max_workers=max(num_workers or api.num_workers, 1)) as executor:
+        details = list(executor.map(lambda i: get_painting_detail(i['id'], scheduler=api.scheduler), new))
+    for i, detail in zip(new, details):
+        i['detail'] = detail
+        cached[i['id']] = i
+    atomic_json_dump([cached[i['id']] for i in listing], cache_file)
+    return len(new)
+
+
+def sync_releases(api, state: dict):
+    """ Re-download the release archives whose ETag/Last-Modified changed since the last sync. """
+    versions = state.setdefault('releases', {})
+    changed = []
+    for archive in release_archives():
+        headers = http_head(archive[1]).headers
+        version = headers.get('ETag') or headers.get('Last-Modified')
+        if version is None:
+            continue
+        if archive[0] in versions and versions[archive[0]] != version:
+            changed.append(archive)
+        versions[archive[0]] = version
+    if len(changed) > 0:
+        logging.info(f'release archives updated: {[a[0] for a in changed]}')
+        bootstrap(api.cache_dir, changed, force=True)
+    atomic_json_dump(state, f'{api.cache_dir}/{SYNC_STATE_FILE}')
+    return [a[0] for a in changed]
+
+
+def sync(api,
+         dictionaries: bool = True,
+         artists: bool = True,
+         paintings: bool = True,
+         releases: bool = True,
+         num_workers: int = None):
+    """ Incrementally refresh the caches of a `WikiartAPI` from the last sync recorded in `sync_state.json`.
+
+    - dictionaries/artists: `UpdatedDictionaries`/`UpdatedArtists` from the last sync date, merged atomically
+      into `dictionaries.json`/`artists.json`
+    - paintings: artists updated since the last sync that have a meta cache get their new paintings merged
+      (the first sync only records the sync date)
+    - releases: archives whose ETag changed are re-extracted (the first sync only records the versions)
+
+    @return: summary of the number of updated records
+    """
+    state = load_sync_state(api.cache_dir)
+    summary = {}
+
+    if dictionaries:
+        def merge_dictionaries(records):
+            api.dict_group.update({i['title']: {'id': i['id'], 'url': i['url'], 'group': i['group']} for i in records})
+            atomic_json_dump(api.dict_group, f'{api.cache_dir}/dictionaries.json')
+        summary['dictionaries'] = _sync_updates(api, state, 'dictionaries', 'UpdatedDictionaries', merge_dictionaries)
+
+    if artists:
+        pending = set(state.get('pending_artists', []))
+        # the first sync has no date to compare with: it only records the baseline
+        baseline = state.get('artists', {}).get('last_sync') is None
+
+        def merge_artists(records):
+            records = [i for i in records if i.get('url') is not None]
+            api.dict_artist.update({i['url']: i['id'] for i in records})
+            if not baseline:
+                pending.update(i['url'] for i in records)
+            state['pending_artists'] = sorted(pending)
+            atomic_json_dump(api.dict_artist, f'{api.cache_dir}/artists.json')
+        summary['artists'] = _sync_updates(api, state, 'artists', 'UpdatedArtists', merge_artists)
+        api.artist_wikiart = sorted(list(api.dict_artist.keys()))
+
+    if paintings:
+        summary['paintings'] = {}
+        for artist_url in list(state.get('pending_artists', [])):
+            if artist_url in api.catalog:
+                summary['paintings'][artist_url] = sync_artist_paintings(api, artist_url, num_workers)
+            state['pending_artists'].remove(artist_url)
+            atomic_json_dump(state, f'{api.cache_dir}/{SYNC_STATE_FILE}')
+
+    if releases:
+        summary['releases'] = sync_releases(api, state)
+    logging.info(f'sync completed: {summary}')
+    return summary
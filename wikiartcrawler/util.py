@@ -1,28 +1,31 @@
 import os
+import json
+import time
+import queue
+import threading
+import shutil
+import hashlib
+import logging
 import tarfile
 import zipfile
 import gzip
-import requests
+import socket
 
 
 __all__ = 'wget'
 
-URL_LIST = {
-    'abstract_expressionism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/abstract_expressionism.zip',
-    'baroque': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/abstract_expressionism.zip',
-    'ecole_de_paris': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/ecole_de_paris.zip',
-    'expressionism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/expressionism.zip',
-    'impressionism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/impressionism.zip',
-    'naive_art_primitivism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/naive_art_primitivism.zip',
-    'neo_impressionism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/neo_impressionism.zip',
-    'post_impressionism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/post_impressionism.zip',
-    'pre_raphaelite_brotherhood': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/pre_raphaelite_brotherhood.zip',
-    'realism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/realism.zip',
-    'rococo': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/rococo.zip',
-    'romanticism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/romanticism.zip',
-    'surrealism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/surrealism.zip',
-    'symbolism': 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/symbolism.zip'
- }
+CACHE_DIR = f"{os.path.expanduser('~')}/.cache/wikiartcrawler"
+CHUNK_SIZE = 1024 * 1024
+HOSTNAME = socket.gethostname()
+
+# overridable to point the crawler at a mirror or at the benchmark stand-in server
+RELEASE_URL = os.getenv(
+    'WIKIARTCRAWLER_RELEASE_URL', 'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0')
+URL_LIST = {k: f'{RELEASE_URL}/{k}.zip' for k in [
+    'abstract_expressionism', 'baroque', 'ecole_de_paris', 'expressionism', 'impressionism', 'naive_art_primitivism',
+    'neo_impressionism', 'post_impressionism', 'pre_raphaelite_brotherhood', 'realism', 'rococo', 'romanticism',
+    'surrealism', 'symbolism'
+]}
 
 
 def new_file_path(path, suffix, export_dir: str = None):
@@ -36,34 +39,168 @@ def new_file_path(path, suffix, export_dir: str = None):
     return path
 
 
-def wget(url, cache_dir: str):
-    """ wget and uncompress data_iterator """
-    path = _wget(url, cache_dir)
-    if path.endswith('.tar.gz') or path.endswith('.tgz') or path.endswith('.tar'):
-        if path.endswith('.tar'):
-            tar = tarfile.open(path)
-        else:
-            tar = tarfile.open(path, "r:gz")
-        tar.extractall(cache_dir)
-        tar.close()
+def wget(url, cache_dir: str, checksum: str = None):
+    """ wget and uncompress data_iterator (streamed, so memory usage does not depend on the file size) """
+    path = _wget(url, cache_dir, checksum=checksum)
+    if extract_archive(path, cache_dir) is not None:
         os.remove(path)
+
+
+def extract_archive(path: str, export_dir: str, strip_components: int = 0):
+    """ Extract the files of a zip/tar archive (or a gzip file) member by member straight into `export_dir`.
+
+    Every file is written to a temporary name and renamed into place, so concurrent extractions of archives
+    sharing files (eg. an artist in several groups) never leave a partially written file.
+
+    @param path: archive file (`.zip`, `.tar`, `.tar.gz`, `.tgz` or `.gz`)
+    @param export_dir: directory to extract into
+    @param strip_components: number of leading path components to drop from member names (as `tar`)
+    @return: number of extracted files (None if `path` is not an archive)
+    """
+
+    def target_path(name):
+        parts = [i for i in name.split('/') if i not in ['', '.']]
+        if len(parts) <= strip_components or '..' in parts:
+            return None
+        return os.path.join(export_dir, *parts[strip_components:])
+
+    def write(fileobj, target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = tmp_path(target)
+        with open(tmp, 'wb') as f:
+            shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
+        os.replace(tmp, target)
+
+    n = 0
+    if path.endswith('.tar.gz') or path.endswith('.tgz') or path.endswith('.tar'):
+        # stream mode reads the archive sequentially without seeking
+        with tarfile.open(path, 'r|*') as tar:
+            for member in tar:
+                target = target_path(member.name)
+                if not member.isfile() or target is None:
+                    continue
+                write(tar.extractfile(member), target)
+                n += 1
     elif path.endswith('.gz'):
         with gzip.open(path, 'rb') as f:
-            with open(path.replace('.gz', ''), 'wb') as f_write:
-                f_write.write(f.read())
-        os.remove(path)
+            write(f, os.path.join(export_dir, os.path.basename(path)[:-len('.gz')]))
+        n += 1
     elif path.endswith('.zip'):
         with zipfile.ZipFile(path, 'r') as zip_ref:
-            zip_ref.extractall(cache_dir)
-        os.remove(path)
+            for member in zip_ref.infolist():
+                target = target_path(member.filename)
+                if member.is_dir() or target is None:
+                    continue
+                with zip_ref.open(member) as f:
+                    write(f, target)
+                n += 1
+    else:
+        return None
+    return n
 
 
-def _wget(url: str, cache_dir):
-    """ get data from web """
+def tmp_path(path: str):
+    """ Temporary name next to `path` unique to the host, process and thread, for write-then-rename updates of
+    files shared by several workers. """
+    return '{}.tmp.{}.{}.{}'.format(path, HOSTNAME, os.getpid(), threading.get_ident())
+
+
+def atomic_json_dump(data, path: str, **kwargs):
+    """ Write JSON to a temporary file and rename it into place, so readers never see a partial file. """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = tmp_path(path)
+    with open(tmp, 'w') as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp, path)
+
+
+def file_checksum(path: str, algorithm: str = 'sha256'):
+    """ Hex digest of a file, computed chunk by chunk. """
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _wget(url: str, cache_dir, checksum: str = None, progress: bool = True):
+    """ get data from web
+
+    The file is streamed into `{filename}.part` chunk by chunk, and an interrupted download is resumed
+    with an HTTP Range request.
+
+    @param url: file url
+    @param cache_dir: directory to save the file
+    @param checksum: expected digest as `{algorithm}:{hex}` (eg. `sha256:9f86...`), verified before returning
+    @param progress: show a progress bar with the download rate
+    """
+    from tqdm import tqdm
+    from . import metrics
+    from .session import http_get
     os.makedirs(cache_dir, exist_ok=True)
     filename = os.path.basename(url)
-    with open('{}/{}'.format(cache_dir, filename), "wb") as f:
-        r = requests.get(url)
-        f.write(r.content)
-    return '{}/{}'.format(cache_dir, filename)
+    path = '{}/{}'.format(cache_dir, filename)
+    part = '{}.part'.format(path)
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    start = time.time()
+    with http_get(url, stream=True, headers={'Range': 'bytes={}-'.format(offset)} if offset else None) as r:
+        if not (offset and r.status_code == 416):  # 416: the partial file is already complete
+            if offset and r.status_code != 206:  # the server ignored the range: start over
+                offset = 0
+            r.raise_for_status()
+            total = int(r.headers['Content-Length']) + offset if 'Content-Length' in r.headers else None
+            with open(part, 'ab' if offset else 'wb') as f, tqdm(
+                    total=total, initial=offset, unit='B', unit_scale=True, unit_divisor=1024, desc=filename,
+                    disable=not progress) as bar:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    bar.update(len(chunk))
+    size = os.path.getsize(part)
+    elapsed = time.time() - start
+    metrics.inc('wikiart_download_bytes_total', size - offset, source='archive')
+    metrics.inc('wikiart_archive_downloads_total', resumed=offset > 0)
+    logging.info('downloaded {}: {} bytes in {:.1f}s ({:.1f} MB/s)'.format(
+        filename, size, elapsed, (size - offset) / max(elapsed, 1e-6) / 1024 ** 2))
+    if checksum is not None:
+        algorithm, digest = checksum.split(':') if ':' in checksum else ('sha256', checksum)
+        if file_checksum(part, algorithm) != digest.lower():
+            metrics.inc('wikiart_archive_errors_total', error='checksum')
+            os.remove(part)
+            raise ValueError('checksum mismatch: {} ({})'.format(url, checksum))
+    os.replace(part, path)
+    return path
+
+
+def prefetch(iterable, size: int):
+    """ Iterate `iterable` in a background thread, keeping up to `size` items ready. """
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        buffer.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            buffer.put((end, None))
+        except Exception as e:
+            buffer.put((end, e))
 
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
@@ -7,21 +7,29 @@ Max IPs per hour: 10
 """
 
 import os
-import shutil
+import time
+import threading
 
-import requests
 import logging
 import json
 from glob import glob
-from string import ascii_lowercase
-from itertools import permutations
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
-from .util import wget, URL_LIST
+from . import metrics
+from .util import wget, prefetch, atomic_json_dump, tmp_path, CACHE_DIR, HOSTNAME
+from .bootstrap import bootstrap
+from .downloader import download_images
+from .session import http_get
+from .scheduler import SessionKeyScheduler, API_RATE_LIMITS
+from .meta_index import MetaIndex, match_painting, light_record
+from .meta_store import read_meta
+from .catalog import get_catalog
+from .shard import export_shards
+from .distributed import default_worker_id, hash_partition, hold, LeaseQueue
+from .discovery import ArtistDiscovery
 
-CACHE_DIR = f"{os.path.expanduser('~')}/.cache/wikiartcrawler"
-os.makedirs(CACHE_DIR, exist_ok=True)
 CUSTOM_ARTISTS = {
     'francis-bacon': '57726d7fedc2cb3880b4812f',
     'paul-cezanne': '57726d84edc2cb3880b48a5b',
@@ -32,53 +40,105 @@ CUSTOM_ARTISTS = {
     'alberto-giacometti': '57726d87edc2cb3880b49265'
 }
 __all__ = 'WikiartAPI'
+# overridable to point the crawler at a mirror or at the benchmark stand-in server
+API_ROOT = os.getenv('WIKIARTCRAWLER_API_ROOT', 'https://www.wikiart.org/en/api/2')
 
 
-def api_request(url, session_key: str = None, ignore_error: bool = False):
+def login_url(api_root: str, access_code: str, secret_code: str):
+    """ Login endpoint, which WikiArt documents under `/en/Api/2` (capitalized) unlike the other endpoints. """
+    return f'{api_root.replace("/en/api/2", "/en/Api/2")}/login?accessCode={access_code}&secretCode={secret_code}'
+
+
+def iter_api_pages(url,
+                   session_key: str = None,
+                   ignore_error: bool = False,
+                   scheduler: SessionKeyScheduler = None,
+                   pagination_token: str = None):
+    """ Request the WikiArt API and yield the response of each page.
+
+    @param url: API endpoint
+    @param session_key: session key to authenticate the request
+    @param ignore_error: stop instead of raising on API error
+    @param scheduler: pick the session key from the scheduler, which waits for quota before each request
+    @param pagination_token: resume a paginated request from this token
+    """
+
+    endpoint = metrics.endpoint_label(url)
 
     def validate_response(_response):
         try:
             _data = _response.json()
         except json.decoder.JSONDecodeError:
+            metrics.inc('wikiart_api_errors_total', endpoint=endpoint, error='json')
             if not ignore_error:
                 raise ValueError(f'JSONDecodeError: {str(_response)}')
             logging.warning(f'JSONDecodeError: {str(_response)}')
             return None
         if _response.status_code != 200:
+            metrics.inc('wikiart_api_errors_total', endpoint=endpoint, error=str(_response.status_code))
             if not ignore_error:
                 raise ValueError(f'API error\n\t url: {url}\n\t error: {_data}')
             logging.warning(f'API error\n\t url: {url}\n\t error: {_data}')
             return None
         return _data
 
-    if session_key is not None:
-        url = f'{url}&authSessionKey={session_key}' if '?' in url else f'{url}?authSessionKey={session_key}'
+    def get(_url, _session_key, _token):
+        if _token is not None:
+            _url = f'{_url}&paginationToken={_token}' if '?' in _url else f'{_url}?paginationToken={_token}'
+        if _session_key is not None:
+            _url = f'{_url}&authSessionKey={_session_key}' if '?' in _url else f'{_url}?authSessionKey={_session_key}'
+        with metrics.timer('wikiart_api_request_seconds', endpoint=endpoint):
+            _response = http_get(_url, quota_retry=scheduler is None)
+        metrics.inc('wikiart_api_requests_total', endpoint=endpoint, session_key=metrics.key_label(_session_key),
+                    status=_response.status_code)
+        metrics.inc('wikiart_download_bytes_total', len(_response.content), source='api')
+        return _response
 
-    response = requests.get(url)
+    if scheduler is None:
+        response = get(url, session_key, pagination_token)
+    else:
+        # move on to another session key if the API still reports the quota of the key is exhausted
+        for _ in range(len(scheduler.session_keys)):
+            session_key = scheduler.acquire()
+            response = get(url, session_key, pagination_token)
+            if response.status_code != 429:
+                break
+            logging.warning('quota exhausted, blocking the session key for an hour')
+            scheduler.block(session_key)
     data = validate_response(response)
     if data is None:
-        return None
+        return
+    yield data
+    while data.get('hasMore'):
+        if scheduler is not None:
+            scheduler.acquire(session_key)
+        response = get(url, session_key, data['paginationToken'])
+        if scheduler is not None and response.status_code == 429:
+            logging.warning('quota exhausted, blocking the session key for an hour')
+            scheduler.block(session_key)
+        data = validate_response(response)
+        if data is None:
+            return
+        yield data
 
+
+def api_request(url, session_key: str = None, ignore_error: bool = False, scheduler: SessionKeyScheduler = None):
+    """ Request the WikiArt API and concatenate paginated results (see `iter_api_pages`). """
+    pages = iter_api_pages(url, session_key, ignore_error, scheduler)
+    data = next(pages, None)
+    if data is None:
+        return None
     if 'data' not in data:
         return data
     full_list = data['data']
-    if 'hasMore' not in data:
-        return full_list
-    while data['hasMore']:
-        token = data['paginationToken']
-        response = requests.get(
-            f'{url}&paginationToken={token}' if '?' in url else f'{url}?paginationToken={token}'
-        )
-        data = validate_response(response)
-        if data is None:
-            break
+    for data in pages:
         full_list += data['data']
     return full_list
 
 
 def get_session_key(access_code: str, secret_code: str):
     data = api_request(
-        f'https://www.wikiart.org/en/Api/2/login?accessCode={access_code}&secretCode={secret_code}',
+        login_url(API_ROOT, access_code, secret_code),
         secret_code,
         ignore_error=True
     )
@@ -90,14 +150,36 @@ def get_session_key(access_code: str, secret_code: str):
 
 
 def get_image(url, export_path):
-    """Download image from url."""
-    img_data = requests.get(url).content
-    with open(export_path, 'wb') as handler:
-        handler.write(img_data)
+    """Download image from url (written to a temporary file first so that a failure never leaves a partial image)."""
+    with metrics.timer('wikiart_image_request_seconds'):
+        response = http_get(url)
+    metrics.inc('wikiart_image_requests_total', status=response.status_code)
+    response.raise_for_status()
+    metrics.inc('wikiart_download_bytes_total', len(response.content), source='image')
+    tmp = tmp_path(export_path)
+    with open(tmp, 'wb') as handler:
+        handler.write(response.content)
+    os.replace(tmp, export_path)
+
 
+def load_checkpoint(checkpoint_file: str):
+    """ Painting details completed by a previous crawl (the last line may be truncated by a crash). """
+    detail = {}
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    continue
+                detail[record['id']] = record['detail']
+    return detail
 
-def get_painting_detail(paint_id: str = '57e00504edc2ca0d8c0b38a2', session_key: str = None):
-    return api_request(f'https://www.wikiart.org/en/api/2/Painting?id={paint_id}', session_key)
+
+def get_painting_detail(paint_id: str = '57e00504edc2ca0d8c0b38a2',
+                        session_key: str = None,
+                        scheduler: SessionKeyScheduler = None):
+    return api_request(f'{API_ROOT}/Painting?id={paint_id}', session_key, scheduler=scheduler)
 
 
 class WikiartAPI:
@@ -111,8 +193,15 @@ class WikiartAPI:
                  force_refresh_artist_id: bool = False,
                  session_num: int = 10,
                  cache_dir: str = None,
-                 skip_download: bool = True):
+                 skip_download: bool = True,
+                 num_workers: int = 8,
+                 rate_limits=API_RATE_LIMITS,
+                 image_store: bool = False,
+                 cache_budget=None,
+                 eviction_policy: str = 'lru',
+                 worker_id: str = None):
         self.skip_download = skip_download
+        self.num_workers = num_workers
         if self.skip_download:
             assert not force_refresh_artist_id
         if not self.skip_download and credentials_file is not None:
@@ -120,7 +209,7 @@ class WikiartAPI:
                 credentials = [json.loads(i) for i in f.read().split('\n') if len(i) > 0]
         if not self.skip_download and (access_code and secret_code) or credentials:
             if credentials is None:
-                credentials = {"access_code": access_code, "secret_code": secret_code}
+                credentials = [{"access_code": access_code, "secret_code": secret_code}]
             self._session_key = []
             for c in credentials:
                 assert "access_code" in c and "secret_code" in c, c
@@ -134,76 +223,89 @@ class WikiartAPI:
             self._session_key = None
 
         if self._session_key is not None:
-            logging.info(f'{len(self._session_key)} session keys: {self._session_key}')
+            logging.info(f'{len(self._session_key)} session keys')
         else:
             logging.info('No session keys provided')
 
-        self.cur_session_key_index = 0
+        self.scheduler = SessionKeyScheduler(self._session_key, rate_limits)
+        self._meta_index = None
+        self._meta_index_stale = False  # whether an artist of the meta cache changed since the index was built
+        self._dedup_index = {}
+        self._image_index = {}
+        self._stats = None
+        self._feature_index = None
         self.cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.catalog = get_catalog(self.cache_dir)
+        self.worker_id = default_worker_id() if worker_id is None else worker_id
+
+        # workers sharing the cache directory initialize it one at a time
+        with hold(f'{self.cache_dir}/lock/init.lease', self.worker_id):
+            self.dict_group = self.get_full_group(force_refresh_artist_id)
+            self.dict_artist = self.get_full_artist(force_refresh_artist_id)
+            self.download_cached_images(force_refresh_artist_id)
 
-        self.dict_group = self.get_full_group(force_refresh_artist_id)
-        self.dict_artist = self.get_full_artist(force_refresh_artist_id)
-        self.download_cached_images(force_refresh_artist_id)
+        # content-addressed store of the raw images (face images cannot be fetched again once evicted)
+        self.store = None
+        if image_store or cache_budget is not None:
+            from .store import ImageStore
+            self.store = ImageStore(self.cache_dir, cache_budget, eviction_policy)
+            self.store.prune()
+            self.store.ingest(self.catalog.images('*', 'image'), num_workers=self.num_workers)
+            self.store.remove_stale_tmp()
+            self.store.enforce()
 
         # artist on wikiart
         self.artist_wikiart = sorted(list(self.dict_artist.keys()))
 
     @property
     def session_key(self):
+        """ Session key with remaining quota (blocks until one is available). """
         if self._session_key is None:
             return None
-        if self.cur_session_key_index == len(self._session_key):
-            self.cur_session_key_index = 0
-        cur_sk = self._session_key[self.cur_session_key_index]
-        self.cur_session_key_index += 1
-        return cur_sk
+        return self.scheduler.acquire()
+
+    @property
+    def quota(self):
+        """ Used and remaining API quota per session key. """
+        return self.scheduler.stats()
+
+    @property
+    def metrics(self):
+        """ Snapshot of the request, byte, latency and cache metrics of the process (see `metrics.py`). """
+        snapshot = metrics.snapshot()
+        snapshot['quota'] = {metrics.key_label(k): v for k, v in self.scheduler.stats().items()}
+        return snapshot
+
+    def export_metrics(self, path: str, export_format: str = None):
+        """ Write the metrics as a JSON snapshot or a Prometheus text file (`.prom`). """
+        metrics.dump(path, export_format)
 
-    def download_cached_images(self, force_refresh_artist_id):
+    def download_cached_images(self, force_refresh_artist_id, num_workers: int = 4):
         logging.info('downloading cached image (this might take some time)')
-        os.makedirs(f'{self.cache_dir}/tmp', exist_ok=True)
-        target_dir = f'{self.cache_dir}/painting/meta'
-        if not os.path.exists(target_dir) or force_refresh_artist_id:
-            os.makedirs(os.path.dirname(target_dir), exist_ok=True)
-            wget(
-                'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/meta.zip',
-                cache_dir=f'{self.cache_dir}/tmp'
-            )
-            shutil.move(f'{self.cache_dir}/tmp/meta', target_dir)
-
-        target_dir = f'{self.cache_dir}/painting/image'
-        if not os.path.exists(target_dir) or force_refresh_artist_id:
-            os.makedirs(os.path.dirname(target_dir), exist_ok=True)
-            for k, url in URL_LIST.items():
-                cache_dir = f'{self.cache_dir}/tmp/{k}'
-                if not os.path.exists(cache_dir):
-                    wget(url, cache_dir=f'{self.cache_dir}/tmp')
-                for d in glob(f'{self.cache_dir}/tmp/{k}/*'):
-                    target_dir = f'{self.cache_dir}/painting/image/{os.path.basename(d)}'
-                    if os.path.exists(target_dir):
-                        shutil.rmtree(d)
-                    else:
-                        shutil.move(d, os.path.dirname(target_dir))
+        bootstrap(self.cache_dir, force=force_refresh_artist_id, num_download_workers=num_workers,
+                  tmp_dir=f'{self.cache_dir}/tmp/{HOSTNAME}/bootstrap')
         n_images = len(glob(f'{self.cache_dir}/painting/image/*/*.jpg'))
         logging.info(f'{n_images} images in total')
 
-        target_dir = f'{self.cache_dir}/painting/image_face'
-        if not os.path.exists(target_dir) or force_refresh_artist_id:
-            wget(
-                'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/image_face.zip',
-                cache_dir=f'{self.cache_dir}/tmp'
-            )
-            shutil.move(f'{self.cache_dir}/tmp/image_face', target_dir)
-
-        target_dir = f'{self.cache_dir}/painting/image_face_blur'
-        if not os.path.exists(target_dir) or force_refresh_artist_id:
-            wget(
-                'https://github.com/asahi417/wikiart-crawler/releases/download/v0.0.0/image_face_blur.zip',
-                cache_dir=f'{self.cache_dir}/tmp'
-            )
-            shutil.move(f'{self.cache_dir}/tmp/image_face_blur', target_dir)
+    def sync(self,
+             dictionaries: bool = True,
+             artists: bool = True,
+             paintings: bool = True,
+             releases: bool = True,
+             num_workers: int = None):
+        """ Incremental alternative to `force_refresh_artist_id`: fetch only what changed since the last sync.
 
-        if os.path.exists(f'{self.cache_dir}/tmp'):
-            shutil.rmtree(f'{self.cache_dir}/tmp')
+        @param dictionaries: merge dictionaries updated since the last sync into `dictionaries.json`
+        @param artists: merge artists updated since the last sync into `artists.json`
+        @param paintings: merge new paintings of the updated artists into their meta cache
+        @param releases: re-extract release archives that changed since the last sync
+        @param num_workers: number of concurrent detail requests
+        @return: summary of the number of updated records
+        """
+        from .sync import sync
+        assert not self.skip_download
+        return sync(self, dictionaries, artists, paintings, releases, num_workers)
 
     def get_full_group(self, force_refresh_artist_id):
         cache_file = f'{self.cache_dir}/dictionaries.json'
@@ -218,13 +320,32 @@ class WikiartAPI:
             with open(cache_file) as f:
                 return json.load(f)
         assert not self.skip_download
-        data = api_request('https://www.wikiart.org/en/api/2/UpdatedDictionaries', self.session_key)
+        data = api_request(f'{API_ROOT}/UpdatedDictionaries', scheduler=self.scheduler)
         data = {i['title']: {'id': i['id'], 'url': i['url'], 'group': i['group']} for i in data}
-        with open(cache_file, 'w') as f:
-            json.dump(data, f)
+        atomic_json_dump(data, cache_file)
         return data
 
-    def get_full_artist(self, force_refresh_artist_id):
+    def _search_paintings(self, term: str, max_pages: int = 1):
+        """ First `max_pages` pages of `PaintingSearch` for the term.
+
+        @return: tuple of the paintings (None if the request failed), whether more pages remain and the number of
+            requests
+        """
+        records, saturated, n = None, False, 0
+        for page in iter_api_pages(f'{API_ROOT}/PaintingSearch?term={term}', ignore_error=True,
+                                   scheduler=self.scheduler):
+            records = (records or []) + page.get('data', [])
+            saturated, n = bool(page.get('hasMore')), n + 1
+            if n == max_pages:
+                break
+        return records, saturated, max(n, 1)
+
+    def get_full_artist(self, force_refresh_artist_id, max_depth: int = 3, max_pages: int = 1):
+        """ Artist list (url -> id), from the cache or the repository assets unless `force_refresh_artist_id`.
+
+        A refresh requests `UpdatedArtists`, which returns a partial list only, and enriches it with an
+        `ArtistDiscovery` over `PaintingSearch` terms of up to `max_depth` letters (`max_pages` pages per term).
+        """
         cache_file = f'{self.cache_dir}/artists.json'
         # logging.warning("This endpoint has an issue and will return partial list only.")
         if os.path.exists(cache_file) and not force_refresh_artist_id:
@@ -241,26 +362,368 @@ class WikiartAPI:
 
         # basic request (this returns only partial artists)
         assert not self.skip_download
-        data = api_request('https://www.wikiart.org/en/api/2/UpdatedArtists', self.session_key, ignore_error=True)
+        data = api_request(
+            f'{API_ROOT}/UpdatedArtists', ignore_error=True, scheduler=self.scheduler)
         data = {i['url']: i['id'] for i in data}
         data.update(CUSTOM_ARTISTS)
         logging.info(f'`UpdatedArtists` returned {len(data)} artists')
 
-        # heuristics to cover more artists
-        logging.info('heuristics query to enrich the artist list')
-        for a, b in tqdm(list(permutations(ascii_lowercase, 2))):
-            _data = api_request(f'https://www.wikiart.org/en/api/2/PaintingSearch?term={a}{b}', self.session_key)
-            if _data is None:
-                break
-
-            for __data in _data:
-                if __data['artistUrl'] not in data:
-                    data[__data['artistUrl']] = __data['artistId']
+        # search paintings to cover more artists, going deeper into the terms whose result is saturated
+        discovery = ArtistDiscovery(f'{self.cache_dir}/discovery_state.json', data, max_depth=max_depth)
+        with ThreadPoolExecutor(max_workers=max(self.num_workers, 1)) as executor:
+            while not discovery.done:
+                terms = discovery.pending()
+                for term, (records, saturated, n) in zip(terms, tqdm(
+                        executor.map(lambda t: self._search_paintings(t, max_pages), terms), total=len(terms))):
+                    discovery.add(term, records, saturated, n)
+                discovery.expand()
+        data = discovery.close()
         data = {k: v for k, v in data.items() if k is not None}
-        with open(cache_file, 'w') as f:
-            json.dump(data, f)
+        atomic_json_dump(data, cache_file)
         return data
 
+    def crawl_painting_info(self, artist_url: str, num_workers: int = None, progress: bool = True):
+        """ Fetch the painting list and the detail of every painting of an artist into the meta cache.
+
+        Details are requested concurrently and every completed record is appended to a JSONL checkpoint
+        (`painting/checkpoint/{artist}.jsonl`), so an interrupted crawl resumes where it stopped.
+
+        @param artist_url: artist alias
+        @param num_workers: number of concurrent detail requests (default: `self.num_workers`)
+        @param progress: show a progress bar
+        @return: list of paintings, or None if the artworks are blocked on copyright grounds
+        """
+        assert not self.skip_download
+        assert artist_url in self.dict_artist, f'{artist_url} not found in the artist list'
+        num_workers = self.num_workers if num_workers is None else num_workers
+        cache_file = f'{self.cache_dir}/painting/meta/{artist_url}.json'
+        checkpoint_dir = f'{self.cache_dir}/painting/checkpoint'
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        # painting list
+        list_file = f'{checkpoint_dir}/{artist_url}.list.json'
+        if os.path.exists(list_file):
+            with open(list_file) as f:
+                painting_info = json.load(f)
+        else:
+            painting_info = api_request(
+                f'{API_ROOT}/PaintingsByArtist?id={self.dict_artist[artist_url]}',
+                scheduler=self.scheduler)
+            if any('FRAME-600x480' in i['image'] for i in painting_info):
+                logging.warning(f'Artworks of {artist_url} are not available in your country on copyright grounds.')
+                return None
+            atomic_json_dump(painting_info, list_file)
+
+        checkpoint_file = f'{checkpoint_dir}/{artist_url}.jsonl'
+        detail = load_checkpoint(checkpoint_file)
+        todo = [i['id'] for i in painting_info if i['id'] not in detail]
+        logging.info(f'requesting detail information of paintings: {len(todo)} paintings '
+                     f'({len(detail)} in checkpoint), artist: {artist_url}')
+
+        lock = threading.Lock()
+        with open(checkpoint_file, 'a') as f, tqdm(total=len(todo), disable=not progress) as bar:
+
+            def fetch(paint_id):
+                _detail = get_painting_detail(paint_id, scheduler=self.scheduler)
+                with lock:
+                    f.write(json.dumps({'id': paint_id, 'detail': _detail}) + '\n')
+                    f.flush()
+                    detail[paint_id] = _detail
+                    bar.update(1)
+
+            with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+                for future in [executor.submit(fetch, i) for i in todo]:
+                    future.result()
+
+        for i in painting_info:
+            i['detail'] = detail[i['id']]
+        atomic_json_dump(painting_info, cache_file)
+        os.remove(list_file)
+        os.remove(checkpoint_file)
+        return painting_info
+
+    def crawl(self,
+              artist_url: List or str = None,
+              groups: List or str = None,
+              num_workers: int = None,
+              rank: int = 0,
+              world_size: int = 1,
+              lease: bool = False,
+              lease_ttl: float = 600):
+        """ Crawl the meta information of many artists with a single progress and throughput report.
+
+        Several workers (eg. one per machine with its own credentials) can crawl into one shared `cache_dir`:
+        with `world_size > 1` each worker takes the artists hashed to its `rank`, and with `lease` the artists are
+        claimed one at a time through lease files in `lock/crawl`, so workers can join or crash at any time.
+
+        @param artist_url: list of artist aliases (default: every artist of `artists.json` if `groups` is None)
+        @param groups: art movements in `VALID_ARTIST_GROUPS` to crawl every artist of
+        @param num_workers: number of concurrent detail requests
+        @param rank: index of this worker among `world_size` workers
+        @param world_size: number of workers partitioning the artists by hash
+        @param lease: claim the artists through lease files
+        @param lease_ttl: seconds before the lease of an unresponsive worker can be taken over
+        @return: dictionary of artist alias to the number of paintings (None if blocked)
+        """
+        from .artist_group import load_artists
+        if artist_url is None and groups is None:
+            artists = list(self.dict_artist)
+        else:
+            artists = [artist_url] if type(artist_url) is str else list(artist_url or [])
+            for g in [groups] if type(groups) is str else list(groups or []):
+                artists += load_artists(g)
+        artists = sorted(set(a for a in artists if a in self.dict_artist))
+        if world_size > 1:
+            artists = hash_partition(artists, rank, world_size)
+
+        def done(a):
+            return os.path.exists(f'{self.cache_dir}/painting/meta/{a}.json')
+
+        todo = [a for a in artists if not done(a)]
+        logging.info(f'crawling {len(todo)} artists ({len(artists) - len(todo)} already cached)')
+        claimed = LeaseQueue(f'{self.cache_dir}/lock/crawl', self.worker_id, lease_ttl).claim(todo, done) \
+            if lease else todo
+        start = time.time()
+        n_painting = 0
+        output = {}
+        bar = tqdm(claimed, total=len(todo))
+        for a in bar:
+            painting_info = self.crawl_painting_info(a, num_workers=num_workers, progress=False)
+            output[a] = None if painting_info is None else len(painting_info)
+            n_painting += output[a] or 0
+            bar.set_postfix(artist=a, paintings=n_painting, rate=f'{n_painting / (time.time() - start):.2f}/s')
+        bar.close()
+        elapsed = time.time() - start
+        logging.info(f'crawled {n_painting} paintings of {len(output)} artists in {elapsed:.1f}s '
+                     f'({n_painting / max(elapsed, 1e-6):.2f} paintings/s)')
+        return output
+
+    def _select_artists(self, artist_url: List or str = None, groups: List or str = None):
+        """ Sorted artists given as aliases and/or art movements (every artist in the cache if neither is given). """
+        if artist_url is None and groups is None:
+            return sorted(self.catalog.artists)
+        artists = [artist_url] if type(artist_url) is str else list(artist_url or [])
+        if groups is not None:
+            artists += self.catalog.group_artists(groups)
+        return sorted(set(artists))
+
+    @property
+    def meta_index(self):
+        """ Columnar index of the meta cache built by `build_meta_index` (None if missing), loaded once.
+
+        The index is kept when the meta cache changes: `_meta_index_fresh` tells which artists it still covers.
+        """
+        path = f'{self.cache_dir}/painting/meta_index.npz'
+        if self._meta_index is None and os.path.exists(path):
+            self._meta_index = MetaIndex.load(path)
+        return self._meta_index
+
+    def _meta_index_fresh(self, artist_url: str):
+        """ Whether the meta index holds the current meta file of the artist (else it is read from its JSON). """
+        index = self.meta_index
+        if index is None:
+            return False
+        if index.is_fresh(artist_url, f'{self.cache_dir}/painting/meta'):
+            return True
+        if not self._meta_index_stale:
+            logging.info('meta index is stale for some artists, run `build_meta_index` to refresh it')
+            self._meta_index_stale = True
+        return False
+
+    def build_meta_index(self):
+        """ Compile every meta JSON into a columnar index used by `get_painting` and `query_painting`. """
+        self._meta_index = MetaIndex.build(f'{self.cache_dir}/painting/meta')
+        self._meta_index.save(f'{self.cache_dir}/painting/meta_index.npz')
+        self._meta_index_stale = False
+        return self._meta_index
+
+    def query_painting(self, artist_url: List or str = None, **kwargs):
+        """ Vectorized filter over the whole corpus through the meta index.
+
+        The index is built if it is missing; the artists crawled since it was built are filtered from their
+        meta JSON.
+
+        @param artist_url: artist alias or list of them (None for every artist)
+        @param kwargs: filters of `get_painting_info`
+        @return: list of painting records without `detail`
+        """
+        index = self.meta_index
+        if index is None:
+            index = self.build_meta_index()
+        artists = set(self.catalog.artists) | set(index.artists) if artist_url is None else \
+            set([artist_url] if type(artist_url) is str else artist_url)
+        changed = sorted(a for a in artists if not self._meta_index_fresh(a))
+        output = index.records(index.query(artist_url, **kwargs))
+        if len(changed) > 0:
+            output = [i for i in output if i['artistUrl'] not in changed]
+            for a in changed:
+                if a in self.catalog:
+                    output += [light_record(i, a) for i in read_meta(self.cache_dir, a) if match_painting(i, **kwargs)]
+            output = sorted(output, key=lambda i: i['artistUrl'])  # stable: rows of an artist keep their order
+        return output
+
+    def build_dedup_index(self, image_type: str = None, method: str = 'phash', num_workers: int = None):
+        """ Compute (incrementally) the perceptual hash of every cached image of the image type.
+
+        Images are keyed by their painting id in `painting/meta` when it is known.
+
+        @param image_type: image type of `get_painting`
+        @param method: `phash` or `dhash`
+        @param num_workers: number of processes
+        @return: `DedupIndex`
+        """
+        from .dedup import DedupIndex
+        image_dir = 'image' if image_type is None else f'image_{image_type}'
+        index = DedupIndex(f'{self.cache_dir}/painting/dedup/{image_dir}.json', method).update(
+            self._image_keys(image_dir), num_workers)
+        self._dedup_index[image_dir] = index
+        return index
+
+    def _image_keys(self, image_dir: str = 'image'):
+        """ Cached images of an image directory keyed by painting id (or by `{artist}/{file}` if unknown). """
+        items = {}
+        for a in sorted(self.catalog.image_artists(image_dir)):
+            meta = self._painting_meta(a)
+            for path in self.catalog.images(a, image_dir):
+                stem = os.path.basename(path).rsplit('.', 1)[0]
+                items[meta[stem]['id'] if stem in meta else f'{a}/{os.path.basename(path)}'] = path
+        return items
+
+    def dedup_index(self, image_dir: str = 'image'):
+        """ Dedup index of an image directory (`image`, `image_face`, ...), built on first use and updated with the
+        images cached since its last update. """
+        if image_dir not in self._dedup_index:
+            from .dedup import DedupIndex
+            path = f'{self.cache_dir}/painting/dedup/{image_dir}.json'
+            if os.path.exists(path):
+                self._dedup_index[image_dir] = DedupIndex(path)
+        index = self._dedup_index.get(image_dir)
+        if index is None or not set(self.catalog.images('*', image_dir)) <= index.paths:
+            index = self.build_dedup_index(None if image_dir == 'image' else image_dir[len('image_'):])
+        return index
+
+    def build_feature_index(self, batch_size: int = 256, num_workers: int = None):
+        """ Compute (incrementally) the color histogram and thumbnail features of every cached raw image.
+
+        Features are stored in a float32 memmap of `painting/features` whose rows are keyed by painting id.
+
+        @param batch_size: number of images per task
+        @param num_workers: number of processes
+        @return: `FeatureIndex`
+        """
+        from .features import FeatureIndex
+        self._feature_index = FeatureIndex(f'{self.cache_dir}/painting/features').update(
+            self._image_keys('image'), batch_size, num_workers)
+        return self._feature_index
+
+    @property
+    def feature_index(self):
+        """ Feature index of the raw images, built on first use. """
+        if self._feature_index is None:
+            from .features import FeatureIndex
+            index = FeatureIndex(f'{self.cache_dir}/painting/features')
+            self._feature_index = index if len(index) > 0 else self.build_feature_index()
+        return self._feature_index
+
+    def similar_paintings(self,
+                          painting: List or str,
+                          k: int = 10,
+                          artist_url: List or str = None,
+                          groups: List or str = None):
+        """ Paintings most similar to the given ones by color distribution and layout (see `build_feature_index`).
+
+        @param painting: painting id of the feature index or image file, or a list of them (searched in a batch)
+        @param k: number of results per painting (the painting itself is excluded)
+        @param artist_url: list of artist aliases to search among (default: every artist)
+        @param groups: art movements in `VALID_ARTIST_GROUPS` to search among
+        @return: list of (painting id, image path, similarity), or a list of them for a list of paintings
+        """
+        import numpy as np
+        from .features import image_features
+        index = self.feature_index
+        queries = [painting] if type(painting) is str else list(painting)
+        if len(queries) == 0:
+            return []
+        candidates = None
+        if artist_url is not None or groups is not None:
+            artists = set(self._select_artists(artist_url, groups))
+            candidates = [key for key, path in zip(index.keys, index.paths)
+                          if os.path.basename(os.path.dirname(path)) in artists]
+        paths = dict(zip(index.keys, index.paths))
+        vectors = np.stack([index.vector(q) if q in index else image_features(q) for q in queries])
+        output = [[(key, paths[key], s) for key, s in result if q not in [key, paths[key]]][:k]
+                  for q, result in zip(queries, index.search(vectors, k + 1, candidates))]
+        return output[0] if type(painting) is str else output
+
+    def build_image_index(self, image_type: str = None, num_workers: int = None):
+        """ Scan the JPEG header, size and checksum of every cached image of the image type (incrementally).
+
+        Once built, the `max_aspect_ratio`, `min_height` and `min_width` filters of `get_painting` use the true
+        dimensions of the files, and incomplete files are excluded.
+
+        @param image_type: image type of `get_painting`
+        @param num_workers: number of processes
+        @return: `ImageIndex`
+        """
+        from .image_index import ImageIndex
+        image_dir = 'image' if image_type is None else f'image_{image_type}'
+        index = ImageIndex(f'{self.cache_dir}/painting/image_index/{image_dir}.json')
+        self._image_index[image_dir] = index.update(self.catalog.images('*', image_dir), num_workers)
+        if len(index.corrupt) > 0:
+            logging.warning(f'{len(index.corrupt)} corrupt images, run `repair_images` to download them again')
+        return index
+
+    def image_index(self, image_dir: str = 'image'):
+        """ Image index of an image directory (`image`, `image_face`, ...), None if it is not built. """
+        if image_dir not in self._image_index:
+            from .image_index import ImageIndex
+            path = f'{self.cache_dir}/painting/image_index/{image_dir}.json'
+            self._image_index[image_dir] = ImageIndex(path) if os.path.exists(path) else None
+        return self._image_index[image_dir]
+
+    def repair_images(self):
+        """ Remove the corrupt raw images flagged by the image index and download them again.
+
+        With `skip_download`, the corrupt images are only reported: they are kept since they could not be replaced.
+
+        @return: list of corrupt files (removed unless `skip_download`)
+        """
+        index = self.build_image_index()
+        corrupt = index.corrupt
+        if self.skip_download:
+            if len(corrupt) > 0:
+                logging.warning(f'{len(corrupt)} corrupt images kept since downloads are disabled: {corrupt}')
+            return corrupt
+        for path in corrupt:
+            os.remove(path)
+        index.update(self.catalog.images('*', 'image'))
+        for artist_url in sorted(set(os.path.basename(os.path.dirname(p)) for p in corrupt)):
+            self.get_painting(artist_url)
+        self.build_image_index()
+        return corrupt
+
+    def painting_stats(self, groups: List or str = None):
+        """ Image counts per art movement, genre, media and image type (`PaintingStats`), updated incrementally.
+
+        @param groups: art movements to aggregate (default: `VALID_ARTIST_GROUPS`)
+        @return: `PaintingStats`
+        """
+        if self._stats is None:
+            from .stats import PaintingStats
+            self._stats = PaintingStats(self.cache_dir)
+        return self._stats.update(groups)
+
+    def migrate_meta(self, compression: str = None, num_workers: int = None):
+        """ Convert the meta cache into the compressed meta store read by `get_painting_info` (incrementally).
+
+        @param compression: `zstd` (default if `zstandard` is installed) or `zlib`
+        @param num_workers: number of processes
+        @return: list of converted artists
+        """
+        from .meta_store import migrate_meta
+        return migrate_meta(self.cache_dir, compression, num_workers)
+
     def get_painting_info(self,
                           artist_url: str,
                           year_start: int = None,
@@ -273,57 +736,17 @@ class WikiartAPI:
                           min_width: int = None):
 
         assert artist_url in self.dict_artist, f'{artist_url} not found in the artist list'
-        artist_id = self.dict_artist[artist_url]
         cache_file = f'{self.cache_dir}/painting/meta/{artist_url}.json'
         if not os.path.exists(cache_file):
-            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
             if self.skip_download:
                 return None
-            painting_info = api_request(
-                f'https://www.wikiart.org/en/api/2/PaintingsByArtist?id={artist_id}',
-                self.session_key)
-            logging.info(f'requesting detail information of paintings: {artist_url}, artist:{artist_url}')
-            for _data in tqdm(painting_info):
-                if 'FRAME-600x480' in _data['image']:
-                    logging.warning(f'Artworks of {artist_url} are not available in your country on copyright grounds.')
-                    return []
-                _data['detail'] = get_painting_detail(_data['id'], self.session_key)
-            with open(cache_file, 'w') as f:
-                json.dump(painting_info, f)
-        with open(cache_file) as f:
-            painting_info = json.load(f)
-
-        if year_start is not None:
-            painting_info = list(
-                filter(lambda i: i['completitionYear'] >= year_start if 'completitionYear' in i else False,
-                       painting_info))
-        if year_end is not None:
-            painting_info = list(
-                filter(lambda i: i['completitionYear'] <= year_end if 'completitionYear' in i else False,
-                       painting_info))
-        if style is not None:
-            painting_info = list(
-                filter(lambda i: any(s in i['detail']['styles'] for s in style) if 'style' in i['detail'] else False,
-                       painting_info))
-        if media is not None:
-            painting_info = list(
-                filter(lambda i: any(s in i['detail']['media'] for s in media) if 'media' in i['detail'] else False,
-                       painting_info))
-        if genre is not None:
-            painting_info = list(
-                filter(lambda i: any(s in i['detail']['genres'] for s in genre) if 'genres' in i['detail'] else False,
-                       painting_info))
-        if max_aspect_ratio is not None:
-            painting_info = list(filter(
-                lambda i: max(i['width'], i['height'])/min(i['width'], i['height']) <= max_aspect_ratio
-                if type(i['width']) is int and type(i['height']) is int else False, painting_info))
-        if min_height is not None:
-            painting_info = list(filter(lambda i: i['height'] >= min_height if 'height' in i else False,
-                                        painting_info))
-        if min_width is not None:
-            painting_info = list(filter(lambda i: i['width'] >= min_width if 'width' in i else False,
-                                        painting_info))
-        return painting_info
+            if self.crawl_painting_info(artist_url) is None:
+                return []
+        painting_info = read_meta(self.cache_dir, artist_url)
+
+        # records of the meta store are filtered before their detail is decoded, and returned as dictionaries
+        return [dict(i) for i in painting_info if match_painting(
+            i, year_start, year_end, media, genre, style, max_aspect_ratio, min_height, min_width)]
 
     def get_painting(self,
                      artist_url: str,
@@ -335,7 +758,9 @@ class WikiartAPI:
                      max_aspect_ratio: float = None,
                      min_height: int = None,
                      min_width: int = None,
-                     image_type: str = None):
+                     image_type: str = None,
+                     dedup: bool = False,
+                     dedup_distance: int = 4):
         raw_image = True
         if image_type is not None:
             image_type = f'image_{image_type}'
@@ -345,29 +770,256 @@ class WikiartAPI:
 
         if all(i is None for i in [year_start, year_end, media, genre, style, max_aspect_ratio, min_height, min_width]) \
                 and self.skip_download:
-            paths = glob(f'{self.cache_dir}/painting/{image_type}/{artist_url}/*.jpg')
+            if self.store is not None and raw_image:
+                self._refetch_evicted(artist_url)
+            with metrics.timer('wikiart_filter_seconds', source='catalog'):
+                paths = self.catalog.images(artist_url, image_type)
+            if dedup:
+                paths = self.dedup_index(image_type).filter(paths, dedup_distance)
+            if self.store is not None and raw_image:
+                self._record_access(paths)
             return paths if len(paths) != 0 else None
 
-        painting_info = self.get_painting_info(
-            artist_url, year_start, year_end, media, genre, style, max_aspect_ratio, min_height, min_width
-        )
+        # the dimensions of the cached files are used instead of the meta information if they are indexed
+        image_index = self.image_index(image_type)
+        size_filters = [max_aspect_ratio, min_height, min_width]
+        if image_index is not None:
+            max_aspect_ratio, min_height, min_width = None, None, None
+        filters = [year_start, year_end, media, genre, style, max_aspect_ratio, min_height, min_width]
+        if self._meta_index_fresh(artist_url):
+            metrics.inc('wikiart_meta_index_total', result='hit')
+            with metrics.timer('wikiart_filter_seconds', source='meta_index'):
+                painting_info = self.meta_index.records(self.meta_index.query(artist_url, *filters))
+        else:
+            metrics.inc('wikiart_meta_index_total', result='miss')
+            with metrics.timer('wikiart_filter_seconds', source='meta_json'):
+                painting_info = self.get_painting_info(artist_url, *filters)
         if painting_info is None:
             return None
         logging.info(f'downloading image: {len(painting_info)} images, artist: {artist_url}')
         cache_dir = f'{self.cache_dir}/painting/{image_type}/{artist_url}'
         os.makedirs(cache_dir, exist_ok=True)
         image_files = []
+        download_url, download_path = [], []
+        cached = set(self.catalog.images(artist_url, image_type))
         for data in painting_info:
             if 'FRAME-600x480' in data['image']:
                 logging.warning(f'access blocked: {data}')
                 continue
             _id = data['image'].split('.')[-1]
             path = f"{cache_dir}/{data['url']}.{_id}"
-            if not os.path.exists(path):
-                if self.skip_download or not raw_image:
+            metrics.inc('wikiart_image_cache_total', result='hit' if path in cached else 'miss')
+            if path not in cached:
+                evicted = self.store is not None and path in self.store.evicted
+                if (self.skip_download or not raw_image) and not evicted:
                     logging.info(f'file not found but skip download: {path}')
                     continue
                 logging.info(f'file not found, downloading {path}')
-                get_image(data['image'], path)
+                download_url.append(data['image'])
+                download_path.append(path)
             image_files.append(path)
+        if len(download_url) > 0:
+            downloaded = download_images(download_url, download_path, num_workers=self.num_workers)
+            failed = set(download_path) - set(downloaded)
+            image_files = [p for p in image_files if p not in failed]
+            if self.store is not None:
+                self.store.ingest(downloaded, num_workers=self.num_workers)
+        if image_index is not None:
+            image_files = image_index.filter(image_files, *size_filters)
+        if dedup:
+            image_files = self.dedup_index(image_type).filter(image_files, dedup_distance)
+        if self.store is not None and raw_image:
+            self._record_access(image_files)
         return image_files if len(image_files) != 0 else None
+
+    def _refetch_evicted(self, artist_url: str):
+        """ Download again the raw images of the artist evicted from the image store. """
+        evicted = self.store.evicted_paths(f'{self.cache_dir}/painting/image/{artist_url}')
+        if len(evicted) == 0:
+            return
+        meta = self._painting_meta(artist_url)
+        pairs = [(meta[os.path.basename(p).rsplit('.', 1)[0]]['image'], p) for p in evicted
+                 if os.path.basename(p).rsplit('.', 1)[0] in meta]
+        logging.info(f'downloading {len(pairs)} evicted images, artist: {artist_url}')
+        downloaded = download_images([u for u, _ in pairs], [p for _, p in pairs], num_workers=self.num_workers)
+        self.store.ingest(downloaded, num_workers=self.num_workers)
+
+    def _record_access(self, paths: List):
+        """ Log the access to the images and evict others if the store is over budget. """
+        self.store.touch(paths)
+        self.store.enforce(protect=paths)
+
+    def export_shards(self,
+                      output_dir: str,
+                      artist_url: List or str = None,
+                      groups: List or str = None,
+                      image_type: str = None,
+                      shard_size: int = 1024 ** 3,
+                      num_workers: int = None,
+                      **kwargs):
+        """ Pack the (filtered) images of the artists into tar shards readable with `ShardReader`.
+
+        @param output_dir: directory to export the shards
+        @param artist_url: list of artist aliases (default: every artist in the cache)
+        @param groups: art movements in `VALID_ARTIST_GROUPS` to export every artist of
+        @param image_type: image type of `get_painting`
+        @param shard_size: target shard size in bytes
+        @param num_workers: number of processes writing shards
+        @param kwargs: filters of `get_painting`
+        @return: `ShardReader` of the export
+        """
+        items = []
+        for a in self._select_artists(artist_url, groups):
+            paths = self.get_painting(a, image_type=image_type, **kwargs)
+            if paths is None:
+                continue
+            info = {}
+            if a in self.catalog:
+                with open(f'{self.cache_dir}/painting/meta/{a}.json') as f:
+                    info = {i['url']: i for i in json.load(f)}
+            for path in paths:
+                stem = os.path.basename(path).rsplit('.', 1)[0]
+                meta = {'artistUrl': a, 'image_type': image_type or 'image', 'file': os.path.basename(path)}
+                meta.update(info.get(stem, {}))
+                items.append((f'{a}__{stem}'.replace('.', '_'), path, meta))
+        return export_shards(items, output_dir, shard_size=shard_size, num_workers=num_workers)
+
+    def preprocess(self,
+                   output_dir: str,
+                   artist_url: List or str = None,
+                   groups: List or str = None,
+                   image_type: str = None,
+                   size: int = 256,
+                   max_aspect_ratio: float = None,
+                   batch_size: int = 1024,
+                   num_workers: int = None,
+                   **kwargs):
+        """ Decode, resize and center crop the (filtered) images into uint8 NumPy batches with a process pool.
+
+        Transformed images are cached in `painting/derived`, so reruns only process new images.
+
+        @param output_dir: directory for `batch-*.npy` and `batch-*.json`
+        @param artist_url: list of artist aliases (default: every artist in the cache)
+        @param groups: art movements in `VALID_ARTIST_GROUPS` to process every artist of
+        @param image_type: image type of `get_painting`
+        @param size: output image size
+        @param max_aspect_ratio: filter by the aspect ratio of the meta information and of the actual image
+        @param batch_size: number of images per batch file
+        @param num_workers: number of processes
+        @param kwargs: filters of `get_painting`
+        @return: list of batch files
+        """
+        from .preprocess import preprocess_images
+        paths = []
+        for a in self._select_artists(artist_url, groups):
+            paths += self.get_painting(a, image_type=image_type, max_aspect_ratio=max_aspect_ratio, **kwargs) or []
+        return preprocess_images(
+            paths, output_dir, f'{self.cache_dir}/painting/derived', size=size, max_aspect_ratio=max_aspect_ratio,
+            batch_size=batch_size, num_workers=num_workers)
+
+    def extract_faces(self,
+                      artist_url: List or str = None,
+                      groups: List or str = None,
+                      genre: List = None,
+                      size: int = 256,
+                      blur_radius: float = 8,
+                      model_path: str = None,
+                      force: bool = False,
+                      batch_size: int = 32,
+                      num_workers: int = None,
+                      **kwargs):
+        """ Extract the faces of the (filtered) raw images into `image_face` and `image_face_blur` (requires OpenCV).
+
+        The extraction is incremental: images that already have a face, or in which no face was found with the
+        same parameters (recorded in `painting/face_state.json`), are skipped.
+
+        @param artist_url: list of artist aliases (default: every artist in the cache)
+        @param groups: art movements in `VALID_ARTIST_GROUPS` to process every artist of
+        @param genre: genres of the paintings (default: portrait)
+        @param size: face image size
+        @param blur_radius: gaussian blur radius of the corners of `image_face_blur`
+        @param model_path: YuNet ONNX model (default: the Haar cascade of OpenCV)
+        @param force: process every image again
+        @param batch_size: number of images per task
+        @param num_workers: number of processes
+        @param kwargs: filters of `get_painting`
+        @return: dictionary of the number of processed images, faces and images without face
+        """
+        from .face import FaceDetector, extract_faces, cv2
+        detector = FaceDetector(model_path)
+        state_file = f'{self.cache_dir}/painting/face_state.json'
+        params = {'size': size, 'blur_radius': blur_radius, 'model': os.path.basename(model_path or 'haarcascade'),
+                  'opencv': cv2.__version__}
+        state = {'params': params, 'no_face': []}
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            if state['params'] != params:
+                logging.info('face extraction parameters changed, processing every image again')
+                state, force = {'params': params, 'no_face': []}, True
+        no_face = set(state['no_face'])
+        face_dir, blur_dir = f'{self.cache_dir}/painting/image_face', f'{self.cache_dir}/painting/image_face_blur'
+        items = []
+        for a in self._select_artists(artist_url, groups):
+            paths = self.get_painting(a, genre=['portrait'] if genre is None else genre, **kwargs) or []
+            for path in paths:
+                name = f'{a}/{os.path.basename(path)}'
+                if force or (name not in no_face and not os.path.exists(f'{face_dir}/{name}')):
+                    items.append((path, f'{face_dir}/{name}', f'{blur_dir}/{name}'))
+        found = extract_faces(items, detector, size=size, blur_radius=blur_radius,
+                              batch_size=batch_size, num_workers=num_workers) if len(items) > 0 else []
+        for (_, face, _), f in zip(items, found):
+            name = face[len(face_dir) + 1:]
+            if f:
+                no_face.discard(name)
+            else:
+                no_face.add(name)
+        state['no_face'] = sorted(no_face)
+        atomic_json_dump(state, state_file)
+        return {'processed': len(items), 'faces': sum(found), 'no_face': len(items) - sum(found)}
+
+    def _painting_meta(self, artist_url: str):
+        """ Painting records of the artist keyed by painting url (from the meta index if available). """
+        if self._meta_index_fresh(artist_url):
+            return {i['url']: i for i in self.meta_index.records(self.meta_index.query(artist_url))}
+        if artist_url in self.catalog:
+            return {i['url']: i for i in read_meta(self.cache_dir, artist_url)}
+        return {}
+
+    def iter_paintings(self,
+                       artist_url: List or str = None,
+                       groups: List or str = None,
+                       image_type: str = None,
+                       prefetch_size: int = 0,
+                       rank: int = 0,
+                       world_size: int = 1,
+                       **kwargs):
+        """ Stream (metadata, path) of the (filtered) paintings lazily, one artist at a time.
+
+        The metadata is the record of the meta cache with its `detail`, whether the filters went through the meta
+        index or not.
+
+        @param artist_url: list of artist aliases (default: every artist in the cache)
+        @param groups: art movements in `VALID_ARTIST_GROUPS` to iterate every artist of
+        @param image_type: image type of `get_painting`
+        @param prefetch_size: number of records prepared ahead in a background thread (0 to disable)
+        @param rank: index of this worker, to split the artists over `world_size` workers (`hash_partition`)
+        @param world_size: number of workers
+        @param kwargs: filters of `get_painting`
+        @return: generator of (metadata, path)
+        """
+        assert 0 <= rank < world_size, f'invalid rank {rank} of {world_size}'
+        artists = hash_partition(self._select_artists(artist_url, groups), rank, world_size)
+
+        def generate():
+            for a in artists:
+                paths = self.get_painting(a, image_type=image_type, **kwargs)
+                if paths is None:
+                    continue
+                meta = {i['url']: i for i in read_meta(self.cache_dir, a)} if a in self.catalog else {}
+                for path in paths:
+                    stem = os.path.basename(path).rsplit('.', 1)[0]
+                    yield dict(meta.get(stem, {'artistUrl': a})), path
+
+        records = generate()
+        return prefetch(records, prefetch_size) if prefetch_size > 0 else records